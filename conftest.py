@@ -0,0 +1 @@
+# Makes `src` importable when pytest is run from the repository root
@@ -1,8 +1,26 @@
 import os
-import pandas as pd
+import sys
 from dotenv import load_dotenv
 from langchain.memory import ConversationBufferWindowMemory
-from src.models.pandas_agent import create_andy_the_analyst
+from src.models.pandas_agent import create_andy_the_analyst, get_repl_tool
+from src.models.model_router import track_routes, describe_routes
+from src.models.budgets import AnalysisBudget, run_with_budget
+from src.models.batch_runner import batch_main, load_dataset
+from src.models.recipes import (
+    schema_of,
+    record_recipe,
+    save_recipe,
+    load_recipe,
+    list_recipes,
+    replay_recipe,
+    format_replay,
+)
+from src.ingestion.csv_tail import CsvTail
+from src.ingestion.excel_reader import read_excel_path, list_sheets
+from src.models.memory_budget import memory_accountant
+from src.tools.charts_and_graphs import find_run_chart_paths
+from src.tools.chart_export import chart_exporter, describe_export
+from src.tools.repl_profiler import PROFILE_REPL, format_offenders
 
 # Load environment variables
 load_dotenv()
@@ -11,7 +29,9 @@ load_dotenv()
 class AndySession:
     """Andy the Analyst session manager with memory"""
 
-    def __init__(self):
+    def __init__(self, session_id="cli"):
+        # Names this session's memory account; the load generator runs many
+        self.session_id = session_id
         self.memory = ConversationBufferWindowMemory(
             k=10,  # Remember last 10 exchanges
             return_messages=True,
@@ -19,17 +39,33 @@ class AndySession:
         self.current_df = None
         self.andy_agent = None
         self.data_loaded = False
-
-    def load_data(self, file_path: str) -> bool:
-        """Load CSV data for analysis"""
+        self.last_routes = []
+        self.last_run = None
+        self.source_schema = None
+        self.csv_tail = None
+        self.profiling = PROFILE_REPL
+
+    def load_data(self, file_path: str, sheets: list = None) -> bool:
+        """Load CSV or Excel data for analysis"""
         try:
             if not os.path.exists(file_path):
                 print(f"❌ File not found: {file_path}")
                 return False
 
-            self.current_df = pd.read_csv(file_path)
+            if file_path.endswith((".xlsx", ".xls")):
+                self.csv_tail = None
+                self.current_df = read_excel_path(file_path, sheets)
+            else:
+                # Remember where the file ends so 'refresh' only reads new rows
+                self.csv_tail = CsvTail(file_path)
+                self.current_df = self.csv_tail.load()
+            # Schema as loaded, before Andy's code converts any columns
+            self.source_schema = schema_of(self.current_df)
             self.andy_agent = create_andy_the_analyst(self.current_df)
             self.data_loaded = True
+            repl = get_repl_tool(self.andy_agent)
+            repl.profile_snippets = self.profiling
+            memory_accountant.attach(self.session_id, repl)
 
             print(f"✅ Data loaded successfully!")
             print(f"📊 Dataset shape: {self.current_df.shape}")
@@ -40,10 +76,41 @@ class AndySession:
             print(f"❌ Error loading data: {str(e)}")
             return False
 
+    def refresh(self) -> bool:
+        """Pick up rows appended to the loaded CSV since it was (re)loaded
+
+        Keeps Andy and the conversation; only the new rows are parsed.
+        """
+        if self.csv_tail is None:
+            print("🤔 Refresh works on a loaded CSV file - load one first!")
+            return False
+
+        try:
+            repl = get_repl_tool(self.andy_agent)
+            # Andy's copy of the frame, with any conversions he made to it
+            old_rows = len(repl.locals["df"])
+            df, appended, rebuilt = self.csv_tail.refresh(repl.locals["df"])
+
+            repl.locals["df"] = df
+            self.current_df = df
+
+            if rebuilt and len(appended) == len(df):
+                print("🔁 The file was rewritten, so I reloaded all of it.")
+            elif len(df) == old_rows:
+                print("✅ Already up to date - no new rows.")
+            else:
+                print(f"✅ Added {len(df) - old_rows:,} new rows")
+            print(f"📊 Dataset shape: {df.shape}")
+            return True
+
+        except Exception as e:
+            print(f"❌ Error refreshing data: {str(e)}")
+            return False
+
     def ask_andy(self, question: str) -> str:
         """Ask Andy a question with memory context"""
         if not self.data_loaded:
-            return "🤔 I need some data to analyze first! Please load a CSV file using the 'load' command."
+            return "🤔 I need some data to analyze first! Please load a CSV or Excel file using the 'load' command."
 
         try:
             # Get conversation history for context
@@ -58,20 +125,109 @@ class AndySession:
 
             full_question = question + context_prompt
 
-            # Get Andy's response
-            result = self.andy_agent.invoke({"input": full_question})
-            response = result.get(
-                "output", "🤷‍♂️ Sorry, I couldn't process that question."
-            )
+            # Get Andy's response within budget, noting the model tier per step
+            budget = AnalysisBudget.for_question(question, self.current_df)
+            with track_routes() as routes:
+                run = run_with_budget(self.andy_agent, full_question, budget)
+            self.last_routes = routes
+            self.last_run = run
+            response = run.output or "🤷‍♂️ Sorry, I couldn't process that question."
 
             # Save to memory
             self.memory.save_context({"input": question}, {"output": response})
 
+            # Keep the code Andy ran so the analysis can be replayed without him
+            recipe = record_recipe(question, self.source_schema, run.steps)
+            if recipe is not None and not run.partial:
+                save_recipe(recipe)
+
+            # Spill Andy's older scratch frames if the session is over budget
+            memory_accountant.enforce(self.session_id, frames=[self.current_df])
+
             return response
 
         except Exception as e:
             return f"🚨 Oops! I encountered an error: {str(e)}"
 
+    def profile_report(self, setting: str = "") -> str:
+        """Turn REPL profiling on/off, or report the slowest code Andy ran"""
+        setting = setting.strip().lower()
+        if setting in ("on", "off"):
+            self.profiling = setting == "on"
+            if self.data_loaded:
+                get_repl_tool(self.andy_agent).profile_snippets = self.profiling
+            return f"🔬 Profiling {setting}."
+
+        if not self.data_loaded:
+            return "🤔 Load some data and ask me something first!"
+        repl = get_repl_tool(self.andy_agent)
+        if not self.profiling and not repl.profiles:
+            return "🔬 Profiling is off - turn it on with 'profile on'."
+        return format_offenders(repl.profiles)
+
+    def replay(self, recipe_name: str, file_path: str = None) -> str:
+        """Replay a saved recipe on a file (or the loaded data) without the LLM"""
+        try:
+            recipe = load_recipe(recipe_name)
+        except FileNotFoundError:
+            return f"❌ No recipe named '{recipe_name}'. Try 'recipes' to list them."
+
+        if file_path:
+            df = load_dataset(file_path)
+        elif self.data_loaded:
+            df = self.current_df
+        else:
+            return "🤔 Give me a file to replay on: replay <recipe> <filepath>"
+
+        return format_replay(recipe, replay_recipe(recipe, df))
+
+
+def print_recipes():
+    """Print the saved analysis recipes"""
+    recipes = list_recipes()
+    if not recipes:
+        print("\n📜 No recipes yet - ask me a question and I'll record one!")
+        return
+
+    print("\n📜 SAVED RECIPES:")
+    for name, question in recipes:
+        print(f"  • {name} - {question[:60]}")
+
+
+def choose_sheets(file_path):
+    """Ask which sheets of a workbook to load (Enter for the first)"""
+    sheet_names = list_sheets(file_path)
+    if len(sheet_names) == 1:
+        return sheet_names
+
+    print("\n📑 This workbook has several sheets:")
+    for number, name in enumerate(sheet_names, start=1):
+        print(f"  {number}. {name}")
+    answer = input("Which ones? (e.g. 1,3 or 'all'; Enter for the first): ").strip()
+
+    if not answer:
+        return sheet_names[:1]
+    if answer.lower() == "all":
+        return sheet_names
+    chosen = [
+        sheet_names[int(part) - 1]
+        for part in answer.split(",")
+        if part.strip().isdigit() and 0 < int(part) <= len(sheet_names)
+    ]
+    return chosen or sheet_names[:1]
+
+
+def print_export_done(job):
+    """Announce a chart's static copies once they finish rendering"""
+    name = os.path.basename(job.html_path)
+    if job.status == "done":
+        print(
+            f"\n🖼️ Static copies of {name} ready ({job.seconds}s): "
+            + ", ".join(job.files)
+        )
+    else:
+        print(f"\n⚠️ Static export of {name} {job.status}: {job.error}")
+
 
 def print_welcome():
     """Print welcome message"""
@@ -82,14 +238,22 @@ def print_welcome():
     print("I'm absolutely obsessed with spreadsheets, charts, and finding")
     print("amazing insights in your data! 📊✨")
     print()
+    print("🌙 NIGHTLY RUNS?")
+    print("   Run: python main.py batch manifest.json -o results.jsonl")
+    print()
     print("🌐 PREFER THE WEB INTERFACE?")
     print("   Run: python run_web_app.py")
     print("   (More features, file upload, better visuals!)")
     print()
     print("💡 CLI COMMANDS:")
-    print("  • 'load <filepath>' - Load a CSV file for analysis")
+    print("  • 'load <filepath>' - Load a CSV or Excel file for analysis")
+    print("  • 'refresh' - Pick up rows appended to the loaded CSV")
+    print("  • 'recipes' - List analyses you can replay without the LLM")
+    print("  • 'replay <recipe> [filepath]' - Re-run a recipe on new data")
+    print("  • 'profile [on|off]' - Find the slowest code I ran")
     print("  • 'help' - Show available commands")
     print("  • 'exit' - Say goodbye (I'll miss you! 😢)")
+    print("  • Ctrl+C while I'm thinking - Stop and get a partial answer")
     print("  • Ask me anything about your data once loaded!")
     print()
     print("🚀 Let's dive into some data magic together!")
@@ -100,8 +264,17 @@ def print_help():
     """Print help information"""
     print("\n📋 ANDY'S HELP MENU:")
     print("=" * 40)
-    print("🔸 load <filepath>     - Load a CSV file")
+    print("🔸 load <filepath>     - Load a CSV or Excel file")
     print("                       Example: load data.csv")
+    print("                       (for a workbook I'll ask which sheets)")
+    print("🔸 refresh            - Load only the rows added to the CSV since")
+    print("                       it was loaded; keeps our conversation")
+    print("🔸 recipes            - List saved analysis recipes")
+    print("🔸 replay <recipe> [filepath]")
+    print("                       - Re-run a recipe on new data, no LLM needed")
+    print("                       Example: replay top_categories exports/june.csv")
+    print("🔸 profile [on|off]   - Show the slowest code I ran (with profiling")
+    print("                       on: CPU time, peak memory, rows touched)")
     print("🔸 help               - Show this help menu")
     print("🔸 exit               - End our session")
     print("🔸 <question>         - Ask me anything about your data!")
@@ -116,10 +289,21 @@ def print_help():
 
 def main():
     """Main application loop"""
+    # Headless batch mode: python main.py batch manifest.json
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        batch_main(sys.argv[2:])
+        return
+
+    # Headless replay: python main.py replay <recipe> <filepath>
+    if len(sys.argv) == 4 and sys.argv[1] == "replay":
+        print(AndySession().replay(sys.argv[2], sys.argv[3]))
+        return
+
     print_welcome()
 
     # Initialize Andy session
     session = AndySession()
+    chart_exporter.on_export_done(print_export_done)
 
     print("\n🤔 How can I help you today?")
 
@@ -144,12 +328,37 @@ def main():
                 print_help()
                 continue
 
+            # Handle refresh of a growing CSV
+            elif user_input.lower() == "refresh":
+                session.refresh()
+                continue
+
+            # Handle profiling of the code Andy runs
+            elif user_input.lower() in ("profile", "profile on", "profile off"):
+                print(f"\n{session.profile_report(user_input[7:])}")
+                continue
+
+            # Handle recipe commands
+            elif user_input.lower() == "recipes":
+                print_recipes()
+                continue
+
+            elif user_input.lower().startswith("replay "):
+                parts = user_input[7:].split(maxsplit=1)
+                print(f"\n🤓 Andy: {session.replay(*parts)}")
+                continue
+
             # Handle load command
             elif user_input.lower().startswith("load "):
                 filepath = user_input[5:].strip()
                 if filepath:
+                    sheets = None
+                    if filepath.endswith((".xlsx", ".xls")) and os.path.exists(
+                        filepath
+                    ):
+                        sheets = choose_sheets(filepath)
                     print(f"\n🔄 Loading data from: {filepath}")
-                    success = session.load_data(filepath)
+                    success = session.load_data(filepath, sheets)
                     if success:
                         print(
                             "\n🤓 Andy: Fantastic! I've got your data loaded and ready to go!"
@@ -166,6 +375,21 @@ def main():
                 print("\n🤓 Andy: Let me analyze that for you...")
                 response = session.ask_andy(user_input)
                 print(f"\n🤓 Andy: {response}")
+                if session.last_run is not None:
+                    run = session.last_run
+                    print(
+                        f"⏱️ {run.seconds:.1f}s, {run.iterations} steps, "
+                        f"{run.tokens:,} tokens"
+                        + (f" (stopped: {run.stop_reason})" if run.partial else "")
+                    )
+                if session.last_routes:
+                    print(f"🧭 Model tiers: {describe_routes(session.last_routes)}")
+                if session.last_run is not None:
+                    for chart_path in find_run_chart_paths(session.last_run.steps):
+                        print(
+                            f"📈 {os.path.basename(chart_path)}: "
+                            f"{describe_export(chart_path)}"
+                        )
 
         except KeyboardInterrupt:
             print("\n\n🤓 Andy: Caught you trying to escape! 😄")
@@ -3,21 +3,39 @@
 Launch script for Andy the Analyst Web App
 """
 
+import argparse
 import subprocess
 import sys
 import os
 
 
 def main():
-    """Launch the Streamlit web app"""
+    """Launch the Streamlit web app (or, with --api, the HTTP API)"""
+    parser = argparse.ArgumentParser(description="Launch Andy the Analyst")
+    parser.add_argument(
+        "--api", action="store_true", help="Serve the async HTTP API instead"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="API host")
+    parser.add_argument("--port", type=int, default=8000, help="API port")
+    args = parser.parse_args()
+
+    # Ensure we're in the right directory
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    if args.api:
+        from src.api.server import run_api_server
+
+        print("🚀 Starting Andy the Analyst API...")
+        print("💡 Use Ctrl+C to stop the server")
+        print("-" * 50)
+        run_api_server(args.host, args.port)
+        return
+
     print("🚀 Starting Andy the Analyst Web App...")
     print("📊 Opening in your default browser...")
     print("💡 Use Ctrl+C to stop the server")
     print("-" * 50)
 
-    # Ensure we're in the right directory
-    os.chdir(os.path.dirname(os.path.abspath(__file__)))
-
     try:
         # Launch Streamlit
         subprocess.run(
@@ -0,0 +1,511 @@
+"""
+Async HTTP API for Andy the Analyst.
+
+For programmatic clients that don't fit Streamlit's rerun model. One
+asyncio process serves many concurrent clients: requests are handled on the
+event loop, agent runs happen on a bounded worker pool, and datasets live in
+a shared registry so sessions that load the same data share one copy.
+
+    POST   /sessions                   -> {"session_id": ...}
+    GET    /sessions/{id}              -> dataset, questions asked, charts
+    DELETE /sessions/{id}
+    POST   /sessions/{id}/dataset      JSON {"path": ..., "sheets": [...]} for a
+                                       file under ANDY_API_DATA_ROOT, JSON
+                                       {"fingerprint": ...} for a registered
+                                       dataset, or a multipart "file" upload
+    POST   /sessions/{id}/ask          JSON {"question": ...}; streams
+                                       Server-Sent Events ("step", then
+                                       "answer" or "error") when the client
+                                       sends Accept: text/event-stream
+    GET    /sessions/{id}/charts       -> charts Andy saved in this session, with
+                                       the status of their PNG/SVG export
+    GET    /datasets                   -> the shared dataset registry
+    GET    /health                     -> sessions, workers, LLM scheduler
+
+Run it with `python run_web_app.py --api` or `python -m src.api.server`.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from aiohttp import web
+from dotenv import load_dotenv
+from langchain.memory import ConversationBufferWindowMemory
+
+from src.ingestion.data_root import OutsideDataRoot, resolve_data_path
+from src.ingestion.excel_reader import read_excel_path, read_workbook
+from src.models.answer_cache import answer_cache, dataset_fingerprint
+from src.models.budgets import AnalysisBudget
+from src.models.llm_scheduler import llm_scheduler
+from src.models.memory_budget import memory_accountant
+from src.models.model_router import describe_routes
+from src.models.pandas_agent import create_andy_the_analyst, get_repl_tool
+from src.models.single_flight import ask_flight, flight_key, run_flight
+from src.tools.charts_and_graphs import find_chart_paths, find_run_chart_paths
+from src.tools.chart_export import chart_exporter, set_headless
+
+load_dotenv()
+
+API_WORKERS = int(os.getenv("ANDY_API_WORKERS", "32"))
+SESSION_TTL = float(os.getenv("ANDY_API_SESSION_TTL", "3600"))
+
+# Longest code/observation sent in a "step" event
+STEP_TEXT_LIMIT = 2000
+
+
+class DatasetRegistry:
+    """Datasets loaded in this process, keyed by fingerprint
+
+    Loading the same data twice (from any session) reuses the first copy; a
+    dataset is dropped once no session uses it.
+    """
+
+    def __init__(self):
+        self._datasets = {}
+        self._lock = threading.Lock()
+
+    def add(self, df, name):
+        fingerprint = dataset_fingerprint(df)
+        with self._lock:
+            if fingerprint not in self._datasets:
+                self._datasets[fingerprint] = {
+                    "fingerprint": fingerprint,
+                    "name": name,
+                    "df": df,
+                    "sessions": set(),
+                }
+            return self._datasets[fingerprint]
+
+    def get(self, fingerprint):
+        with self._lock:
+            return self._datasets.get(fingerprint)
+
+    def acquire(self, dataset, session_id):
+        with self._lock:
+            # Re-register it if its last session let go since it was looked up
+            dataset = self._datasets.setdefault(dataset["fingerprint"], dataset)
+            dataset["sessions"].add(session_id)
+
+    def release(self, fingerprint, session_id):
+        with self._lock:
+            dataset = self._datasets.get(fingerprint)
+            if dataset is None:
+                return
+            dataset["sessions"].discard(session_id)
+            if not dataset["sessions"]:
+                del self._datasets[fingerprint]
+
+    def describe(self):
+        with self._lock:
+            return [
+                {
+                    "fingerprint": dataset["fingerprint"],
+                    "name": dataset["name"],
+                    "rows": dataset["df"].shape[0],
+                    "columns": dataset["df"].shape[1],
+                    "sessions": len(dataset["sessions"]),
+                }
+                for dataset in self._datasets.values()
+            ]
+
+
+class ApiSession:
+    """One client's conversation with Andy about one dataset"""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex[:12]
+        self.memory = ConversationBufferWindowMemory(k=10, return_messages=True)
+        self.fingerprint = None
+        self.agent = None
+        self.history = []
+        self.charts = []
+        self.last_used = time.monotonic()
+        # One question at a time: questions share the REPL and the memory
+        self.lock = asyncio.Lock()
+
+    def full_question(self, question):
+        """The question plus recent conversation, as the CLI builds it"""
+        history = self.memory.load_memory_variables({})
+        if not history.get("history"):
+            return question
+        return (
+            question
+            + "\n\nPrevious conversation context:\n"
+            + str(history["history"][-6:])
+        )
+
+    def describe(self):
+        return {
+            "session_id": self.id,
+            "dataset": self.fingerprint,
+            "questions": len(self.history),
+            "charts": len(self.charts),
+            "busy": self.lock.locked(),
+        }
+
+
+def _error(status, message):
+    return web.json_response({"error": message}, status=status)
+
+
+def _get_session(request):
+    session = request.app["sessions"].get(request.match_info["session_id"])
+    if session is not None:
+        session.last_used = time.monotonic()
+    return session
+
+
+def _read_upload(filename, data, sheets):
+    if filename.endswith((".xlsx", ".xls")):
+        return read_workbook(data, sheets)
+    return pd.read_csv(io.BytesIO(data))
+
+
+def _read_path(path, sheets):
+    if path.endswith((".xlsx", ".xls")):
+        return read_excel_path(path, sheets)
+    return pd.read_csv(path)
+
+
+def _bind_dataset(registry, session, dataset):
+    """Give the session a fresh Andy on a dataset (runs on a worker)"""
+    # Copy-on-write: the shallow copy shares memory, but Andy's edits in one
+    # session never show up in another session's frame
+    agent = create_andy_the_analyst(dataset["df"].copy(deep=False), verbose=False)
+    registry.acquire(dataset, session.id)
+    if session.fingerprint not in (None, dataset["fingerprint"]):
+        registry.release(session.fingerprint, session.id)
+    session.fingerprint = dataset["fingerprint"]
+    session.agent = agent
+    session.memory.clear()
+    memory_accountant.attach(session.id, get_repl_tool(agent))
+
+
+def _step_event(number, action, observation):
+    code = action.tool_input
+    if isinstance(code, dict):
+        code = code.get("query", json.dumps(code))
+    observation = str(observation)
+    return {
+        "step": number,
+        "tool": action.tool,
+        "input": str(code)[:STEP_TEXT_LIMIT],
+        "observation": observation[:STEP_TEXT_LIMIT],
+        "charts": (
+            find_chart_paths(observation) if action.tool == "python_repl_ast" else []
+        ),
+    }
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n".encode()
+
+
+async def create_session(request):
+    session = ApiSession()
+    request.app["sessions"][session.id] = session
+    return web.json_response({"session_id": session.id}, status=201)
+
+
+async def get_session(request):
+    session = _get_session(request)
+    if session is None:
+        return _error(404, "No such session")
+    return web.json_response(session.describe())
+
+
+async def delete_session(request):
+    session = request.app["sessions"].pop(request.match_info["session_id"], None)
+    if session is None:
+        return _error(404, "No such session")
+    if session.fingerprint is not None:
+        request.app["registry"].release(session.fingerprint, session.id)
+    return web.json_response({"deleted": session.id})
+
+
+async def load_dataset(request):
+    session = _get_session(request)
+    if session is None:
+        return _error(404, "No such session")
+    registry = request.app["registry"]
+    loop = asyncio.get_running_loop()
+
+    try:
+        if request.content_type.startswith("multipart/"):
+            form = await request.post()
+            upload = form.get("file")
+            if upload is None or not hasattr(upload, "file"):
+                return _error(400, "Multipart uploads need a 'file' field")
+            sheets = form.getall("sheets", None)
+            df = await loop.run_in_executor(
+                None, _read_upload, upload.filename, upload.file.read(), sheets
+            )
+            dataset = registry.add(df, upload.filename)
+        else:
+            body = await request.json()
+            if "fingerprint" in body:
+                dataset = registry.get(body["fingerprint"])
+                if dataset is None:
+                    return _error(404, "No dataset with that fingerprint")
+            elif "path" in body:
+                try:
+                    path = resolve_data_path(body["path"])
+                except OutsideDataRoot:
+                    return _error(403, "Datasets must live under the data root")
+                if not os.path.exists(path):
+                    return _error(404, f"File not found: {body['path']}")
+                df = await loop.run_in_executor(
+                    None, _read_path, path, body.get("sheets")
+                )
+                dataset = registry.add(df, os.path.basename(path))
+            else:
+                return _error(400, "Send a 'path', a 'fingerprint' or a file upload")
+    except (ValueError, json.JSONDecodeError) as e:
+        return _error(400, f"Could not read the dataset: {e}")
+
+    async with session.lock:
+        await loop.run_in_executor(
+            request.app["workers"], _bind_dataset, registry, session, dataset
+        )
+
+    df = dataset["df"]
+    return web.json_response(
+        {
+            "fingerprint": dataset["fingerprint"],
+            "name": dataset["name"],
+            "rows": df.shape[0],
+            "columns": [str(col) for col in df.columns],
+        }
+    )
+
+
+async def ask(request):
+    session = _get_session(request)
+    if session is None:
+        return _error(404, "No such session")
+    if session.agent is None:
+        return _error(409, "Load a dataset into this session first")
+    try:
+        question = str((await request.json()).get("question", "")).strip()
+    except json.JSONDecodeError:
+        return _error(400, 'Send JSON: {"question": ...}')
+    if not question:
+        return _error(400, "Empty question")
+
+    stream = "text/event-stream" in request.headers.get("Accept", "")
+    response = None
+    if stream:
+        response = web.StreamResponse(
+            headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"}
+        )
+        await response.prepare(request)
+
+    async with session.lock:
+        result = await _answer(request, session, question, response)
+
+    if stream:
+        await response.write(_sse(result.pop("event"), result))
+        await response.write_eof()
+        return response
+    status = 500 if result.pop("event") == "error" else 200
+    return web.json_response(result, status=status)
+
+
+async def _answer(request, session, question, response):
+    """Run one question, streaming steps to response if it is an SSE stream"""
+    full_question = session.full_question(question)
+    # Prefetched answers were worked out without any conversation, so they
+    # only stand in for a question asked before one has started
+    if full_question == question:
+        cached = answer_cache.get(session.fingerprint, question)
+        if cached is not None:
+            session.memory.save_context({"input": question}, {"output": cached})
+            return {"event": "answer", "answer": cached, "status": "cached"}
+
+    loop = asyncio.get_running_loop()
+    steps = asyncio.Queue()
+    step_count = 0
+
+    def on_step(action, observation):
+        nonlocal step_count
+        step_count += 1
+        event = _step_event(step_count, action, observation)
+        loop.call_soon_threadsafe(steps.put_nowait, event)
+
+    df = request.app["registry"].get(session.fingerprint)["df"]
+    budget = AnalysisBudget.for_question(question, df)
+    cancel_event = threading.Event()
+    agent = session.agent
+
+    # Identical questions about the same data share one run; every caller
+    # gets its steps streamed from the moment it joins
+    key, fresh = flight_key(
+        session.fingerprint,
+        question,
+        full_question[len(question) :],
+        get_repl_tool(agent),
+    )
+    fresh_df = df if fresh else None
+    shared, _ = ask_flight.join(
+        key,
+        lambda publish: request.app["workers"].submit(
+            run_flight, agent, full_question, budget, cancel_event, publish, fresh_df
+        ),
+        cancel=cancel_event.set,
+        listener=on_step,
+    )
+    future = asyncio.wrap_future(shared)
+
+    try:
+        while not future.done() or not steps.empty():
+            next_step = asyncio.ensure_future(steps.get())
+            await asyncio.wait({next_step, future}, return_when=asyncio.FIRST_COMPLETED)
+            if not next_step.done():
+                next_step.cancel()
+                continue
+            if response is not None:
+                await response.write(_sse("step", next_step.result()))
+        run, routes = await future
+
+    except (ConnectionResetError, asyncio.CancelledError):
+        # The client went away: Andy stops at his next step unless someone
+        # else is waiting for the same answer
+        ask_flight.leave(key, shared, on_step)
+        raise
+    except Exception as e:
+        return {"event": "error", "error": f"{type(e).__name__}: {e}"}
+
+    answer = run.output or "🤷‍♂️ Sorry, I couldn't process that question."
+    charts = find_run_chart_paths(run.steps)
+    session.memory.save_context({"input": question}, {"output": answer})
+    session.history.append({"question": question, "answer": answer})
+    session.charts += charts
+    memory_accountant.enforce(session.id, conversation=session.history)
+
+    return {
+        "event": "answer",
+        "answer": answer,
+        "status": "partial" if run.partial else "ok",
+        "stop_reason": run.stop_reason,
+        "iterations": run.iterations,
+        "tokens": run.tokens,
+        "seconds": round(run.seconds, 2),
+        "tiers": describe_routes(routes),
+        "charts": charts,
+    }
+
+
+def _export_status(path):
+    job = chart_exporter.status(path)
+    return None if job is None else job.to_dict()
+
+
+async def list_charts(request):
+    session = _get_session(request)
+    if session is None:
+        return _error(404, "No such session")
+    return web.json_response(
+        {
+            "charts": [
+                {
+                    "name": os.path.basename(path),
+                    "path": path,
+                    "export": _export_status(path),
+                }
+                for path in session.charts
+            ]
+        }
+    )
+
+
+async def list_datasets(request):
+    return web.json_response({"datasets": request.app["registry"].describe()})
+
+
+async def health(request):
+    sessions = request.app["sessions"]
+    return web.json_response(
+        {
+            "sessions": len(sessions),
+            "busy_sessions": sum(
+                session.lock.locked() for session in sessions.values()
+            ),
+            "datasets": len(request.app["registry"].describe()),
+            "workers": request.app["worker_count"],
+            "single_flight": ask_flight.metrics(),
+            "chart_exports": chart_exporter.metrics(),
+            "llm_scheduler": llm_scheduler.snapshot(),
+        },
+        dumps=lambda data: json.dumps(data, default=str),
+    )
+
+
+async def _expire_sessions(app):
+    """Drop sessions that have been idle longer than the TTL"""
+    while True:
+        await asyncio.sleep(min(60, SESSION_TTL))
+        cutoff = time.monotonic() - SESSION_TTL
+        for session_id, session in list(app["sessions"].items()):
+            if session.last_used < cutoff and not session.lock.locked():
+                del app["sessions"][session_id]
+                if session.fingerprint is not None:
+                    app["registry"].release(session.fingerprint, session_id)
+
+
+async def _start_background(app):
+    app["expiry"] = asyncio.create_task(_expire_sessions(app))
+
+
+async def _stop_background(app):
+    app["expiry"].cancel()
+    app["workers"].shutdown(wait=False, cancel_futures=True)
+
+
+def create_app(workers=API_WORKERS):
+    # Charts are written to disk; there is no browser to show them in
+    set_headless()
+    app = web.Application(client_max_size=512 * 1024**2)
+    app["sessions"] = {}
+    app["registry"] = DatasetRegistry()
+    app["workers"] = ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="andy-api"
+    )
+    app["worker_count"] = workers
+    app.on_startup.append(_start_background)
+    app.on_cleanup.append(_stop_background)
+
+    app.router.add_post("/sessions", create_session)
+    app.router.add_get("/sessions/{session_id}", get_session)
+    app.router.add_delete("/sessions/{session_id}", delete_session)
+    app.router.add_post("/sessions/{session_id}/dataset", load_dataset)
+    app.router.add_post("/sessions/{session_id}/ask", ask)
+    app.router.add_get("/sessions/{session_id}/charts", list_charts)
+    app.router.add_get("/datasets", list_datasets)
+    app.router.add_get("/health", health)
+    return app
+
+
+def run_api_server(host="127.0.0.1", port=8000, workers=API_WORKERS):
+    print(f"🤓 Andy's API is listening on http://{host}:{port}")
+    web.run_app(create_app(workers), host=host, port=port, print=None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Andy the Analyst HTTP API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=API_WORKERS)
+    args = parser.parse_args(argv)
+    run_api_server(args.host, args.port, args.workers)
+
+
+if __name__ == "__main__":
+    main()
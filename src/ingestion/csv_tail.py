@@ -0,0 +1,106 @@
+"""
+Incremental loading for CSV files that grow during the day.
+
+CsvTail remembers the byte offset of the last complete line it parsed, so a
+refresh reads and parses only the bytes appended since then. If the file was
+truncated or rewritten in place, it falls back to a full reload.
+"""
+
+import hashlib
+import io
+import os
+
+import pandas as pd
+
+# Bytes at the start of the file used to spot an in-place rewrite
+SIGNATURE_BYTES = 4096
+
+
+class CsvTail:
+    """Tracks how far into a CSV file has been loaded"""
+
+    def __init__(self, path, **read_csv_kwargs):
+        self.path = path
+        self.read_csv_kwargs = read_csv_kwargs
+        self.offset = 0
+        self.signature = None
+        self.signature_length = 0
+        self.columns = None
+        # True when the last row came from a line without a trailing newline,
+        # i.e. one that may still be being written
+        self.partial_last_row = False
+
+    def _signature(self, f):
+        f.seek(0)
+        return hashlib.sha256(f.read(self.signature_length)).hexdigest()
+
+    def load(self):
+        """Read the whole file and remember where it ends"""
+        with open(self.path, "rb") as f:
+            data = f.read()
+
+        df = pd.read_csv(io.BytesIO(data), **self.read_csv_kwargs)
+        self.columns = list(df.columns)
+
+        self.offset = data.rfind(b"\n") + 1
+        self.partial_last_row = bool(data[self.offset :].strip())
+        self.signature_length = min(self.offset, SIGNATURE_BYTES)
+        self.signature = hashlib.sha256(data[: self.signature_length]).hexdigest()
+        return df
+
+    def _was_rewritten(self, f, size):
+        return size < self.offset or self._signature(f) != self.signature
+
+    def refresh(self, df):
+        """Append rows written since the last load/refresh to df
+
+        Returns (new_df, appended_rows, rebuilt). rebuilt is True when
+        anything derived from the old rows (profiles, fingerprints) must be
+        recomputed: the file was truncated or rewritten, so new_df is a full
+        reload, or a half-written last row was replaced by its full version.
+        """
+        with open(self.path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if self._was_rewritten(f, size):
+                full = self.load()
+                return full, full, True
+
+            f.seek(self.offset)
+            data = f.read()
+
+        # Only parse complete lines; a half-written last line waits
+        complete = data[: data.rfind(b"\n") + 1]
+        if not complete.strip():
+            return df, df.iloc[0:0], False
+
+        chunk = pd.read_csv(
+            io.BytesIO(complete),
+            header=None,
+            names=self.columns,
+            **self.read_csv_kwargs,
+        )
+        chunk = self._match_dtypes(chunk, df)
+
+        rebuilt = self.partial_last_row
+        if self.partial_last_row:
+            # That row is re-read in full as part of this chunk
+            df = df.iloc[:-1]
+            self.partial_last_row = False
+
+        self.offset += len(complete)
+        return pd.concat([df, chunk], ignore_index=True), chunk, rebuilt
+
+    @staticmethod
+    def _match_dtypes(chunk, df):
+        """Cast new rows to the frame's current dtypes where possible
+
+        Andy's code may have converted columns (e.g. dates) in place; keeping
+        the appended rows consistent avoids silently upcasting to object.
+        """
+        for col in chunk.columns:
+            if col in df.columns and chunk[col].dtype != df[col].dtype:
+                try:
+                    chunk[col] = chunk[col].astype(df[col].dtype)
+                except (TypeError, ValueError):
+                    pass
+        return chunk
@@ -0,0 +1,27 @@
+"""
+The folder that datasets may be loaded from by path.
+
+The HTTP API and the web app's server-path loader take a path typed by a
+remote user, so both resolve it under the same data root and refuse anything
+outside it (including via ".." or symlinks).
+"""
+
+import os
+
+
+class OutsideDataRoot(ValueError):
+    """Raised for a path that resolves outside the data root"""
+
+
+def data_root():
+    """ANDY_API_DATA_ROOT (default `data`), fully resolved"""
+    return os.path.realpath(os.getenv("ANDY_API_DATA_ROOT", "data"))
+
+
+def resolve_data_path(path, root=None):
+    """Absolute path of a dataset given relative to (or inside) the data root"""
+    root = root or data_root()
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([resolved, root]) != root:
+        raise OutsideDataRoot(f"Datasets must live under the data root ({root})")
+    return resolved
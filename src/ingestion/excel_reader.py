@@ -0,0 +1,307 @@
+"""
+Fast Excel ingestion.
+
+Sheets are read row by row with the Rust-based calamine reader when it is
+installed (openpyxl in read-only mode otherwise) and turned into DataFrames
+a chunk at a time, so a 200k-row sheet never exists as one big list of cells.
+The chunks are stacked column by column as they arrive, so the sheet is not
+held twice either. Several selected sheets are parsed in parallel worker
+processes, which open the workbook file themselves, and parsed sheets are
+cached by workbook hash so reloading the same file is instant.
+
+A workbook source is either its bytes or the path of the file on disk.
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime
+
+import pandas as pd
+
+from src.tools.worker_pool import SpawnPoolExecutor
+
+try:
+    from python_calamine import CalamineWorkbook
+
+    EXCEL_ENGINE = "calamine"
+except ImportError:
+    CalamineWorkbook = None
+    EXCEL_ENGINE = "openpyxl"
+
+CHUNK_ROWS = int(os.getenv("ANDY_EXCEL_CHUNK_ROWS", "50000"))
+EXCEL_WORKERS = int(os.getenv("ANDY_EXCEL_WORKERS", str(min(4, os.cpu_count() or 1))))
+EXCEL_CACHE_SIZE = int(os.getenv("ANDY_EXCEL_CACHE_SIZE", "16"))
+
+# Column added when several sheets are combined into one frame
+SHEET_COLUMN = "Sheet"
+
+
+def workbook_hash(source):
+    """sha256 of the workbook's bytes"""
+    if isinstance(source, (bytes, bytearray)):
+        return hashlib.sha256(source).hexdigest()
+    digest = hashlib.sha256()
+    with open(source, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _open(source):
+    """What the Excel readers accept: a file-like for bytes, else the path"""
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)
+    return source
+
+
+def _is_legacy_xls(source):
+    # OLE2 compound document signature; openpyxl only reads .xlsx
+    if isinstance(source, (bytes, bytearray)):
+        head = bytes(source[:8])
+    else:
+        with open(source, "rb") as f:
+            head = f.read(8)
+    return head == b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+
+
+def _clean_cell(value):
+    """Match pd.read_excel: blank cells are missing, whole floats are ints
+    and midnight dates are timestamps"""
+    if value == "":
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return datetime(value.year, value.month, value.day)
+    return value
+
+
+def _header(row):
+    """Column names from the first row, named and de-duplicated like pandas"""
+    names, seen = [], {}
+    for i, value in enumerate(row):
+        name = f"Unnamed: {i}" if value in (None, "") else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _iter_rows(source, sheet):
+    if CalamineWorkbook is not None:
+        workbook = CalamineWorkbook.from_object(_open(source))
+        yield from workbook.get_sheet_by_name(sheet).iter_rows()
+        return
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(_open(source), read_only=True, data_only=True)
+    try:
+        yield from workbook[sheet].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _iter_row_batches(source, sheet, chunk_rows):
+    """Yield (columns, rows) with at most chunk_rows cleaned rows at a time"""
+    rows = _iter_rows(source, sheet)
+    header = next(rows, None)
+    if header is None:
+        return
+    columns = _header(header)
+
+    batch = []
+    for row in rows:
+        values = [_clean_cell(value) for value in row]
+        if all(value is None for value in values):
+            continue  # pandas skips blank lines too
+        # Ragged rows: pad or trim to the header's width
+        values = (values + [None] * len(columns))[: len(columns)]
+        batch.append(values)
+        if len(batch) >= chunk_rows:
+            yield columns, batch
+            batch = []
+
+    if batch:
+        yield columns, batch
+
+
+def iter_sheet_chunks(source, sheet, chunk_rows=CHUNK_ROWS):
+    """Yield a sheet as DataFrames of at most chunk_rows rows"""
+    for columns, batch in _iter_row_batches(source, sheet, chunk_rows):
+        yield pd.DataFrame.from_records(batch, columns=columns)
+
+
+def read_sheet(source, sheet, chunk_rows=CHUNK_ROWS):
+    """Parse one sheet of a workbook into a DataFrame
+
+    Each batch of rows is turned into one array per column as it is read,
+    and each column is stacked on its own at the end. Besides the finished
+    frame, only one column's pieces exist at a time, where concatenating
+    chunk frames would hold the whole sheet twice.
+    """
+    if CalamineWorkbook is None and _is_legacy_xls(source):
+        return pd.read_excel(_open(source), sheet_name=sheet)
+
+    columns, pieces = None, None
+    for columns, batch in _iter_row_batches(source, sheet, chunk_rows):
+        if pieces is None:
+            pieces = [[] for _ in columns]
+        for i, column_pieces in enumerate(pieces):
+            column_pieces.append(pd.Series([row[i] for row in batch]))
+        del batch  # Don't hold these rows while the next batch is read
+    if columns is None:
+        return pd.DataFrame()
+
+    stacked = {}
+    for i, name in enumerate(columns):
+        parts, pieces[i] = pieces[i], None
+        column = parts[0] if len(parts) == 1 else pd.concat(parts, ignore_index=True)
+        # Pieces may disagree on dtypes (e.g. nulls in only one); let pandas settle
+        stacked[name] = column.infer_objects()
+    return pd.DataFrame(stacked, copy=False)
+
+
+def list_sheets(source):
+    """Sheet names of a workbook, in workbook order"""
+    if CalamineWorkbook is not None:
+        return list(CalamineWorkbook.from_object(_open(source)).sheet_names)
+    if _is_legacy_xls(source):
+        return pd.ExcelFile(_open(source)).sheet_names
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(_open(source), read_only=True)
+    try:
+        return workbook.sheetnames
+    finally:
+        workbook.close()
+
+
+class SheetCache:
+    """LRU cache of parsed sheets, keyed by (workbook hash, sheet name)"""
+
+    def __init__(self, max_entries=EXCEL_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest, sheet):
+        with self._lock:
+            df = self._entries.get((digest, sheet))
+            if df is not None:
+                self._entries.move_to_end((digest, sheet))
+            return df
+
+    def put(self, digest, sheet, df):
+        with self._lock:
+            self._entries[(digest, sheet)] = df
+            self._entries.move_to_end((digest, sheet))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def evict_oldest(self):
+        """Drop the least recently used sheet and return it (None if empty)"""
+        with self._lock:
+            if not self._entries:
+                return None
+            return self._entries.popitem(last=False)[1]
+
+    def frames(self):
+        with self._lock:
+            return list(self._entries.values())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+sheet_cache = SheetCache()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = SpawnPoolExecutor(max_workers=EXCEL_WORKERS)
+        return _executor
+
+
+def _discard_executor(executor):
+    """Forget a pool whose worker died, so the next load starts a new one"""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+
+
+def _read_in_workers(path, sheets):
+    """Parse sheets of the workbook at path in parallel worker processes"""
+    executor = _get_executor()
+    try:
+        # Workers open the file themselves rather than get its bytes pickled
+        futures = {sheet: executor.submit(read_sheet, path, sheet) for sheet in sheets}
+        return {sheet: future.result() for sheet, future in futures.items()}
+    except BrokenProcessPool:
+        _discard_executor(executor)
+        raise
+
+
+def read_workbook(source, sheets=None):
+    """Parse the selected sheets (default: the first) into one DataFrame
+
+    Sheets not already cached are parsed in parallel worker processes. With
+    several sheets, the rows are stacked and a "Sheet" column says where
+    each row came from.
+    """
+    if sheets is None:
+        sheets = list_sheets(source)[:1]
+    sheets = list(sheets)
+
+    digest = workbook_hash(source)
+    frames = {sheet: sheet_cache.get(digest, sheet) for sheet in sheets}
+    missing = [sheet for sheet, df in frames.items() if df is None]
+
+    if len(missing) <= 1 or EXCEL_WORKERS <= 1:
+        parsed = {sheet: read_sheet(source, sheet) for sheet in missing}
+    elif isinstance(source, (bytes, bytearray)):
+        # An upload: give the workers a file to open, named for its format
+        suffix = ".xls" if _is_legacy_xls(source) else ".xlsx"
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(source)
+            parsed = _read_in_workers(path, missing)
+        finally:
+            os.remove(path)
+    else:
+        parsed = _read_in_workers(source, missing)
+
+    for sheet, df in parsed.items():
+        sheet_cache.put(digest, sheet, df)
+        frames[sheet] = df
+
+    if len(sheets) == 1:
+        # Copy-on-write: Andy's edits to his frame never reach the cache
+        return frames[sheets[0]].copy(deep=False)
+    return pd.concat(
+        [df.assign(**{SHEET_COLUMN: sheet}) for sheet, df in frames.items()],
+        ignore_index=True,
+    )
+
+
+def read_excel_path(path, sheets=None):
+    """read_workbook for a file on disk, never read into memory as a whole"""
+    return read_workbook(path, sheets)
@@ -0,0 +1,52 @@
+"""
+Dataset profile: per-column aggregates that can be updated with new rows
+"""
+
+import pandas as pd
+
+
+class DatasetProfile:
+    """Row count plus mergeable per-column stats (nulls, sum, min, max)"""
+
+    def __init__(self):
+        self.rows = 0
+        self.columns = {}
+
+    @classmethod
+    def from_frame(cls, df):
+        profile = cls()
+        profile.update(df)
+        return profile
+
+    def update(self, chunk):
+        """Fold a batch of new rows into the profile in O(len(chunk))"""
+        self.rows += len(chunk)
+        for col in chunk.columns:
+            series = chunk[col]
+            stats = self.columns.setdefault(
+                str(col),
+                {"dtype": str(series.dtype), "non_null": 0, "nulls": 0},
+            )
+            stats["dtype"] = str(series.dtype)
+            non_null = int(series.count())
+            stats["non_null"] += non_null
+            stats["nulls"] += len(series) - non_null
+
+            if pd.api.types.is_numeric_dtype(series.dtype) and non_null:
+                stats["sum"] = stats.get("sum", 0) + float(series.sum())
+                stats["min"] = min(stats.get("min", float("inf")), float(series.min()))
+                stats["max"] = max(stats.get("max", float("-inf")), float(series.max()))
+        return self
+
+    def numeric_columns(self):
+        return [col for col, stats in self.columns.items() if "sum" in stats]
+
+    def to_frame(self):
+        """One row per column: dtype, non-null/null counts, sum, mean, min, max"""
+        records = []
+        for col, stats in self.columns.items():
+            record = {"column": col, **stats}
+            if "sum" in stats and stats["non_null"]:
+                record["mean"] = stats["sum"] / stats["non_null"]
+            records.append(record)
+        return pd.DataFrame.from_records(records)
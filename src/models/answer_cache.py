@@ -0,0 +1,118 @@
+"""
+Process-wide cache of Andy's answers, keyed by dataset fingerprint and question
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+
+def dataset_fingerprint(df):
+    """Return a short, stable fingerprint of a DataFrame's schema and contents"""
+    hasher = hashlib.sha256()
+    schema = [(str(col), str(dtype)) for col, dtype in df.dtypes.items()]
+    hasher.update(repr(schema).encode())
+
+    try:
+        row_hashes = pd.util.hash_pandas_object(df, index=False)
+    except TypeError:
+        # Unhashable cells (lists, dicts) - fall back to their string form
+        row_hashes = pd.util.hash_pandas_object(df.astype(str), index=False)
+    hasher.update(row_hashes.values.tobytes())
+
+    return hasher.hexdigest()[:16]
+
+
+def extend_fingerprint(fingerprint, appended_rows):
+    """Fingerprint of a dataset after rows were appended, in O(new rows)"""
+    hasher = hashlib.sha256(fingerprint.encode())
+    hasher.update(dataset_fingerprint(appended_rows).encode())
+    return hasher.hexdigest()[:16]
+
+
+def normalize_question(question):
+    """Normalize a question so trivially different phrasings share a cache key"""
+    normalized = re.sub(r"\s+", " ", question.strip().lower())
+    return normalized.rstrip(" ?!.")
+
+
+class AnswerCache:
+    """Thread-safe LRU cache of answers with a time-to-live"""
+
+    def __init__(self, max_entries=256, ttl_seconds=3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, fingerprint, question):
+        return (fingerprint, normalize_question(question))
+
+    def get(self, fingerprint, question):
+        """Return the cached answer for a question, or None"""
+        key = self._key(fingerprint, question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry["stored_at"] > self.ttl_seconds:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry["answer"]
+
+    def put(self, fingerprint, question, answer, source="interactive", recipe=None):
+        """Store an answer, evicting the least recently used entry if full
+
+        recipe is the replayable recipe of the run that produced the answer.
+        """
+        key = self._key(fingerprint, question)
+        with self._lock:
+            self._entries[key] = {
+                "answer": answer,
+                "source": source,
+                "recipe": recipe,
+                "stored_at": time.time(),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def recipe_for(self, fingerprint, question):
+        """The recipe stored with a cached answer, or None"""
+        with self._lock:
+            entry = self._entries.get(self._key(fingerprint, question))
+            return None if entry is None else entry["recipe"]
+
+    def entries_for(self, fingerprint, prefix=""):
+        """Return {normalized question: answer} for one dataset"""
+        with self._lock:
+            return {
+                question: entry["answer"]
+                for (fp, question), entry in self._entries.items()
+                if fp == fingerprint and question.startswith(prefix)
+            }
+
+    def clear(self, fingerprint=None):
+        """Drop every entry, or only the entries of one dataset"""
+        with self._lock:
+            if fingerprint is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == fingerprint]:
+                del self._entries[key]
+
+
+# One cache, so a dataset prefetched in one session serves them all
+answer_cache = AnswerCache(
+    max_entries=int(os.getenv("ANDY_ANSWER_CACHE_SIZE", "256")),
+    ttl_seconds=float(os.getenv("ANDY_ANSWER_CACHE_TTL", "3600")),
+)
@@ -0,0 +1,327 @@
+"""
+Headless batch mode: run a fixed question set against many datasets.
+
+A manifest lists the datasets and the questions to ask about each. The
+questions run through a bounded pool at batch priority on the shared LLM
+scheduler, dataset by dataset: a dataset is loaded when its first question
+starts and dropped after its last. Each result is appended to a JSONL file
+as soon as it finishes. Re-running the same command skips everything already
+in the output, so an interrupted nightly run picks up where it stopped.
+
+Manifest (JSON):
+    {
+        "questions": ["What are the top categories by amount?"],
+        "datasets": [
+            "exports/north.csv",
+            {"path": "exports/south.csv", "questions": ["Any outliers?"]}
+        ]
+    }
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import pandas as pd
+
+from src.models.budgets import AnalysisBudget, run_with_budget
+from src.models.llm_scheduler import LLM_MAX_CONCURRENCY, llm_priority, llm_scheduler
+from src.models.model_router import describe_routes, track_routes
+from src.models.pandas_agent import create_andy_the_analyst
+from src.tools.charts_and_graphs import find_run_chart_paths
+from src.tools.chart_export import chart_exporter, set_headless
+from src.tools.worker_pool import SpawnPoolExecutor
+from src.ingestion.excel_reader import read_excel_path
+
+
+def load_manifest(manifest_path):
+    """Return [(dataset path, [questions])] from a manifest file"""
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    shared_questions = manifest.get("questions", [])
+
+    jobs = []
+    for entry in manifest.get("datasets", []):
+        if isinstance(entry, str):
+            entry = {"path": entry}
+        path = entry["path"]
+        if not os.path.isabs(path):
+            path = os.path.join(base_dir, path)
+        questions = shared_questions + entry.get("questions", [])
+        jobs.append((path, questions))
+    return jobs
+
+
+def load_dataset(path):
+    """Load a CSV or Excel file (its first sheet)"""
+    if path.endswith((".xlsx", ".xls")):
+        return read_excel_path(path)
+    return pd.read_csv(path)
+
+
+class DatasetCache:
+    """Loads datasets on first use and frees them once no question needs them
+
+    With question_counts ({path: questions}) a dataset stays loaded until its
+    last question finishes. Without, only the most recently used dataset is
+    kept (a worker process answers one question at a time).
+    """
+
+    def __init__(self, question_counts=None):
+        self._remaining = dict(question_counts) if question_counts else None
+        self._frames = {}
+        self._lock = threading.Lock()
+        self._loading = {}  # path -> lock held while it is read
+
+    @contextmanager
+    def use(self, path):
+        """The dataset at path, loaded if no question holds it yet"""
+        with self._lock:
+            loading = self._loading.setdefault(path, threading.Lock())
+        try:
+            with loading:
+                df = self._frames.get(path)
+                if df is None:
+                    df = load_dataset(path)
+                    with self._lock:
+                        if self._remaining is None:
+                            self._frames.clear()
+                        self._frames[path] = df
+            yield df
+        finally:
+            if self._remaining is not None:
+                with self._lock:
+                    self._remaining[path] -= 1
+                    if self._remaining[path] <= 0:
+                        self._frames.pop(path, None)
+                        self._loading.pop(path, None)
+
+
+def completed_tasks(output_path):
+    """(dataset, question) pairs that already have a non-error result"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+
+    with open(output_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # A line cut short by the interruption
+            if record.get("status") != "error":
+                done.add((record["dataset"], record["question"]))
+    return done
+
+
+def _end_with_newline(output_path):
+    """Terminate a line cut short by an interruption before appending"""
+    if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+        return
+    with open(output_path, "rb+") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+
+
+def answer_question(datasets, dataset_path, question, cancel_event=None):
+    """Run one question against a dataset and return its JSONL record
+
+    datasets is the DatasetCache the dataset is loaded from.
+    """
+    started = time.monotonic()
+    record = {"dataset": dataset_path, "question": question}
+
+    if cancel_event is not None and cancel_event.is_set():
+        record.update(status="error", error="Interrupted before it started")
+        return record
+
+    try:
+        with datasets.use(dataset_path) as df:
+            # Own agent (and copy of the frame) per question: no shared REPL state
+            agent = create_andy_the_analyst(df.copy(), verbose=False)
+            budget = AnalysisBudget.for_question(question, df)
+            with llm_priority("batch"), track_routes() as routes:
+                run = run_with_budget(agent, question, budget, cancel_event)
+
+        charts = find_run_chart_paths(run.steps)
+        record.update(
+            status="partial" if run.partial else "ok",
+            answer=run.output,
+            stop_reason=run.stop_reason,
+            iterations=run.iterations,
+            tokens=run.tokens,
+            charts=charts,
+            tiers=describe_routes(routes),
+        )
+
+    except Exception as e:
+        record.update(status="error", error=f"{type(e).__name__}: {e}")
+
+    record["seconds"] = round(time.monotonic() - started, 2)
+    record["finished_at"] = datetime.now().isoformat(timespec="seconds")
+    return record
+
+
+# Per-process dataset cache and Ctrl+C flag for the process pool
+_process_datasets = DatasetCache()
+_process_interrupted = None
+
+
+def _init_process_worker(process_count, interrupted):
+    """Give each worker process its share of the LLM rate budget"""
+    global _process_interrupted
+    # Ctrl+C reaches the workers too; they stop through `interrupted` instead
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _process_interrupted = interrupted
+    set_headless()
+    llm_scheduler.configure(
+        requests_per_minute=llm_scheduler.request_bucket.capacity / process_count,
+        tokens_per_minute=llm_scheduler.token_bucket.capacity / process_count,
+        max_concurrency=max(1, llm_scheduler.max_concurrency // process_count),
+    )
+
+
+def _answer_in_process(dataset_path, question):
+    return answer_question(
+        _process_datasets, dataset_path, question, _process_interrupted
+    )
+
+
+def _failed_record(dataset_path, question, error):
+    """Record for a question whose worker failed before it could answer"""
+    return {
+        "dataset": dataset_path,
+        "question": question,
+        "status": "error",
+        "error": f"{type(error).__name__}: {error}",
+        "seconds": 0,
+        "finished_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def run_batch(manifest_path, output_path, workers=None, processes=0):
+    """Run every pending (dataset, question) pair, streaming results to JSONL"""
+    jobs = load_manifest(manifest_path)
+    done = completed_tasks(output_path)
+    pending = [
+        (path, question)
+        for path, questions in jobs
+        for question in questions
+        if (path, question) not in done
+    ]
+
+    total = len(pending) + len(done)
+    print(f"📋 {total} questions over {len(jobs)} datasets")
+    if done:
+        print(f"⏩ Resuming: {len(done)} already answered")
+    if not pending:
+        print("✅ Nothing left to do!")
+        return
+
+    finished = len(done)
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    _end_with_newline(output_path)
+
+    if processes:
+        # Set on Ctrl+C so that questions already running stop too
+        interrupted = multiprocessing.get_context("spawn").Event()
+        executor = SpawnPoolExecutor(
+            max_workers=processes,
+            initializer=_init_process_worker,
+            initargs=(processes, interrupted),
+        )
+        futures = {
+            executor.submit(_answer_in_process, path, question): (path, question)
+            for path, question in pending
+        }
+    else:
+        interrupted = threading.Event()
+        executor = ThreadPoolExecutor(
+            max_workers=workers or LLM_MAX_CONCURRENCY,
+            thread_name_prefix="andy-batch",
+        )
+        # Each dataset is read once and shared by its questions. They are
+        # queued dataset by dataset, so only a few datasets are in memory
+        question_counts = {}
+        for path, _ in pending:
+            question_counts[path] = question_counts.get(path, 0) + 1
+        datasets = DatasetCache(question_counts)
+        futures = {
+            executor.submit(answer_question, datasets, path, question, interrupted): (
+                path,
+                question,
+            )
+            for path, question in pending
+        }
+
+    try:
+        with open(output_path, "a") as output:
+            for future in as_completed(futures):
+                try:
+                    record = future.result()
+                except Exception as e:
+                    # e.g. a worker process died; the next run retries it
+                    record = _failed_record(*futures[future], e)
+                output.write(json.dumps(record, default=str) + "\n")
+                output.flush()
+                finished += 1
+
+                icon = {"ok": "✅", "partial": "⏱️", "error": "❌"}[record["status"]]
+                print(
+                    f"{icon} [{finished}/{total}] {os.path.basename(record['dataset'])}"
+                    f" :: {record['question'][:60]} ({record['seconds']}s)"
+                )
+    except KeyboardInterrupt:
+        print("\n🛑 Interrupted - run the same command again to resume.")
+        interrupted.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+        return
+    executor.shutdown()
+
+    pending_exports = chart_exporter.metrics()["pending"]
+    if pending_exports:
+        print(f"🖼️ Finishing {pending_exports} static chart exports...")
+        chart_exporter.wait()
+
+    print(f"🎉 Batch complete! Results in {output_path}")
+
+
+def batch_main(argv):
+    """Entry point for `python main.py batch ...`"""
+    parser = argparse.ArgumentParser(
+        prog="main.py batch",
+        description="Run a manifest of questions against many datasets",
+    )
+    parser.add_argument("manifest", help="JSON manifest of datasets and questions")
+    parser.add_argument(
+        "-o", "--output", default="reports/batch_results.jsonl", help="JSONL output"
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=None,
+        help="Concurrent questions (threads); defaults to the LLM concurrency cap",
+    )
+    parser.add_argument(
+        "-p",
+        "--processes",
+        type=int,
+        default=0,
+        help="Use a process pool of this size instead of threads",
+    )
+    args = parser.parse_args(argv)
+
+    # Nobody is watching a browser during a batch run
+    set_headless()
+    run_batch(args.manifest, args.output, args.workers, args.processes)
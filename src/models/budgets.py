@@ -0,0 +1,291 @@
+"""
+Per-question budgets for Andy's agent runs.
+
+Each question gets a wall-time, token and iteration budget sized to the kind
+of question and the size of the data. The run is driven step by step so it
+can stop early - when a budget runs out, when Andy keeps repeating the same
+tool call or error, or when the user cancels - and still return a partial
+answer built from what was found so far.
+
+The wall-time budget holds within a step too. LLM calls are sent with the
+time that is left as their timeout, and the run returns at the deadline or
+on cancel even while a Python snippet is still executing. Python cannot
+interrupt that snippet, so it finishes in the background and the abandoned
+run is refused its next LLM or tool call.
+"""
+
+import contextvars
+import os
+import queue
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from src.models.llm_scheduler import DeadlineExceeded, llm_deadline
+from src.models.model_router import model_router
+
+ANALYSIS_BUDGET = {
+    "max_seconds": float(os.getenv("ANDY_BUDGET_SECONDS", "180")),
+    "max_tokens": int(os.getenv("ANDY_BUDGET_TOKENS", "150000")),
+    "max_iterations": int(os.getenv("ANDY_BUDGET_ITERATIONS", "15")),
+}
+SIMPLE_BUDGET = {
+    "max_seconds": float(os.getenv("ANDY_SIMPLE_BUDGET_SECONDS", "60")),
+    "max_tokens": int(os.getenv("ANDY_SIMPLE_BUDGET_TOKENS", "40000")),
+    "max_iterations": int(os.getenv("ANDY_SIMPLE_BUDGET_ITERATIONS", "6")),
+}
+
+ERROR_MARKERS = ("Error:", "Traceback", "Exception:")
+
+
+class AnalysisBudget:
+    """Limits for a single question"""
+
+    def __init__(
+        self,
+        max_seconds,
+        max_tokens,
+        max_iterations,
+        max_repeated_calls=2,
+        max_repeated_errors=2,
+    ):
+        self.max_seconds = max_seconds
+        self.max_tokens = max_tokens
+        self.max_iterations = max_iterations
+        self.max_repeated_calls = max_repeated_calls
+        self.max_repeated_errors = max_repeated_errors
+
+    @classmethod
+    def for_question(cls, question, df=None):
+        """Budget sized to the question type and the number of rows"""
+        base = (
+            SIMPLE_BUDGET
+            if model_router.is_simple_question(question)
+            else ANALYSIS_BUDGET
+        )
+
+        # Big frames make every pandas step slower; allow up to 3x the time
+        rows = len(df) if df is not None else 0
+        time_scale = 1 + min(2.0, rows / 1_000_000)
+
+        return cls(
+            max_seconds=base["max_seconds"] * time_scale,
+            max_tokens=base["max_tokens"],
+            max_iterations=base["max_iterations"],
+        )
+
+
+class TokenCounter(BaseCallbackHandler):
+    """Adds up the tokens reported by every LLM call in a run"""
+
+    def __init__(self):
+        self.tokens = 0
+
+    def on_llm_end(self, response, **kwargs):
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None) or {}
+                self.tokens += usage.get("total_tokens", 0)
+
+
+class RunAbandoned(Exception):
+    """Raised inside an agent run that its caller has stopped waiting for"""
+
+
+class _RunGate(BaseCallbackHandler):
+    """Refuses every LLM and tool call once the run has been abandoned"""
+
+    raise_error = True
+
+    def __init__(self):
+        self.abandoned = threading.Event()
+
+    def _check(self):
+        if self.abandoned.is_set():
+            raise RunAbandoned("Agent run abandoned")
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self._check()
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self._check()
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        self._check()
+
+
+def _drive(agent, question, callbacks, deadline, events):
+    """Worker: feed the agent's chunks, then ("done"/"error", ...), to events"""
+    try:
+        with llm_deadline(deadline):
+            for chunk in agent.iter({"input": question}, callbacks=callbacks):
+                events.put(("chunk", chunk))
+    except BaseException as e:
+        events.put(("error", e))
+    else:
+        events.put(("done", None))
+
+
+class AnalysisRun:
+    """Outcome of a budgeted run"""
+
+    def __init__(self, output, stop_reason, steps, tokens, iterations, seconds):
+        self.output = output
+        self.stop_reason = stop_reason
+        self.steps = steps
+        self.tokens = tokens
+        self.iterations = iterations
+        self.seconds = seconds
+
+    @property
+    def partial(self):
+        return self.stop_reason != "finished"
+
+
+STOP_MESSAGES = {
+    "time": "I hit my time budget",
+    "tokens": "I used up my token budget",
+    "iterations": "I hit my step limit",
+    "repeated_call": "I caught myself running the same step over and over",
+    "repeated_error": "I kept hitting the same error",
+    "cancelled": "you asked me to stop",
+}
+
+
+def _truncate(text, limit=600):
+    text = str(text)
+    return text if len(text) <= limit else text[:limit] + " …"
+
+
+def partial_answer(stop_reason, steps):
+    """Summarize the steps completed so far into a partial answer"""
+    lines = [
+        f"⏱️ {STOP_MESSAGES[stop_reason]}, so here's what I found before stopping:"
+    ]
+    useful = [
+        (action, observation)
+        for action, observation in steps
+        if not str(observation).startswith(ERROR_MARKERS)
+    ]
+    if not useful:
+        lines.append("\nI didn't get any results yet - try a narrower question! 🤓")
+        return "\n".join(lines)
+
+    for action, observation in useful[-3:]:
+        tool_input = action.tool_input
+        if isinstance(tool_input, dict):
+            tool_input = tool_input.get("query", tool_input)
+        lines.append(
+            f"\n**`{action.tool}`**\n```python\n{_truncate(tool_input, 300)}\n```"
+        )
+        lines.append(f"```\n{_truncate(observation)}\n```")
+    return "\n".join(lines)
+
+
+def _check_step(budget, step, seen_calls, seen_errors):
+    """Return a stop reason if this step shows Andy going in circles"""
+    action, observation = step
+
+    call = (action.tool, str(action.tool_input))
+    seen_calls[call] = seen_calls.get(call, 0) + 1
+    if seen_calls[call] > budget.max_repeated_calls:
+        return "repeated_call"
+
+    observation = str(observation)
+    if observation.startswith(ERROR_MARKERS) or "Traceback" in observation:
+        seen_errors[observation] = seen_errors.get(observation, 0) + 1
+        if seen_errors[observation] > budget.max_repeated_errors:
+            return "repeated_error"
+    return None
+
+
+def run_with_budget(agent, question, budget, cancel_event=None, on_step=None):
+    """Run the agent on a question, stopping early when the budget is spent
+
+    on_step(action, observation) is called after every tool call.
+    """
+    counter = TokenCounter()
+    gate = _RunGate()
+    started = time.monotonic()
+    deadline = started + budget.max_seconds
+    steps, seen_calls, seen_errors = [], {}, {}
+    iterations = 0
+
+    def finish(output, reason):
+        return AnalysisRun(
+            output=output if output is not None else partial_answer(reason, steps),
+            stop_reason=reason,
+            steps=steps,
+            tokens=counter.tokens,
+            iterations=iterations,
+            seconds=time.monotonic() - started,
+        )
+
+    # The agent runs on its own thread (with this thread's context vars) so
+    # a deadline or cancel can end the run in the middle of a step
+    events = queue.Queue()
+    threading.Thread(
+        target=contextvars.copy_context().run,
+        args=(_drive, agent, question, [counter, gate], deadline, events),
+        name="andy-budgeted-run",
+        daemon=True,
+    ).start()
+
+    try:
+        while True:
+            try:
+                kind, chunk = events.get(
+                    timeout=min(0.25, max(0.0, deadline - time.monotonic()))
+                )
+            except queue.Empty:
+                if cancel_event is not None and cancel_event.is_set():
+                    return finish(None, "cancelled")
+                if time.monotonic() >= deadline:
+                    return finish(None, "time")
+                continue
+
+            if kind == "error":
+                if isinstance(chunk, DeadlineExceeded):
+                    return finish(None, "time")
+                raise chunk
+            if kind == "done":
+                return finish(None, "iterations")
+
+            if "intermediate_step" not in chunk:
+                output = chunk.get("output")
+                # The executor's own limits yield a canned message; ours is better
+                if output and not output.startswith("Agent stopped due to"):
+                    return finish(output, "finished")
+                limit = agent.max_execution_time
+                out_of_time = limit and time.monotonic() - started >= limit
+                return finish(None, "time" if out_of_time else "iterations")
+
+            iterations += 1
+            stop_reason = None
+            for step in chunk["intermediate_step"]:
+                steps.append(step)
+                if on_step is not None:
+                    on_step(*step)
+                stop_reason = stop_reason or _check_step(
+                    budget, step, seen_calls, seen_errors
+                )
+
+            if cancel_event is not None and cancel_event.is_set():
+                stop_reason = "cancelled"
+            elif time.monotonic() - started > budget.max_seconds:
+                stop_reason = "time"
+            elif counter.tokens > budget.max_tokens:
+                stop_reason = "tokens"
+            elif iterations >= budget.max_iterations:
+                stop_reason = "iterations"
+
+            if stop_reason:
+                return finish(None, stop_reason)
+
+    except KeyboardInterrupt:
+        # Ctrl+C in the CLI cancels the question, not the whole session
+        return finish(None, "cancelled")
+    finally:
+        gate.abandoned.set()
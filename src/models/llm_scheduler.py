@@ -0,0 +1,338 @@
+"""
+Process-wide, rate-limit-aware scheduler for Andy's LLM calls.
+
+Every session shares one pooled client per model. Calls queue by priority
+(interactive questions ahead of prefetch and batch work), wait for the
+request and token buckets to refill, and retry 429s and overloads with
+jittered exponential backoff instead of hammering the provider in lockstep.
+"""
+
+import contextvars
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+import anthropic
+from dotenv import load_dotenv
+from langchain_anthropic import ChatAnthropic
+
+load_dotenv()
+
+PRIORITIES = {"interactive": 0, "batch": 1, "prefetch": 2}
+
+
+def _positive_setting(name, default, cast=float):
+    """Read a limit that must be above zero from the environment"""
+    value = cast(os.getenv(name, default))
+    if value <= 0:
+        raise ValueError(f"{name} must be greater than 0, got {value}")
+    return value
+
+
+LLM_REQUESTS_PER_MINUTE = _positive_setting("ANDY_LLM_RPM", "50")
+LLM_TOKENS_PER_MINUTE = _positive_setting("ANDY_LLM_TPM", "40000")
+LLM_MAX_CONCURRENCY = _positive_setting("ANDY_LLM_MAX_CONCURRENCY", "8", int)
+LLM_MAX_RETRIES = int(os.getenv("ANDY_LLM_MAX_RETRIES", "6"))
+LLM_BACKOFF_BASE = float(os.getenv("ANDY_LLM_BACKOFF_BASE", "1.0"))
+LLM_BACKOFF_MAX = float(os.getenv("ANDY_LLM_BACKOFF_MAX", "60"))
+
+RETRYABLE_ERRORS = (
+    anthropic.RateLimitError,
+    anthropic.InternalServerError,
+    anthropic.APIConnectionError,
+)
+# 529 overloads have their own class in newer SDKs, outside InternalServerError
+if hasattr(anthropic, "OverloadedError"):
+    RETRYABLE_ERRORS += (anthropic.OverloadedError,)
+
+_current_priority = contextvars.ContextVar("andy_llm_priority", default="interactive")
+_current_deadline = contextvars.ContextVar("andy_llm_deadline", default=None)
+
+
+@contextmanager
+def llm_priority(name):
+    """Run the LLM calls made inside this block at the given priority"""
+    token = _current_priority.set(name)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+@contextmanager
+def llm_deadline(deadline):
+    """Cut off the LLM calls made inside this block at a time.monotonic() deadline
+
+    Calls wait in the queue, back off and run only until the deadline; each
+    request is sent with the time that is left as its timeout.
+    """
+    token = _current_deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _current_deadline.reset(token)
+
+
+def time_left():
+    """Seconds until the current deadline, or None without one
+
+    Raises DeadlineExceeded once the deadline has passed.
+    """
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded("LLM call deadline passed")
+    return remaining
+
+
+class RetriesExhausted(Exception):
+    """Raised when a call keeps failing after every retry"""
+
+
+class DeadlineExceeded(Exception):
+    """Raised when an LLM call cannot finish before the llm_deadline"""
+
+
+class TokenBucket:
+    """Classic token bucket; not thread-safe on its own"""
+
+    def __init__(self, capacity, refill_per_second):
+        if refill_per_second <= 0:
+            raise ValueError("A token bucket needs a positive refill rate")
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity,
+            self.tokens + (now - self.updated_at) * self.refill_per_second,
+        )
+        self.updated_at = now
+
+    def time_until(self, amount):
+        """Seconds until `amount` tokens are available (0 if they are now)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_per_second
+
+    def take(self, amount):
+        """Debit tokens; the balance may go negative when reconciling usage"""
+        self._refill()
+        self.tokens -= amount
+
+
+class LLMRequestScheduler:
+    """Priority queue in front of the provider, gated by rate limits"""
+
+    def __init__(
+        self,
+        requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+        max_concurrency=LLM_MAX_CONCURRENCY,
+        max_retries=LLM_MAX_RETRIES,
+        backoff_base=LLM_BACKOFF_BASE,
+        backoff_max=LLM_BACKOFF_MAX,
+    ):
+        self.request_bucket = TokenBucket(requests_per_minute, requests_per_minute / 60)
+        self.token_bucket = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self.stats = {"calls": 0, "retries": 0, "rate_limited": 0, "failures": 0}
+
+    def configure(self, requests_per_minute, tokens_per_minute, max_concurrency):
+        """Replace the limits, e.g. to split the budget across worker processes"""
+        with self._cond:
+            self.request_bucket = TokenBucket(
+                requests_per_minute, requests_per_minute / 60
+            )
+            self.token_bucket = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+            self.max_concurrency = max_concurrency
+            self._cond.notify_all()
+
+    def _wait_time(self, ticket, tokens):
+        """Seconds this ticket must still wait, or None to wait for a notify"""
+        if self._waiting[0] != ticket or self._in_flight >= self.max_concurrency:
+            return None
+
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            return pause
+
+        return max(
+            self.request_bucket.time_until(1), self.token_bucket.time_until(tokens)
+        )
+
+    def _acquire(self, priority, tokens):
+        ticket = (PRIORITIES.get(priority, len(PRIORITIES)), next(self._sequence))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    wait = self._wait_time(ticket, tokens)
+                    if wait == 0:
+                        break
+                    remaining = time_left()
+                    if remaining is not None:
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self._cond.wait(timeout=wait)
+            except BaseException:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+                raise
+
+            heapq.heappop(self._waiting)
+            self.request_bucket.take(1)
+            self.token_bucket.take(tokens)
+            self._in_flight += 1
+            self._cond.notify_all()
+
+    def _release(self, token_adjustment=0):
+        with self._cond:
+            self._in_flight -= 1
+            if token_adjustment:
+                self.token_bucket.take(token_adjustment)
+            self._cond.notify_all()
+
+    def _backoff(self, attempt, error):
+        """Full-jitter exponential backoff, never shorter than retry-after"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+        response = getattr(error, "response", None)
+        retry_after = (
+            response.headers.get("retry-after") if response is not None else None
+        )
+        try:
+            delay = max(delay, float(retry_after))
+        except (TypeError, ValueError):
+            pass
+
+        if isinstance(error, anthropic.RateLimitError):
+            # Hold everyone back, not just this caller, to avoid a herd
+            with self._cond:
+                self.stats["rate_limited"] += 1
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        return delay
+
+    def run(self, call, priority=None, estimated_tokens=1000, usage_of=None):
+        """Run call() once the scheduler admits it, retrying transient errors
+
+        usage_of(result) may return the tokens actually used so the token
+        bucket can be corrected after the fact.
+        """
+        priority = priority or _current_priority.get()
+
+        for attempt in range(self.max_retries + 1):
+            self._acquire(priority, estimated_tokens)
+            adjustment = 0
+            try:
+                result = call()
+                if usage_of is not None:
+                    used = usage_of(result)
+                    if used:
+                        adjustment = used - estimated_tokens
+                with self._cond:
+                    self.stats["calls"] += 1
+                return result
+
+            except RETRYABLE_ERRORS as e:
+                last_error = e
+                delay = self._backoff(attempt, e)
+            finally:
+                self._release(adjustment)
+
+            if attempt == self.max_retries:
+                break
+            remaining = time_left()
+            if remaining is not None and remaining <= delay:
+                raise DeadlineExceeded(
+                    f"No time left to retry the LLM call: {last_error}"
+                ) from last_error
+            with self._cond:
+                self.stats["retries"] += 1
+            time.sleep(delay)
+
+        with self._cond:
+            self.stats["failures"] += 1
+        raise RetriesExhausted(
+            f"LLM call failed after {self.max_retries + 1} attempts: {last_error}"
+        ) from last_error
+
+    def snapshot(self):
+        """Current queue depth, in-flight calls and counters"""
+        with self._cond:
+            return {
+                "queued": len(self._waiting),
+                "in_flight": self._in_flight,
+                "paused_for": max(0.0, self._paused_until - time.monotonic()),
+                **self.stats,
+            }
+
+
+# One scheduler for the whole process
+llm_scheduler = LLMRequestScheduler()
+
+
+def estimate_tokens(messages):
+    """Rough token estimate (~4 characters per token) for a list of messages"""
+    return sum(len(str(message.content)) for message in messages) // 4 + 1
+
+
+def _usage_tokens(result):
+    usage = getattr(result.generations[0].message, "usage_metadata", None) or {}
+    return usage.get("total_tokens")
+
+
+class ScheduledChatAnthropic(ChatAnthropic):
+    """ChatAnthropic whose requests go through the shared scheduler"""
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        parent = super()
+        estimated = estimate_tokens(messages) + min(self.max_tokens, 1024)
+
+        def call():
+            # Sent once admitted, so the timeout is what is left by then
+            remaining = time_left()
+            if remaining is not None:
+                kwargs["timeout"] = remaining
+            return parent._generate(
+                messages, stop=stop, run_manager=run_manager, **kwargs
+            )
+
+        return llm_scheduler.run(
+            call,
+            estimated_tokens=estimated,
+            usage_of=_usage_tokens,
+        )
+
+
+@lru_cache(maxsize=None)
+def get_shared_llm(model="claude-sonnet-4-20250514"):
+    """Return the process-wide, connection-pooled chat model for `model`"""
+    return ScheduledChatAnthropic(
+        model=model,
+        api_key=os.getenv("ANTHROPIC_API_KEY"),
+        temperature=0.0,
+        max_retries=0,  # The scheduler owns retries and backoff
+        disable_streaming=True,  # Every call goes through _generate
+    )
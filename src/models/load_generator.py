@@ -0,0 +1,588 @@
+"""
+Concurrent-session load generator.
+
+Simulates analysts working at once. Each simulated user loads a
+synthetic dataset, looks at it and asks a few questions, either through the
+CLI's AndySession or through the Streamlit utility functions (load_data_file,
+display_data_preview, ask_andy). The LLM is the stand-in server with a
+configurable latency distribution.
+
+CLI users run as threads of one spawned process, like sessions of one
+server: they share its LLM scheduler, memory budget and chart export pool,
+and their narration goes to that process's /dev/null. Streamlit users get a
+spawned process each, because AppTest keeps one Streamlit runtime per
+process and tears it down after each run, so its sessions cannot run side
+by side. They therefore don't share an answer cache or single-flight runs
+the way tabs on one server do, and each applies its LLM limits alone. The
+CLI path has neither, so no simulated user gets an answer from another's
+run. The stand-in LLM, started here, serves them all.
+
+Latencies are timed around whole operations, so a Streamlit question
+includes its script rerun. The wait for Andy's answer in ask_andy wakes as
+soon as the answer is in, so they are not rounded up to its polling
+interval.
+
+Concurrency ramps up level by level. Each level reports throughput,
+p50/p95/p99 latency per operation, CPU saturation and the peak RSS of every
+process in the tree (the CLI users' process, each Streamlit user's process
+and their chart export workers).
+
+Usage:
+    python -m src.models.load_generator --users 1,4,16 --mode mixed \\
+        --rows 100000 --latency 1.0 --latency-distribution lognormal
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from src.tools.worker_pool import SpawnPoolExecutor
+
+DEFAULT_QUESTIONS = [
+    "How many rows and columns are there?",
+    "What are the top categories by amount?",
+    "Show me the sales trend by month",
+]
+
+MODES = ("cli", "streamlit", "mixed")
+
+MB = 1024**2
+
+# Seconds every user process gets to start up before a level is abandoned
+START_TIMEOUT = 300
+# Seconds a user process waits for its chart exports once its users are done
+EXPORT_TIMEOUT = 60
+
+
+def make_dataset(rows, extra_columns=0, seed=0):
+    """Synthetic sales data shaped like data/sample_sales_data.csv"""
+    rng = np.random.default_rng(seed)
+    products = {
+        "Laptop": "Electronics",
+        "Smartphone": "Electronics",
+        "Coffee Maker": "Appliances",
+        "Desk Chair": "Furniture",
+        "Book Set": "Books",
+        "Notebook": "Office Supplies",
+        "Coffee Beans": "Food",
+    }
+    product = rng.choice(list(products), rows)
+    df = pd.DataFrame(
+        {
+            "Date": pd.Timestamp("2024-01-01")
+            + pd.to_timedelta(rng.integers(0, 365, rows), unit="D"),
+            "Product": product,
+            "Category": pd.Series(product).map(products).to_numpy(),
+            "Amount": rng.gamma(2.0, 150.0, rows).round(2),
+            "Quantity": rng.integers(1, 10, rows),
+            "Region": rng.choice(["North", "South", "East", "West"], rows),
+        }
+    )
+    for i in range(extra_columns):
+        df[f"Metric_{i + 1}"] = rng.normal(100, 15, rows).round(3)
+    return df
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile; None for no values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def _read_proc_stat(pid):
+    """(ppid, name, cpu seconds, rss bytes) of a process from /proc"""
+    with open(f"/proc/{pid}/stat") as f:
+        stat = f.read()
+    name = stat[stat.index("(") + 1 : stat.rindex(")")]
+    fields = stat[stat.rindex(")") + 2 :].split()
+    ticks = os.sysconf("SC_CLK_TCK")
+    cpu = (int(fields[11]) + int(fields[12])) / ticks
+    rss = int(fields[21]) * os.sysconf("SC_PAGE_SIZE")
+    return int(fields[1]), name, cpu, rss
+
+
+def _process_label(pid, name):
+    if pid == os.getpid():
+        return "main"
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            cmdline = f.read()
+    except OSError:
+        cmdline = b""
+    if b"resource_tracker" in cmdline:
+        return f"resource_tracker[{pid}]"
+    if b"multiprocessing" in cmdline:
+        return f"worker[{pid}]"
+    return f"{name}[{pid}]"
+
+
+def process_tree_stats():
+    """{label: (cpu seconds, rss bytes)} for this process and its descendants
+
+    Falls back to this process alone (via os.times) without /proc.
+    """
+    if not os.path.isdir("/proc"):
+        times = os.times()
+        import resource
+
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS, kilobytes elsewhere
+        rss *= 1 if sys.platform == "darwin" else 1024
+        return {"main": (times.user + times.system, rss)}
+
+    processes = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                processes[int(entry)] = _read_proc_stat(entry)
+            except (OSError, ValueError, IndexError):
+                continue  # Exited while we looked
+
+    tree, frontier = {}, [os.getpid()]
+    while frontier:
+        pid = frontier.pop()
+        if pid not in processes or pid in tree:
+            continue
+        _, name, cpu, rss = processes[pid]
+        tree[pid] = (_process_label(pid, name), cpu, rss)
+        frontier += [child for child, info in processes.items() if info[0] == pid]
+    return {label: (cpu, rss) for label, cpu, rss in tree.values()}
+
+
+class ResourceSampler:
+    """Samples CPU and RSS of the process tree on a background thread"""
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.peak_rss = {}  # label -> bytes
+        self.peak_cpu = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _cpu_seconds(self, stats):
+        return sum(cpu for cpu, _ in stats.values())
+
+    def _sample(self):
+        last_cpu, last_time = self.cpu_start, self.started
+        while not self._stop.wait(self.interval):
+            stats = process_tree_stats()
+            now = time.monotonic()
+            for label, (_, rss) in stats.items():
+                self.peak_rss[label] = max(self.peak_rss.get(label, 0), rss)
+            cpu = self._cpu_seconds(stats)
+            # Exited workers take their CPU seconds with them; skip that dip
+            if cpu >= last_cpu:
+                busy = (cpu - last_cpu) / (now - last_time) / (os.cpu_count() or 1)
+                # Clock-tick rounding can nudge a short interval past 100%
+                self.peak_cpu = max(self.peak_cpu, min(busy, 1.0))
+            last_cpu, last_time = cpu, now
+
+    def start(self):
+        self.started = time.monotonic()
+        self.cpu_start = self._cpu_seconds(process_tree_stats())
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop sampling; returns mean CPU saturation over the run (0-1)"""
+        self._stop.set()
+        self._thread.join()
+        stats = process_tree_stats()
+        for label, (_, rss) in stats.items():
+            self.peak_rss[label] = max(self.peak_rss.get(label, 0), rss)
+        elapsed = time.monotonic() - self.started
+        cpu = max(0.0, self._cpu_seconds(stats) - self.cpu_start)
+        return cpu / elapsed / (os.cpu_count() or 1) if elapsed else 0.0
+
+
+@dataclass
+class Timing:
+    operation: str
+    seconds: float
+    ok: bool = True
+
+
+@dataclass
+class LevelReport:
+    """Results of one concurrency level"""
+
+    users: int
+    mode: str
+    seconds: float = 0.0
+    timings: list = field(default_factory=list)
+    cpu_mean: float = 0.0
+    cpu_peak: float = 0.0
+    peak_rss: dict = field(default_factory=dict)
+    llm_calls: int = 0
+
+    def latencies(self, operation):
+        return [t.seconds for t in self.timings if t.operation == operation and t.ok]
+
+    def errors(self):
+        return sum(not t.ok for t in self.timings)
+
+    def questions_per_minute(self):
+        answered = len(self.latencies("ask"))
+        return 60 * answered / self.seconds if self.seconds else 0.0
+
+    def summary(self):
+        operations = dict.fromkeys(t.operation for t in self.timings)
+        return {
+            "users": self.users,
+            "mode": self.mode,
+            "seconds": round(self.seconds, 2),
+            "questions_per_minute": round(self.questions_per_minute(), 1),
+            "errors": self.errors(),
+            "llm_calls": self.llm_calls,
+            "latency": {
+                operation: {
+                    f"p{pct}": _round(percentile(self.latencies(operation), pct))
+                    for pct in (50, 95, 99)
+                }
+                for operation in operations
+            },
+            "cpu_mean": round(self.cpu_mean, 3),
+            "cpu_peak": round(self.cpu_peak, 3),
+            "peak_rss_mb": {
+                label: round(rss / MB, 1) for label, rss in self.peak_rss.items()
+            },
+        }
+
+
+def _round(value):
+    return None if value is None else round(value, 3)
+
+
+def _timed(timings, operation, call, ok=lambda result: True):
+    started = time.monotonic()
+    try:
+        result = call()
+        success = ok(result)
+    except Exception:
+        result, success = None, False
+    timings.append(Timing(operation, time.monotonic() - started, success))
+    return result
+
+
+def run_cli_user(user_id, dataset_path, questions, think_time=0.0):
+    """One analyst on the CLI path: load, then ask each question"""
+    from main import AndySession
+
+    timings = []
+    session = AndySession(session_id=f"load-{user_id}")
+    if not _timed(timings, "load", lambda: session.load_data(dataset_path), bool):
+        return timings
+    for question in questions:
+        time.sleep(think_time * random.random())
+        _timed(
+            timings,
+            "ask",
+            lambda: session.ask_andy(question),
+            lambda answer: not answer.startswith("🚨"),
+        )
+    return timings
+
+
+def _streamlit_user_script():
+    """AppTest script: performs the action the load generator put in state"""
+    import io
+
+    import streamlit as st
+
+    from src.streamlit_utils.andy_interface import ask_andy
+    from src.streamlit_utils.data_handler import load_data_file
+    from src.streamlit_utils.session_manager import initialize_session_state
+    from src.streamlit_utils.ui_components import display_data_preview
+
+    initialize_session_state()
+    action, argument = st.session_state.load_test_action
+    if action == "load":
+        upload = io.BytesIO(argument["data"])
+        upload.name = argument["name"]
+        st.session_state.load_test_result = load_data_file(upload) is not None
+    elif action == "preview":
+        display_data_preview()
+        st.session_state.load_test_result = True
+    elif action == "ask":
+        answer = ask_andy(argument)
+        st.session_state.load_test_result = not answer.startswith("🚨")
+
+
+def run_streamlit_user(user_id, dataset_path, questions, think_time=0.0, timeout=600):
+    """One analyst on the Streamlit path, each action a script rerun"""
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_function(_streamlit_user_script, default_timeout=timeout)
+    with open(dataset_path, "rb") as f:
+        upload = {"data": f.read(), "name": os.path.basename(dataset_path)}
+
+    def perform(action, argument=None):
+        app.session_state["load_test_action"] = (action, argument)
+        app.session_state["load_test_result"] = False
+        app.run()
+        return not app.exception and app.session_state["load_test_result"]
+
+    timings = []
+    if not _timed(timings, "load", lambda: perform("load", upload), bool):
+        return timings
+    _timed(timings, "preview", lambda: perform("preview"), bool)
+    for question in questions:
+        time.sleep(think_time * random.random())
+        _timed(timings, "ask", lambda: perform("ask", question), bool)
+
+    # The tab closes: its prefetch stops before the process does
+    job = app.session_state["prefetch_job"]
+    if job is not None:
+        job.cancel()
+        futures.wait(job.futures)
+    return timings
+
+
+# Set in each user process by _start_user_process
+_start_barrier = None
+
+
+def _start_user_process(barrier, llm_rpm):
+    """Worker initializer: import and configure, then start with the others"""
+    global _start_barrier
+    # The CLI path narrates loads and Andy's thinking; silence this process
+    sys.stdout = open(os.devnull, "w")
+    from src.models.llm_scheduler import llm_scheduler
+
+    if llm_rpm:
+        llm_scheduler.configure(
+            requests_per_minute=llm_rpm,
+            tokens_per_minute=llm_rpm * 1000,
+            max_concurrency=llm_scheduler.max_concurrency,
+        )
+    # Imported up front so the first operation's timing doesn't include it
+    import main
+    import streamlit.testing.v1
+
+    _start_barrier = barrier
+
+
+def _run_user_process(user_ids, use_cli, dataset_paths, questions, think_time):
+    """Worker: simulated users; returns (timings, LLM calls made)
+
+    CLI users run on threads of this process; a Streamlit user has it alone.
+    """
+    from src.models.llm_scheduler import llm_scheduler
+    from src.tools.chart_export import chart_exporter
+
+    _start_barrier.wait(START_TIMEOUT)
+    runner = run_cli_user if use_cli else run_streamlit_user
+    with ThreadPoolExecutor(max_workers=len(user_ids)) as threads:
+        runs = [
+            threads.submit(runner, user_id, path, questions, think_time)
+            for user_id, path in zip(user_ids, dataset_paths)
+        ]
+    timings = [timing for run in runs for timing in run.result()]
+    chart_exporter.wait(EXPORT_TIMEOUT)
+    chart_exporter.shutdown()
+    return timings, llm_scheduler.stats["calls"]
+
+
+def run_level(users, mode, dataset_paths, questions, think_time=0.0, llm_rpm=None):
+    """Run `users` simulated analysts at once; returns a LevelReport
+
+    Every process imports everything first; timing and resource sampling
+    start once all of them are ready.
+    """
+    # Run as `python -m`, this file is __main__, which workers don't load
+    from src.models import load_generator
+
+    cli_users = [
+        user_id
+        for user_id in range(users)
+        if mode == "cli" or (mode == "mixed" and user_id % 2 == 0)
+    ]
+    # (user ids, use_cli) per process: the CLI users together, then one
+    # process per Streamlit user
+    groups = [(cli_users, True)] if cli_users else []
+    groups += [
+        ([user_id], False) for user_id in range(users) if user_id not in cli_users
+    ]
+
+    report = LevelReport(users=users, mode=mode)
+    barrier = multiprocessing.get_context("spawn").Barrier(len(groups) + 1)
+    pool = SpawnPoolExecutor(
+        max_workers=len(groups),
+        initializer=load_generator._start_user_process,
+        initargs=(barrier, llm_rpm),
+    )
+    with pool:
+        runs = [
+            pool.submit(
+                load_generator._run_user_process,
+                user_ids,
+                use_cli,
+                [dataset_paths[user_id] for user_id in user_ids],
+                questions,
+                think_time,
+            )
+            for user_ids, use_cli in groups
+        ]
+        barrier.wait(START_TIMEOUT)
+        sampler = ResourceSampler().start()
+        started = time.monotonic()
+        for run in runs:
+            timings, llm_calls = run.result()
+            report.timings += timings
+            report.llm_calls += llm_calls
+        report.seconds = time.monotonic() - started
+        # Sampled before the pool shuts down, while the workers still exist
+        report.cpu_mean = sampler.stop()
+    report.cpu_peak = sampler.peak_cpu
+    report.peak_rss = sampler.peak_rss
+    return report
+
+
+def write_datasets(directory, level, users, rows, extra_columns, shared):
+    """CSV per simulated user (one for all with shared); returns their paths
+
+    Seeds differ per level too, so earlier levels' cached answers don't
+    turn later levels into cache hits.
+    """
+    paths = []
+    for user_id in range(1 if shared else users):
+        seed = level * 10_000 + user_id
+        path = os.path.join(directory, f"load_{level}_{user_id}.csv")
+        make_dataset(rows, extra_columns, seed).to_csv(path, index=False)
+        paths.append(path)
+    return paths * users if shared else paths
+
+
+def print_level(report):
+    summary = report.summary()
+    print(
+        f"\n👥 {report.users} users ({report.mode}): {report.seconds:.1f}s, "
+        f"{summary['questions_per_minute']} questions/min, "
+        f"{summary['llm_calls']} LLM calls, {summary['errors']} errors"
+    )
+    for operation, stats in summary["latency"].items():
+        print(
+            f"   ⏱️ {operation:<8} p50 {stats['p50']}s  "
+            f"p95 {stats['p95']}s  p99 {stats['p99']}s"
+        )
+    print(
+        f"   🔥 CPU {summary['cpu_mean']:.0%} mean, {summary['cpu_peak']:.0%} peak "
+        f"of {os.cpu_count()} cores"
+    )
+    print(
+        "   🧮 Peak RSS: "
+        + ", ".join(f"{label} {mb} MB" for label, mb in summary["peak_rss_mb"].items())
+    )
+
+
+def main(argv=None):
+    """Ramp simulated users up and report each concurrency level"""
+    parser = argparse.ArgumentParser(
+        description="Simulate concurrent analysts against the CLI and Streamlit paths"
+    )
+    parser.add_argument(
+        "--users", default="1,2,4,8", help="Comma-separated concurrency levels"
+    )
+    parser.add_argument("--mode", choices=MODES, default="mixed")
+    parser.add_argument("--rows", type=int, default=10_000, help="Rows per dataset")
+    parser.add_argument(
+        "--columns", type=int, default=0, help="Extra numeric columns per dataset"
+    )
+    parser.add_argument(
+        "--shared-dataset",
+        action="store_true",
+        help="Every user loads the same file (each still gets its own copy and answers)",
+    )
+    parser.add_argument(
+        "--questions", nargs="+", default=DEFAULT_QUESTIONS, help="Asked by each user"
+    )
+    parser.add_argument(
+        "--think-time",
+        type=float,
+        default=0.0,
+        help="Up to this many seconds between a user's questions",
+    )
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument(
+        "--latency-distribution",
+        choices=["fixed", "uniform", "exponential", "lognormal"],
+        default="lognormal",
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--tool-rate", type=float, default=0.5)
+    parser.add_argument(
+        "--llm-url",
+        default=None,
+        help="Use a stand-in LLM already running here instead of starting one",
+    )
+    parser.add_argument(
+        "--llm-rpm",
+        type=float,
+        default=None,
+        help="Override each process's LLM scheduler requests/minute (e.g. 100000 to lift it)",
+    )
+    parser.add_argument(
+        "-o", "--output", default=None, help="Append each level's summary as JSONL"
+    )
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="andy_load_")
+    # Keep simulated sessions' recipes and spills out of the real folders
+    os.environ.setdefault("ANDY_RECIPE_DIR", os.path.join(workdir, "recipes"))
+    os.environ.setdefault("ANDY_SPILL_DIR", os.path.join(workdir, "spill"))
+    os.environ.setdefault("ANDY_HEADLESS", "1")
+    # A second export worker would mostly start up after the process's
+    # users are done, only to be shut down
+    os.environ.setdefault("ANDY_CHART_EXPORT_WORKERS", "1")
+
+    if args.llm_url:
+        base_url = args.llm_url
+    else:
+        from src.models.stub_llm_server import start_stub_server
+
+        _, base_url = start_stub_server(
+            latency=args.latency,
+            latency_distribution=args.latency_distribution,
+            error_rate=args.error_rate,
+            tool_rate=args.tool_rate,
+        )
+    os.environ["ANTHROPIC_BASE_URL"] = base_url
+    os.environ.setdefault("ANTHROPIC_API_KEY", "stub")
+
+    levels = [int(users) for users in args.users.split(",")]
+    print(
+        f"🧪 {args.mode} users {levels}, {args.rows:,} rows x "
+        f"{6 + args.columns} columns, {len(args.questions)} questions each, "
+        f"LLM {args.latency_distribution} {args.latency}s at {base_url}"
+    )
+
+    for level, users in enumerate(levels):
+        paths = write_datasets(
+            workdir, level, users, args.rows, args.columns, args.shared_dataset
+        )
+        report = run_level(
+            users, args.mode, paths, args.questions, args.think_time, args.llm_rpm
+        )
+        print_level(report)
+        if args.output:
+            with open(args.output, "a") as f:
+                f.write(json.dumps(report.summary()) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Per-session memory accounting with spill to disk.
+
+Every session's footprint is measured after each answer: the dataset Andy
+works on, the other frames his code left in the REPL namespace, and the
+conversation. When a session goes over its budget, the least recently used
+workspace frames are written to Parquet in data/interim and replaced by a
+SpilledFrame placeholder; the REPL loads them back the next time code
+mentions them. When the whole server goes over its budget, shared caches
+are evicted first, then workspace frames of any session are spilled, least
+recently used first.
+"""
+
+import os
+import shutil
+import threading
+import weakref
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from src.ingestion.excel_reader import sheet_cache
+
+SESSION_BUDGET_MB = float(os.getenv("ANDY_SESSION_MEMORY_MB", "1024"))
+TOTAL_BUDGET_MB = float(os.getenv("ANDY_TOTAL_MEMORY_MB", "4096"))
+SPILL_DIR = os.getenv("ANDY_SPILL_DIR", "data/interim")
+
+# Rows sampled to estimate the deep size of string/object columns
+SAMPLE_ROWS = 1000
+
+MB = 1024**2
+
+
+def estimate_nbytes(obj):
+    """Approximate in-memory size of a value, without an O(rows) deep scan
+
+    Fixed-width columns are measured exactly; string and object columns are
+    measured deeply on a sample of rows and scaled up.
+    """
+    if isinstance(obj, pd.DataFrame):
+        return sum(estimate_nbytes(obj.iloc[:, i]) for i in range(obj.shape[1]))
+    if isinstance(obj, pd.Series):
+        deep = obj.dtype == object or pd.api.types.is_string_dtype(obj.dtype)
+        if not deep or len(obj) <= SAMPLE_ROWS:
+            return int(obj.memory_usage(deep=True, index=False))
+        sample = obj.sample(SAMPLE_ROWS, random_state=0)
+        return int(sample.memory_usage(deep=True, index=False) * len(obj) / SAMPLE_ROWS)
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, str):
+        return len(obj)
+    if isinstance(obj, dict):
+        return sum(estimate_nbytes(value) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(estimate_nbytes(value) for value in obj)
+    return 0
+
+
+class SpilledFrame:
+    """Placeholder left in a namespace for a DataFrame spilled to Parquet"""
+
+    def __init__(self, path, nbytes, shape):
+        self.path = path
+        self.nbytes = nbytes
+        self.shape = shape
+
+    def load(self):
+        df = pd.read_parquet(self.path)
+        os.remove(self.path)
+        return df
+
+    def __repr__(self):
+        return f"<DataFrame {self.shape} spilled to {self.path}>"
+
+
+def restore_spilled(namespace, names):
+    """Load back any of names that were spilled out of namespace"""
+    for name in names:
+        value = namespace.get(name)
+        if isinstance(value, SpilledFrame):
+            namespace[name] = value.load()
+
+
+@dataclass
+class SessionUsage:
+    """Last measured footprint of one session, in bytes"""
+
+    dataset: int = 0
+    workspace: int = 0
+    workspace_frames: int = 0
+    spilled: int = 0
+    spilled_frames: int = 0
+    conversation: int = 0
+    outside: int = 0
+    spills: int = 0
+
+    @property
+    def resident(self):
+        return self.dataset + self.workspace + self.conversation
+
+
+class MemoryAccountant:
+    """Tracks every session's footprint against per-session and total budgets"""
+
+    def __init__(
+        self,
+        session_budget_mb=SESSION_BUDGET_MB,
+        total_budget_mb=TOTAL_BUDGET_MB,
+        spill_dir=SPILL_DIR,
+    ):
+        self.session_budget = int(session_budget_mb * MB)
+        self.total_budget = int(total_budget_mb * MB)
+        self.spill_dir = spill_dir
+        self._tools = {}  # session id -> weakref to the session's REPL tool
+        self._usage = {}  # session id -> SessionUsage
+        self._lock = threading.RLock()
+
+    def _session_dir(self, session_id):
+        return os.path.join(self.spill_dir, f"session_{session_id}")
+
+    def attach(self, session_id, repl_tool):
+        """Track a session's (new) REPL namespace; its old spills are dropped"""
+        with self._lock:
+            shutil.rmtree(self._session_dir(session_id), ignore_errors=True)
+            self._tools[session_id] = weakref.ref(repl_tool)
+            self._usage[session_id] = SessionUsage()
+
+    def _prune(self):
+        """Forget sessions whose agent has been garbage collected"""
+        for session_id, ref in list(self._tools.items()):
+            if ref() is None:
+                shutil.rmtree(self._session_dir(session_id), ignore_errors=True)
+                del self._tools[session_id]
+                self._usage.pop(session_id, None)
+
+    def _measure(self, session_id, conversation=None, frames=None):
+        usage = self._usage.setdefault(session_id, SessionUsage())
+        tool = self._tools.get(session_id, lambda: None)()
+        usage.dataset = usage.workspace = usage.workspace_frames = 0
+        usage.spilled = usage.spilled_frames = 0
+
+        seen = set()
+        if tool is not None:
+            for name, value in list(tool.locals.items()):
+                if isinstance(value, SpilledFrame):
+                    usage.spilled += value.nbytes
+                    usage.spilled_frames += 1
+                    continue
+                if id(value) in seen or not isinstance(
+                    value, (pd.DataFrame, pd.Series, np.ndarray)
+                ):
+                    continue
+                seen.add(id(value))
+                if name == "df":
+                    usage.dataset = estimate_nbytes(value)
+                else:
+                    usage.workspace += estimate_nbytes(value)
+                    usage.workspace_frames += isinstance(value, pd.DataFrame)
+
+        # Frames the session keeps outside the REPL (e.g. the frame as loaded,
+        # once Andy has replaced his df with a cleaned copy)
+        if frames is not None:
+            usage.outside = sum(
+                estimate_nbytes(df) for df in frames if id(df) not in seen
+            )
+        usage.dataset += usage.outside
+
+        if conversation is not None:
+            usage.conversation = estimate_nbytes(conversation)
+        return usage
+
+    def _spill_candidates(self, session_ids):
+        """(last used, session id, name) of spillable frames, oldest first"""
+        candidates = []
+        for session_id in session_ids:
+            tool = self._tools.get(session_id, lambda: None)()
+            if tool is None:
+                continue
+            for name, value in list(tool.locals.items()):
+                # df is Andy's working dataset; never pull it out from under him
+                if name != "df" and isinstance(value, pd.DataFrame):
+                    last_used = tool.names_last_used.get(name, 0)
+                    candidates.append((last_used, session_id, name))
+        return sorted(candidates)
+
+    def _spill(self, session_id, name):
+        """Write one workspace frame to Parquet; returns the bytes freed"""
+        tool = self._tools[session_id]()
+        # Skip a namespace whose code is running right now
+        if tool is None or not tool.namespace_lock.acquire(blocking=False):
+            return 0
+        try:
+            df = tool.locals.get(name)
+            if not isinstance(df, pd.DataFrame):
+                return 0
+            nbytes = estimate_nbytes(df)
+            directory = self._session_dir(session_id)
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"{name}.parquet")
+            try:
+                df.to_parquet(path)
+            except Exception:
+                return 0  # Not representable in Parquet (e.g. mixed objects)
+            tool.locals[name] = SpilledFrame(path, nbytes, df.shape)
+            self._usage[session_id].spills += 1
+            return nbytes
+        finally:
+            tool.namespace_lock.release()
+
+    def _free(self, session_ids, excess):
+        for _, session_id, name in self._spill_candidates(session_ids):
+            if excess <= 0:
+                break
+            excess -= self._spill(session_id, name)
+        return excess
+
+    def enforce(self, session_id, conversation=None, frames=None):
+        """Measure a session and bring it (and the server) back under budget
+
+        conversation and frames are what the session holds outside Andy's
+        REPL namespace. Returns the session's SessionUsage.
+        """
+        with self._lock:
+            self._prune()
+            usage = self._measure(session_id, conversation, frames)
+            if usage.resident > self.session_budget:
+                self._free([session_id], usage.resident - self.session_budget)
+                usage = self._measure(session_id, conversation, frames)
+
+            excess = self.total_usage() - self.total_budget
+            while excess > 0:
+                # Parsed workbooks can always be parsed again
+                evicted = sheet_cache.evict_oldest()
+                if evicted is None:
+                    break
+                excess -= estimate_nbytes(evicted)
+            if excess > 0:
+                self._free(list(self._tools), excess)
+                for other in list(self._tools):
+                    if other != session_id:
+                        self._measure(other)
+                usage = self._measure(session_id, conversation, frames)
+            return usage
+
+    def usage(self, session_id):
+        with self._lock:
+            return self._usage.get(session_id, SessionUsage())
+
+    def shared_usage(self):
+        """Bytes held by caches shared between sessions"""
+        return sum(estimate_nbytes(df) for df in sheet_cache.frames())
+
+    def total_usage(self):
+        with self._lock:
+            sessions = sum(usage.resident for usage in self._usage.values())
+        return sessions + self.shared_usage()
+
+    def session_count(self):
+        with self._lock:
+            return len(self._tools)
+
+
+# One accountant, so the total budget covers every session in the process
+memory_accountant = MemoryAccountant()
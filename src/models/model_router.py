@@ -0,0 +1,200 @@
+"""
+Model tiering: route each LLM call to the cheapest model that can handle it.
+
+Short factual questions and mechanical hops (handing chart code from a chart
+tool to the Python tool) go to a fast, small model. Open-ended analysis and
+recovering from errors stay on the big model. Every decision is recorded so
+latency and cost per tier can be compared.
+"""
+
+import contextvars
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from src.models.llm_scheduler import ScheduledChatAnthropic
+
+MODEL_TIERS = {
+    "fast": os.getenv("ANDY_FAST_MODEL", "claude-3-5-haiku-20241022"),
+    "smart": os.getenv("ANDY_SMART_MODEL", "claude-sonnet-4-20250514"),
+}
+
+MODEL_ROUTING_ENABLED = os.getenv("ANDY_MODEL_ROUTING", "on").lower() not in (
+    "0",
+    "off",
+    "false",
+)
+
+CHART_TOOLS = (
+    "create_time_series_chart",
+    "create_categorical_chart",
+    "create_scatter_plot",
+)
+
+_route_log = contextvars.ContextVar("andy_route_log", default=None)
+
+
+class RoutingRules:
+    """Tunable heuristics used to pick a tier"""
+
+    def __init__(
+        self,
+        simple_question_max_words=int(os.getenv("ANDY_SIMPLE_QUESTION_WORDS", "12")),
+        analytical_keywords=(
+            "analy",
+            "insight",
+            "trend",
+            "compare",
+            "why",
+            "correlat",
+            "forecast",
+            "predict",
+            "explain",
+            "pattern",
+            "anomal",
+            "outlier",
+            "recommend",
+            "segment",
+            "visuali",
+        ),
+        error_markers=("Error", "Traceback", "Exception"),
+        route_chart_handoffs=True,
+    ):
+        self.simple_question_max_words = simple_question_max_words
+        self.analytical_keywords = analytical_keywords
+        self.error_markers = error_markers
+        self.route_chart_handoffs = route_chart_handoffs
+
+
+def _question_of(messages):
+    """The user's question, without the appended conversation context"""
+    for message in messages:
+        if isinstance(message, HumanMessage):
+            return str(message.content).split("\n\nPrevious conversation context:")[0]
+    return ""
+
+
+def _last_tool_names(messages):
+    """Names of the tools the last AI message called"""
+    for message in reversed(messages):
+        if isinstance(message, AIMessage):
+            return [call["name"] for call in message.tool_calls]
+    return []
+
+
+class ModelRouter:
+    """Picks a tier per call and keeps per-tier statistics"""
+
+    def __init__(self, rules=None, tiers=None):
+        self.rules = rules or RoutingRules()
+        self.tiers = dict(tiers or MODEL_TIERS)
+        self._lock = threading.Lock()
+        self._latencies = {tier: deque(maxlen=500) for tier in self.tiers}
+        self.calls = {tier: 0 for tier in self.tiers}
+
+    def is_simple_question(self, question):
+        """Short and free of analytical keywords"""
+        words = question.split()
+        lowered = question.lower()
+        return len(words) <= self.rules.simple_question_max_words and not any(
+            keyword in lowered for keyword in self.rules.analytical_keywords
+        )
+
+    def route(self, messages):
+        """Return (tier, reason) for the next call on this message list"""
+        last = messages[-1] if messages else None
+
+        if isinstance(last, ToolMessage):
+            if any(marker in str(last.content) for marker in self.rules.error_markers):
+                return "smart", "recovering from a tool error"
+            if self.rules.route_chart_handoffs and all(
+                name in CHART_TOOLS for name in _last_tool_names(messages) or [None]
+            ):
+                return "fast", "handing chart code to the Python tool"
+
+        if self.is_simple_question(_question_of(messages)):
+            return "fast", "short factual question"
+
+        return "smart", "multi-step analysis"
+
+    def record(self, tier, reason, seconds):
+        """Log a finished call to the per-tier stats and the current route log"""
+        with self._lock:
+            self.calls[tier] += 1
+            self._latencies[tier].append(seconds)
+
+        log = _route_log.get()
+        if log is not None:
+            log.append({"tier": tier, "reason": reason, "seconds": round(seconds, 2)})
+
+    def summary(self):
+        """Call counts and median latency for each tier"""
+        with self._lock:
+            return {
+                tier: {
+                    "calls": self.calls[tier],
+                    "median_seconds": (
+                        round(statistics.median(self._latencies[tier]), 2)
+                        if self._latencies[tier]
+                        else None
+                    ),
+                }
+                for tier in self.tiers
+            }
+
+
+model_router = ModelRouter()
+
+
+@contextmanager
+def track_routes():
+    """Collect the routing decisions made inside this block into a list"""
+    routes = []
+    token = _route_log.set(routes)
+    try:
+        yield routes
+    finally:
+        _route_log.reset(token)
+
+
+def describe_routes(routes):
+    """Short human summary such as 'fast×2, smart×1'"""
+    counts = {}
+    for route in routes:
+        counts[route["tier"]] = counts.get(route["tier"], 0) + 1
+    return ", ".join(f"{tier}×{count}" for tier, count in sorted(counts.items()))
+
+
+class RoutedChatAnthropic(ScheduledChatAnthropic):
+    """Scheduled chat model that chooses the model tier on every call"""
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        tier, reason = model_router.route(messages)
+        started = time.monotonic()
+        result = super()._generate(
+            messages,
+            stop=stop,
+            run_manager=run_manager,
+            model=model_router.tiers[tier],
+            **kwargs,
+        )
+        model_router.record(tier, reason, time.monotonic() - started)
+        return result
+
+
+@lru_cache(maxsize=None)
+def get_routed_llm():
+    """Return the process-wide tier-routing chat model"""
+    return RoutedChatAnthropic(
+        model=MODEL_TIERS["smart"],
+        api_key=os.getenv("ANTHROPIC_API_KEY"),
+        temperature=0.0,
+        max_retries=0,  # The scheduler owns retries and backoff
+        disable_streaming=True,  # Every call goes through _generate
+    )
@@ -1,19 +1,19 @@
 from langchain_experimental.agents import create_pandas_dataframe_agent
-from langchain_anthropic import ChatAnthropic
+from src.models.llm_scheduler import get_shared_llm
+from src.models.model_router import MODEL_ROUTING_ENABLED, get_routed_llm
 from src.tools.charts_and_graphs import (
     create_time_series_chart,
     create_categorical_chart,
     create_scatter_plot,
 )
+from src.tools.python_repl import ThreadSafePythonAstREPLTool
 from src.prompts.system_message import ANDY_SYSTEM_PROMPT
 from dotenv import load_dotenv
-import os
 
 load_dotenv()
-anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
 
 
-def create_andy_the_analyst(df):
+def create_andy_the_analyst(df, max_execution_time=None, verbose=True):
     """Create Andy with enhanced capabilities and personality"""
 
     # Additional visualization tools for Andy's arsenal
@@ -23,26 +23,44 @@ def create_andy_the_analyst(df):
         create_scatter_plot,
     ]
 
+    # Shared, rate-limited client; routes easy hops to a faster model tier
+    if MODEL_ROUTING_ENABLED:
+        llm = get_routed_llm()
+    else:
+        llm = get_shared_llm("claude-sonnet-4-20250514")
+
     # Create the agent with custom system prompt and extra tools
     agent_executor = create_pandas_dataframe_agent(
-        llm=ChatAnthropic(
-            model="claude-sonnet-4-20250514",
-            api_key=anthropic_api_key,
-            temperature=0.0,
-        ),
+        llm=llm,
         df=df,
         agent_type="tool-calling",
-        verbose=True,  # Set to True to see Andy's thinking process
+        verbose=verbose,  # Set to True to see Andy's thinking process
         allow_dangerous_code=True,
         extra_tools=extra_tools,
         prefix=ANDY_SYSTEM_PROMPT,  # This adds Andy's personality
         number_of_head_rows=10,  # Show more data in prompt
         max_iterations=20,  # Allow more iterations for complex analysis
+        max_execution_time=max_execution_time,  # Seconds; None means no limit
+    )
+
+    # Several agents may run at once (sessions, prefetch), so capture the
+    # Python tool's output per thread instead of swapping sys.stdout
+    repl_tool = get_repl_tool(agent_executor)
+    agent_executor.tools[agent_executor.tools.index(repl_tool)] = (
+        ThreadSafePythonAstREPLTool(locals=repl_tool.locals, globals=repl_tool.globals)
     )
 
     return agent_executor
 
 
+def get_repl_tool(agent_executor):
+    """Return the agent's Python tool, whose locals hold `df`"""
+    for tool in agent_executor.tools:
+        if tool.name == "python_repl_ast":
+            return tool
+    raise ValueError("Agent has no python_repl_ast tool")
+
+
 def ask_andy(df, question):
     """Ask Andy the Analyst a question about your data"""
     andy = create_andy_the_analyst(df)
@@ -0,0 +1,309 @@
+"""
+Speculative prefetch of likely follow-up analyses.
+
+While the user reads Andy's initial analysis, low-priority workers answer the
+quick-action questions and render charts for the detected time and category
+columns. Results land in the shared answer cache so the first click is instant.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import pandas as pd
+from langchain_core.callbacks import BaseCallbackHandler
+
+from src.models.answer_cache import answer_cache
+from src.models.llm_scheduler import llm_priority
+from src.models.recipes import record_recipe, schema_of
+from src.tools.charts_and_graphs import (
+    create_time_series_chart,
+    create_categorical_chart,
+)
+
+PREFETCH_WORKERS = int(os.getenv("ANDY_PREFETCH_WORKERS", "2"))
+PREFETCH_TASK_TIMEOUT = float(os.getenv("ANDY_PREFETCH_TASK_TIMEOUT", "120"))
+PREFETCH_JOB_BUDGET = float(os.getenv("ANDY_PREFETCH_JOB_BUDGET", "600"))
+PREFETCH_MAX_CHARTS = int(os.getenv("ANDY_PREFETCH_MAX_CHARTS", "4"))
+
+DATE_KEYWORDS = ["date", "time", "day", "month", "year"]
+
+logger = logging.getLogger(__name__)
+
+# Low priority: a small pool shared by every session in the process
+_executor = ThreadPoolExecutor(
+    max_workers=PREFETCH_WORKERS, thread_name_prefix="andy-prefetch"
+)
+
+# Prefetch work waits while any interactive question is in flight
+_interactive_lock = threading.Lock()
+_interactive_count = 0
+_interactive_idle = threading.Event()
+_interactive_idle.set()
+
+
+@contextmanager
+def interactive_request():
+    """Mark an interactive question as in flight so prefetch workers yield to it"""
+    global _interactive_count
+    with _interactive_lock:
+        _interactive_count += 1
+        _interactive_idle.clear()
+    try:
+        yield
+    finally:
+        with _interactive_lock:
+            _interactive_count -= 1
+            if _interactive_count == 0:
+                _interactive_idle.set()
+
+
+class PrefetchStopped(Exception):
+    """Raised inside a prefetch agent run to abandon it between steps"""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class _PrefetchGate(BaseCallbackHandler):
+    """Checks in with the job before every LLM and tool call of its agent
+
+    Cancellation and the job budget stop the run mid-answer, and the run
+    pauses while an interactive question is in flight.
+    """
+
+    raise_error = True
+
+    def __init__(self, job):
+        self.job = job
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.job._wait_turn()
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.job._wait_turn()
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        self.job._wait_turn()
+
+
+def chart_cache_key(kind, *columns):
+    """Cache key under which a prefetched chart path is stored"""
+    return f"chart:{kind}:{':'.join(columns)}"
+
+
+def detect_chart_specs(df, max_charts=PREFETCH_MAX_CHARTS):
+    """Pick (kind, category/date column, value column) triples worth charting"""
+    numeric_cols = [
+        col for col in df.columns if pd.api.types.is_numeric_dtype(df[col].dtype)
+    ]
+    if not numeric_cols:
+        return []
+    value_col = numeric_cols[0]
+
+    date_cols = [
+        col
+        for col in df.columns
+        if pd.api.types.is_datetime64_any_dtype(df[col].dtype)
+        or any(keyword in str(col).lower() for keyword in DATE_KEYWORDS)
+    ]
+    category_cols = [
+        col
+        for col in df.columns
+        if col not in date_cols
+        and (
+            isinstance(df[col].dtype, pd.CategoricalDtype)
+            or pd.api.types.is_object_dtype(df[col].dtype)
+            or pd.api.types.is_string_dtype(df[col].dtype)
+        )
+        and df[col].nunique(dropna=True) <= 30
+    ]
+
+    specs = [("time_series", col, value_col) for col in date_cols]
+    specs += [("bar", col, value_col) for col in category_cols]
+    return specs[:max_charts]
+
+
+def _render_chart(frame, kind, column, value_col):
+    """Run a chart tool's generated code directly, without the LLM"""
+    if kind == "time_series":
+        generated = create_time_series_chart.invoke(
+            {
+                "df_name": "df",
+                "date_column": column,
+                "value_column": value_col,
+                "title": f"{value_col} over {column}",
+            }
+        )
+    else:
+        generated = create_categorical_chart.invoke(
+            {
+                "df_name": "df",
+                "category_column": column,
+                "value_column": value_col,
+                "chart_type": kind,
+            }
+        )
+
+    code = generated.split("Execute this:\n", 1)[1]
+    # Never try to open a browser from a background worker
+    code = code.replace("\nfig.show()\n", "\n")
+
+    namespace = {"df": frame, "pd": pd, "print": lambda *args, **kwargs: None}
+    exec(code, namespace)
+    return namespace["filepath"]
+
+
+class PrefetchJob:
+    """Prefetch work for one dataset, cancellable as a unit"""
+
+    def __init__(self, df, fingerprint, questions, chart_specs=None):
+        self.df = df
+        self.fingerprint = fingerprint
+        self.questions = list(questions)
+        self.chart_specs = (
+            detect_chart_specs(df) if chart_specs is None else list(chart_specs)
+        )
+        self.deadline = None
+        self.cancelled = threading.Event()
+        self.futures = []
+        self.status = {}
+        self.errors = {}  # task -> first line of its error
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Queue every task on the shared prefetch pool"""
+        self.deadline = time.monotonic() + PREFETCH_JOB_BUDGET
+
+        if self.chart_specs:
+            self._set_status("charts", "queued")
+            self.futures.append(_executor.submit(self._run_charts))
+
+        for question in self.questions:
+            if answer_cache.get(self.fingerprint, question) is not None:
+                self._set_status(question, "cached")
+                continue
+            self._set_status(question, "queued")
+            self.futures.append(_executor.submit(self._run_question, question))
+
+        return self
+
+    def cancel(self):
+        """Stop queued tasks; running ones stop before their next LLM or tool call"""
+        self.cancelled.set()
+        for future in self.futures:
+            future.cancel()
+
+    def summary(self):
+        """Count tasks by status"""
+        with self._lock:
+            counts = {}
+            for status in self.status.values():
+                counts[status] = counts.get(status, 0) + 1
+            return counts
+
+    def _set_status(self, task, status):
+        with self._lock:
+            self.status[task] = status
+
+    def _fail(self, task, error):
+        lines = str(error).strip().splitlines() or [""]
+        with self._lock:
+            self.status[task] = "failed"
+            self.errors[task] = f"{type(error).__name__}: {lines[0]}"
+        logger.warning("Prefetch of %r failed", task, exc_info=error)
+
+    def _wait_turn(self):
+        """Yield to interactive work; raise PrefetchStopped if the job is over"""
+        while not _interactive_idle.wait(timeout=0.5):
+            if self.cancelled.is_set():
+                break
+
+        if self.cancelled.is_set():
+            raise PrefetchStopped("cancelled")
+        if time.monotonic() > self.deadline:
+            raise PrefetchStopped("over budget")
+
+    def _should_run(self, task):
+        """Wait for a turn, recording why the task will not run if it won't"""
+        try:
+            self._wait_turn()
+        except PrefetchStopped as stopped:
+            self._set_status(task, stopped.reason)
+            return False
+
+        self._set_status(task, "running")
+        return True
+
+    def _run_question(self, question):
+        if not self._should_run(question):
+            return
+
+        from src.models.pandas_agent import create_andy_the_analyst
+
+        try:
+            # A private copy keeps prefetch code away from the user's REPL state
+            remaining = max(1.0, self.deadline - time.monotonic())
+            agent = create_andy_the_analyst(
+                self.df.copy(),
+                max_execution_time=min(PREFETCH_TASK_TIMEOUT, remaining),
+            )
+            # The code it ran becomes a recipe if an analyst asks this
+            agent.return_intermediate_steps = True
+            # Queue behind interactive questions at the shared LLM scheduler
+            with llm_priority("prefetch"):
+                result = agent.invoke(
+                    {"input": question}, {"callbacks": [_PrefetchGate(self)]}
+                )
+            answer = result.get("output")
+
+            if self.cancelled.is_set() or not answer:
+                self._set_status(question, "cancelled")
+                return
+
+            recipe = record_recipe(
+                question, schema_of(self.df), result["intermediate_steps"]
+            )
+            answer_cache.put(
+                self.fingerprint, question, answer, source="prefetch", recipe=recipe
+            )
+            self._set_status(question, "done")
+
+        except PrefetchStopped as stopped:
+            self._set_status(question, stopped.reason)
+        except Exception as e:
+            self._fail(question, e)
+
+    def _run_charts(self):
+        if not self._should_run("charts"):
+            return
+
+        frame = self.df.copy()
+        for kind, column, value_col in self.chart_specs:
+            try:
+                self._wait_turn()
+            except PrefetchStopped as stopped:
+                self._set_status("charts", stopped.reason)
+                return
+            key = chart_cache_key(kind, column, value_col)
+            try:
+                filepath = _render_chart(frame, kind, column, value_col)
+                answer_cache.put(self.fingerprint, key, filepath, source="prefetch")
+            except Exception as e:
+                self._fail(key, e)
+
+        self._set_status("charts", "done")
+
+
+def start_prefetch(df, fingerprint, questions):
+    """Start prefetching answers and charts for a freshly loaded dataset"""
+    return PrefetchJob(df, fingerprint, questions).start()
+
+
+def get_prefetched_charts(fingerprint):
+    """Return {cache key: chart path} for the charts prefetched for a dataset"""
+    return answer_cache.entries_for(fingerprint, prefix="chart:")
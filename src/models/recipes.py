@@ -0,0 +1,210 @@
+"""
+Replayable analysis recipes.
+
+Every question an analyst asks records the Python that Andy actually ran as
+a recipe bound to the dataset's schema. A recipe can then be replayed on a new
+export with the same schema using plain pandas and Plotly - no LLM, so a
+recurring report takes seconds instead of a multi-step agent run. Replay
+checks the new data for schema drift first and can remap renamed columns.
+"""
+
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+
+from src.tools.charts_and_graphs import find_chart_paths
+from src.tools.python_repl import ThreadSafePythonAstREPLTool
+
+RECIPE_DIR = os.getenv("ANDY_RECIPE_DIR", "reports/recipes")
+
+ERROR_PREFIX = re.compile(r"^\w*(Error|Exception): ")
+
+
+def schema_of(df):
+    """[{name, dtype}] for every column, in order"""
+    return [{"name": str(col), "dtype": str(dtype)} for col, dtype in df.dtypes.items()]
+
+
+def referenced_columns(code, columns):
+    """Columns that a snippet mentions as a quoted string"""
+    return [col for col in columns if f"'{col}'" in code or f'"{col}"' in code]
+
+
+def slugify(text, max_length=50):
+    slug = re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")
+    return slug[:max_length] or "recipe"
+
+
+def recipe_name(question, schema):
+    """<question slug>_<schema hash>
+
+    The same question on data of the same shape (e.g. each month's export)
+    keeps one recipe, updated to the latest run; on other data it gets its own.
+    """
+    digest = hashlib.sha1(json.dumps(schema, sort_keys=True).encode()).hexdigest()
+    return f"{slugify(question, 40).strip('_')}_{digest[:8]}"
+
+
+def record_recipe(question, schema, steps):
+    """Build a recipe from an agent run's (action, observation) steps
+
+    Only Python tool calls that succeeded are kept. Returns None when the
+    run executed no code worth replaying.
+    """
+    columns = [column["name"] for column in schema]
+    recipe_steps = []
+    for action, observation in steps:
+        if action.tool != "python_repl_ast" or ERROR_PREFIX.match(str(observation)):
+            continue
+        code = action.tool_input
+        if isinstance(code, dict):
+            code = code.get("query", "")
+        recipe_steps.append(
+            {"code": code, "columns": referenced_columns(code, columns)}
+        )
+
+    if not recipe_steps:
+        return None
+
+    used = sorted({col for step in recipe_steps for col in step["columns"]})
+    return {
+        "name": recipe_name(question, schema),
+        "question": question,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "schema": schema,
+        # Recipe column -> dataset column; edit to replay on renamed columns
+        "parameters": {"columns": {col: col for col in used}},
+        "steps": recipe_steps,
+    }
+
+
+def save_recipe(recipe, recipe_dir=RECIPE_DIR):
+    """Write a recipe to <recipe_dir>/<name>.json and return the path"""
+    os.makedirs(recipe_dir, exist_ok=True)
+    path = os.path.join(recipe_dir, f"{recipe['name']}.json")
+    with open(path, "w") as f:
+        json.dump(recipe, f, indent=2)
+    return path
+
+
+def load_recipe(name_or_path, recipe_dir=RECIPE_DIR):
+    """Load a recipe by file path, by name, or by the start of its name
+
+    A name's start (e.g. the question slug without the schema hash) picks
+    the newest recipe it matches.
+    """
+    path = name_or_path
+    if not os.path.exists(path):
+        name = slugify(name_or_path)
+        path = os.path.join(recipe_dir, f"{name}.json")
+        if not os.path.exists(path):
+            matches = [
+                match for match, _ in list_recipes(recipe_dir) if match.startswith(name)
+            ]
+            if matches:
+                path = os.path.join(recipe_dir, f"{matches[0]}.json")
+    with open(path) as f:
+        return json.load(f)
+
+
+def list_recipes(recipe_dir=RECIPE_DIR):
+    """[(name, question)] for every saved recipe, newest first"""
+    if not os.path.isdir(recipe_dir):
+        return []
+
+    recipes = []
+    for filename in os.listdir(recipe_dir):
+        if filename.endswith(".json"):
+            with open(os.path.join(recipe_dir, filename)) as f:
+                recipe = json.load(f)
+            recipes.append((recipe["created_at"], recipe["name"], recipe["question"]))
+    return [(name, question) for _, name, question in sorted(recipes, reverse=True)]
+
+
+def check_schema(recipe, df, column_map=None):
+    """Compare a dataset with the schema a recipe was recorded on
+
+    Returns {"errors": [...], "warnings": [...]}; errors mean the recipe
+    cannot run (a column it uses is missing).
+    """
+    column_map = {**recipe["parameters"]["columns"], **(column_map or {})}
+    current = {str(col): str(dtype) for col, dtype in df.dtypes.items()}
+    recorded = {column["name"]: column["dtype"] for column in recipe["schema"]}
+
+    errors, warnings = [], []
+    for recipe_col, dataset_col in column_map.items():
+        if dataset_col not in current:
+            errors.append(f"Missing column '{dataset_col}' (used by the recipe)")
+        elif current[dataset_col] != recorded.get(recipe_col):
+            warnings.append(
+                f"Column '{dataset_col}' changed type: "
+                f"{recorded.get(recipe_col)} → {current[dataset_col]}"
+            )
+
+    dropped = set(recorded) - set(current) - set(column_map)
+    added = set(current) - set(recorded) - set(column_map.values())
+    if dropped:
+        warnings.append(f"Columns no longer present: {', '.join(sorted(dropped))}")
+    if added:
+        warnings.append(f"New columns: {', '.join(sorted(added))}")
+
+    return {"errors": errors, "warnings": warnings}
+
+
+def _remap_columns(code, column_map):
+    for old, new in column_map.items():
+        if old != new:
+            code = code.replace(f"'{old}'", f"'{new}'").replace(f'"{old}"', f'"{new}"')
+    return code
+
+
+def replay_recipe(recipe, df, column_map=None):
+    """Run a recipe's steps on df without the LLM
+
+    Returns {"drift": ..., "outputs": [...], "charts": [...], "error": ...}.
+    """
+    drift = check_schema(recipe, df, column_map)
+    result = {"drift": drift, "outputs": [], "charts": [], "error": None}
+    if drift["errors"]:
+        result["error"] = "Schema drift: " + "; ".join(drift["errors"])
+        return result
+
+    column_map = {**recipe["parameters"]["columns"], **(column_map or {})}
+
+    # Same tool the agent used, so the code behaves exactly as it did then
+    repl = ThreadSafePythonAstREPLTool(locals={"df": df.copy()})
+    for number, step in enumerate(recipe["steps"], start=1):
+        code = _remap_columns(step["code"], column_map)
+        output = str(repl.run(code))
+        if ERROR_PREFIX.match(output):
+            result["error"] = f"Step {number} failed: {output}"
+            break
+        result["outputs"].append({"code": code, "output": output})
+        result["charts"] += find_chart_paths(output)
+
+    return result
+
+
+def format_replay(recipe, result, max_output=1500):
+    """Markdown summary of a replay, in Andy's voice"""
+    lines = [f"📜 Replayed recipe **{recipe['name']}**: _{recipe['question']}_"]
+    for warning in result["drift"]["warnings"]:
+        lines.append(f"⚠️ {warning}")
+
+    for step in result["outputs"]:
+        output = step["output"]
+        if len(output) > max_output:
+            output = output[:max_output] + " …"
+        lines.append(f"```python\n{step['code']}\n```")
+        if output.strip():
+            lines.append(f"```\n{output}\n```")
+
+    if result["charts"]:
+        lines.append("📈 Charts: " + ", ".join(result["charts"]))
+    if result["error"]:
+        lines.append(f"🚨 {result['error']}")
+    else:
+        lines.append("✅ Replay complete - no LLM calls needed! 🤓")
+    return "\n\n".join(lines)
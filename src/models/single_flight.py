@@ -0,0 +1,156 @@
+"""
+Single-flight coalescing of identical in-flight questions.
+
+Double clicks, Streamlit reruns and several analysts hitting the same quick
+action on a shared dataset would otherwise each start their own, identical
+agent run. Callers asking the same question about the same data while a run
+is in flight join that run's future instead. The run is only cancelled when
+every caller waiting on it has given up.
+
+An answer depends on more than the question and the data: on the
+conversation so far, and on the variables earlier code left in the agent's
+REPL. So a session's follow-ups only coalesce with repeats from the same
+session (same context, same namespace). A first question on untouched data
+coalesces across sessions, and runs on a fresh agent so that no session's
+namespace alone gets its side effects. The flip side: variables and column
+conversions made by that fresh agent's code are dropped with it, so the
+sessions' own REPLs start their follow-ups from the data as loaded.
+"""
+
+import hashlib
+import threading
+
+from src.models.answer_cache import normalize_question
+from src.models.budgets import run_with_budget
+from src.models.model_router import track_routes
+from src.models.pandas_agent import create_andy_the_analyst
+from src.models.prefetch import interactive_request
+
+
+def question_key(fingerprint, question, context="", namespace=None):
+    """Key under which identical questions coalesce
+
+    context is the conversation sent along with the question and namespace
+    the id of the REPL namespace the run uses; None means a fresh agent.
+    """
+    context_digest = hashlib.sha256(context.encode()).hexdigest() if context else ""
+    return (fingerprint, normalize_question(question), context_digest, namespace)
+
+
+def flight_key(fingerprint, question, context, repl_tool):
+    """(key, fresh) for a session's question; fresh runs need a new agent
+
+    Without conversation context and before any code has run in the
+    session's REPL, the question is the same for every session on this
+    data, so it coalesces across sessions on a fresh agent. Otherwise only
+    the session's own repeats can join.
+    """
+    if context or repl_tool.names_last_used:
+        key = question_key(fingerprint, question, context, id(repl_tool.locals))
+        return key, False
+    return question_key(fingerprint, question), True
+
+
+def run_flight(agent, full_question, budget, cancel_event, on_step=None, fresh_df=None):
+    """Worker: run Andy within budget; prefetch workers pause meanwhile
+
+    With fresh_df the run uses a new Andy around a copy of it instead (see
+    flight_key). Returns (run, routes).
+    """
+    if fresh_df is not None:
+        # Copy-on-write: shares the loaded frame's memory, not its edits
+        agent = create_andy_the_analyst(fresh_df.copy(deep=False), verbose=False)
+    with interactive_request(), track_routes() as routes:
+        run = run_with_budget(agent, full_question, budget, cancel_event, on_step)
+    return run, routes
+
+
+class _Flight:
+    def __init__(self):
+        self.future = None
+        self.waiters = 1
+        self.cancel = None
+        self.listeners = []
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key onto one future"""
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.runs = 0
+        self.coalesced = 0
+
+    def join(self, key, start, cancel=None, listener=None):
+        """Return (future, started) for key, starting a run if none is in flight
+
+        start(publish) must return a concurrent.futures.Future; publish(*args)
+        forwards progress events to the listener of every caller that has
+        joined. cancel() is called if every caller leaves before the run ends.
+        """
+        with self._lock:
+            self.calls += 1
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                flight.waiters += 1
+                if listener is not None:
+                    flight.listeners.append(listener)
+                return flight.future, False
+
+            flight = _Flight()
+            flight.cancel = cancel
+            if listener is not None:
+                flight.listeners.append(listener)
+
+            def publish(*args):
+                for callback in list(flight.listeners):
+                    callback(*args)
+
+            # Started under the lock so no caller can see a flight without
+            # its future; start() only submits the work
+            flight.future = start(publish)
+            self._flights[key] = flight
+            self.runs += 1
+
+        flight.future.add_done_callback(lambda _: self._finish(key, flight))
+        return flight.future, True
+
+    def _finish(self, key, flight):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def leave(self, key, future, listener=None):
+        """Stop waiting on a run; the last caller to leave cancels it"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None or flight.future is not future:
+                return
+            flight.waiters -= 1
+            if listener in flight.listeners:
+                flight.listeners.remove(listener)
+            if flight.waiters > 0 or flight.cancel is None:
+                return
+        flight.cancel()
+
+    def is_running(self, key):
+        """True while a run for key is in flight and someone still waits on it"""
+        with self._lock:
+            flight = self._flights.get(key)
+            return flight is not None and flight.waiters > 0
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "runs": self.runs,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._flights),
+            }
+
+
+# One table, so identical questions from different sessions join one run
+ask_flight = SingleFlight()
@@ -0,0 +1,240 @@
+"""
+Local stand-in for the Anthropic Messages API.
+
+Answers POST /v1/messages with canned replies after a configurable latency,
+injecting 429s and 529 overloads so the LLM scheduler, API server and load
+generator can be exercised without a real key or spending tokens.
+
+Usage:
+    python -m src.models.stub_llm_server --port 8787 --error-rate 0.2
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8787 ANTHROPIC_API_KEY=stub python main.py
+"""
+
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubSettings:
+    """Behaviour knobs shared by every request handler"""
+
+    def __init__(
+        self,
+        latency=0.5,
+        latency_distribution="fixed",
+        error_rate=0.0,
+        overload_rate=0.0,
+        tool_rate=0.5,
+        retry_after=1,
+        requests_per_minute=None,
+    ):
+        self.latency = latency
+        self.latency_distribution = latency_distribution
+        self.error_rate = error_rate
+        self.overload_rate = overload_rate
+        self.tool_rate = tool_rate
+        self.retry_after = retry_after
+        self.requests_per_minute = requests_per_minute
+
+        self.lock = threading.Lock()
+        self.window_started = time.monotonic()
+        self.window_requests = 0
+        self.counts = {"requests": 0, "ok": 0, "rate_limited": 0, "overloaded": 0}
+
+    def sample_latency(self):
+        """Draw one response latency in seconds"""
+        if self.latency_distribution == "uniform":
+            return random.uniform(0, 2 * self.latency)
+        if self.latency_distribution == "exponential":
+            return random.expovariate(1 / self.latency) if self.latency else 0.0
+        if self.latency_distribution == "lognormal":
+            # Median of `latency` with a long right tail
+            return self.latency * random.lognormvariate(0, 0.75)
+        return self.latency
+
+    def over_rate_limit(self):
+        """Server-side fixed-window limit, like the real API enforces"""
+        if not self.requests_per_minute:
+            return False
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_started >= 60:
+                self.window_started = now
+                self.window_requests = 0
+            self.window_requests += 1
+            return self.window_requests > self.requests_per_minute
+
+    def count(self, outcome):
+        with self.lock:
+            self.counts["requests"] += 1
+            self.counts[outcome] += 1
+
+
+_message_ids = itertools.count(1)
+
+
+def _has_tool_result(messages):
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list) and any(
+            block.get("type") == "tool_result" for block in content
+        ):
+            return True
+    return False
+
+
+def build_reply(payload, settings):
+    """Build a Messages API response body for a request payload"""
+    messages = payload.get("messages", [])
+    tool_names = [tool.get("name") for tool in payload.get("tools", [])]
+    input_tokens = len(json.dumps(messages)) // 4 + 1
+    message_id = f"msg_stub_{next(_message_ids)}"
+
+    # First hop: pretend to inspect the data, then answer on the next hop
+    if (
+        "python_repl_ast" in tool_names
+        and not _has_tool_result(messages)
+        and random.random() < settings.tool_rate
+    ):
+        content = [
+            {
+                "type": "tool_use",
+                "id": f"toolu_{message_id}",
+                "name": "python_repl_ast",
+                "input": {"query": "df.describe()"},
+            }
+        ]
+        stop_reason = "tool_use"
+    else:
+        content = [
+            {
+                "type": "text",
+                "text": "🤓 Holy mackerel, what a dataset! (stand-in LLM answer)",
+            }
+        ]
+        stop_reason = "end_turn"
+
+    return {
+        "id": message_id,
+        "type": "message",
+        "role": "assistant",
+        "model": payload.get("model", "stub"),
+        "content": content,
+        "stop_reason": stop_reason,
+        "stop_sequence": None,
+        "usage": {"input_tokens": input_tokens, "output_tokens": 40},
+    }
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """Handles /v1/messages the way the real API would, minus the thinking"""
+
+    settings = StubSettings()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status, error_type, message):
+        self._send_json(
+            status,
+            {"type": "error", "error": {"type": error_type, "message": message}},
+            headers={"retry-after": str(self.settings.retry_after)},
+        )
+
+    def do_GET(self):
+        if self.path == "/stats":
+            with self.settings.lock:
+                self._send_json(200, dict(self.settings.counts))
+            return
+        self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if not self.path.startswith("/v1/messages"):
+            self._send_json(404, {"error": "not found"})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        settings = self.settings
+
+        if settings.over_rate_limit() or random.random() < settings.error_rate:
+            settings.count("rate_limited")
+            self._send_error(429, "rate_limit_error", "Stub rate limit exceeded")
+            return
+
+        time.sleep(settings.sample_latency())
+
+        if random.random() < settings.overload_rate:
+            settings.count("overloaded")
+            self._send_error(529, "overloaded_error", "Stub server overloaded")
+            return
+
+        settings.count("ok")
+        self._send_json(200, build_reply(payload, settings))
+
+
+def start_stub_server(host="127.0.0.1", port=0, **settings):
+    """Start the stand-in server on a daemon thread; returns (server, base_url)"""
+    handler = type("ConfiguredStubLLMHandler", (StubLLMHandler,), {})
+    handler.settings = StubSettings(**settings)
+
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    """Run the stand-in server in the foreground"""
+    parser = argparse.ArgumentParser(description="Stand-in Anthropic API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument(
+        "--latency-distribution",
+        choices=["fixed", "uniform", "exponential", "lognormal"],
+        default="fixed",
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--overload-rate", type=float, default=0.0)
+    parser.add_argument("--tool-rate", type=float, default=0.5)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--rpm", type=int, default=None)
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        latency_distribution=args.latency_distribution,
+        error_rate=args.error_rate,
+        overload_rate=args.overload_rate,
+        tool_rate=args.tool_rate,
+        retry_after=args.retry_after,
+        requests_per_minute=args.rpm,
+    )
+    print(f"🧪 Stand-in LLM listening on {base_url}")
+    print(f"💡 export ANTHROPIC_BASE_URL={base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,16 +2,64 @@
 Andy interaction utilities for Streamlit app
 """
 
+import os
+import re
+import threading
+import time
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
+
 import streamlit as st
+from src.models.answer_cache import answer_cache
+from src.models.prefetch import start_prefetch
+from src.models.budgets import AnalysisBudget
+from src.models.memory_budget import memory_accountant
+from src.models.single_flight import ask_flight, flight_key, run_flight
+from src.models.pandas_agent import get_repl_tool
+from src.models.recipes import (
+    record_recipe,
+    save_recipe,
+    load_recipe,
+    replay_recipe,
+    format_replay,
+)
+from src.tools.charts_and_graphs import find_run_chart_paths
+
+# Messages shown before "load older"; each click reveals this many more
+CHAT_PAGE_SIZE = int(os.getenv("ANDY_CHAT_PAGE_SIZE", "20"))
+
+# Code blocks and tables longer than this are collapsed
+COLLAPSE_LINES = int(os.getenv("ANDY_CHAT_COLLAPSE_LINES", "15"))
+
+CODE_BLOCK = re.compile(r"```(\w*)\n(.*?)```", re.DOTALL)
+TABLE_BLOCK = re.compile(r"(?:^\|.*\|[ \t]*(?:\n|$))+", re.MULTILINE)
 
+# Agent runs happen off the script thread so the Stop button can interrupt them
+_run_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("ANDY_RUN_WORKERS", "16")),
+    thread_name_prefix="andy-run",
+)
 
-def ask_andy(question):
-    """Ask Andy a question and get response with memory"""
+
+def ask_andy(question, as_recipe=True):
+    """Ask Andy a question and get response with memory
+
+    The code behind the answer is saved as a recipe unless as_recipe is
+    False (for prompts the app writes itself, like the initial analysis).
+    """
     if not st.session_state.data_loaded:
         return (
             "🤔 I need some data to analyze first! Please upload a CSV or Excel file."
         )
 
+    active = st.session_state.active_run
+    if active is not None:
+        if active["question"] == question:
+            # A rerun interrupted us while Andy was working on this question
+            return wait_for_active_run()
+        cancel_active_run()
+        st.session_state.active_run = None
+
     try:
         # Get conversation history for context
         history = st.session_state.memory.load_memory_variables({})
@@ -23,40 +71,247 @@ def ask_andy(question):
                 history["history"][-6:]
             )  # Last 3 exchanges
 
+        # Prefetched answers make the first click on a quick action instant.
+        # They were worked out without a conversation, so only before one.
+        if not context_prompt:
+            cached = answer_cache.get(st.session_state.dataset_fingerprint, question)
+            if cached is not None:
+                st.session_state.memory.save_context(
+                    {"input": question}, {"output": cached}
+                )
+                recipe = answer_cache.recipe_for(
+                    st.session_state.dataset_fingerprint, question
+                )
+                if as_recipe and recipe is not None:
+                    save_recipe(recipe)
+                return cached
+
         full_question = question + context_prompt
 
-        # Get Andy's response
-        result = st.session_state.andy_agent.invoke({"input": full_question})
-        response = result.get("output", "🤷‍♂️ Sorry, I couldn't process that question.")
+        # Get Andy's response within a budget sized to the question
+        budget = AnalysisBudget.for_question(question, st.session_state.current_df)
+        cancel_event = threading.Event()
+        agent = st.session_state.andy_agent
+
+        # The same question on the same data already running (a double click,
+        # another analyst on a shared dataset) is joined, not started again
+        key, fresh = flight_key(
+            st.session_state.dataset_fingerprint,
+            question,
+            context_prompt,
+            get_repl_tool(agent),
+        )
+        fresh_df = st.session_state.current_df if fresh else None
+        future, _ = ask_flight.join(
+            key,
+            lambda publish: _run_executor.submit(
+                run_flight, agent, full_question, budget, cancel_event, None, fresh_df
+            ),
+            cancel=cancel_event.set,
+        )
+        st.session_state.active_run = {
+            "question": question,
+            "as_recipe": as_recipe,
+            "key": key,
+            "left": False,
+            "started": time.monotonic(),
+            "future": future,
+        }
+
+    except Exception as e:
+        return f"🚨 Oops! I encountered an error: {str(e)}"
+
+    return wait_for_active_run()
 
-        # Save to memory
-        st.session_state.memory.save_context({"input": question}, {"output": response})
 
-        return response
+def wait_for_active_run():
+    """Wait for Andy's current run, then save its answer to memory"""
+    active = st.session_state.active_run
 
+    # Updating the page while we wait lets a Stop click interrupt this rerun
+    status = st.empty()
+    while not active["future"].done():
+        if active["left"] and ask_flight.is_running(active["key"]):
+            # Stopped, but the run carries on for others asking the same thing
+            status.empty()
+            st.session_state.active_run = None
+            return "🛑 Stopped waiting - I'm still finishing that analysis for someone else."
+        elapsed = time.monotonic() - active["started"]
+        status.caption(
+            f"⏳ Working for {elapsed:.0f}s - press 🛑 Stop Andy in the sidebar "
+            "for a partial answer"
+        )
+        # Wakes as soon as the answer is in, not at the next half second
+        futures.wait([active["future"]], timeout=0.5)
+    status.empty()
+    st.session_state.active_run = None
+
+    try:
+        run, routes = active["future"].result()
     except Exception as e:
         return f"🚨 Oops! I encountered an error: {str(e)}"
 
+    st.session_state.last_routes = routes
+    # Their PNG/SVG copies may still be rendering; the sidebar shows progress
+    st.session_state.session_charts += find_run_chart_paths(run.steps)
+    response = run.output or "🤷‍♂️ Sorry, I couldn't process that question."
 
-def display_conversation_history():
-    """Display the conversation history with proper styling"""
-    for message in st.session_state.conversation_history:
-        if message["role"] == "andy":
-            st.markdown('<div class="andy-chat">', unsafe_allow_html=True)
-            st.markdown(f"**🤓 Andy:** {message['content']}")
-            st.markdown("</div>", unsafe_allow_html=True)
+    # Save to memory
+    st.session_state.memory.save_context(
+        {"input": active["question"]}, {"output": response}
+    )
+
+    # Keep the code Andy ran so the analysis can be replayed without him
+    recipe = record_recipe(
+        active["question"], st.session_state.dataset_schema, run.steps
+    )
+    if active["as_recipe"] and recipe is not None and not run.partial:
+        save_recipe(recipe)
+
+    enforce_memory_budget()
+    return response
+
+
+def enforce_memory_budget():
+    """Re-measure this session and spill/evict if it is over budget"""
+    return memory_accountant.enforce(
+        st.session_state.session_id,
+        conversation=st.session_state.conversation_history,
+        frames=[st.session_state.current_df],
+    )
+
+
+def replay_recipe_on_current_data(recipe_name):
+    """Replay a saved recipe on the loaded dataset, without the LLM"""
+    try:
+        recipe = load_recipe(recipe_name)
+        result = replay_recipe(recipe, st.session_state.current_df)
+        return format_replay(recipe, result)
+    except Exception as e:
+        return f"🚨 Oops! I couldn't replay that recipe: {str(e)}"
+
+
+def cancel_active_run():
+    """Stop waiting on Andy's current run
+
+    The run itself stops after its current step, unless other callers are
+    still waiting on it.
+    """
+    active = st.session_state.get("active_run")
+    if active is not None and not active["left"]:
+        active["left"] = True
+        ask_flight.leave(active["key"], active["future"])
+
+
+def _fold(text, pattern, summarize):
+    """Split text around the matches of pattern that summarize() folds"""
+    segments, last = [], 0
+    for match in pattern.finditer(text):
+        summary = summarize(match)
+        if summary is None:
+            continue
+        segments.append((text[last : match.start()], None))
+        segments.append((match.group(0).rstrip("\n"), summary))
+        last = match.end()
+    segments.append((text[last:], None))
+    return segments
+
+
+def _code_summary(match):
+    lines = match.group(2).count("\n")
+    if lines <= COLLAPSE_LINES:
+        return None
+    kind = "code" if match.group(1) in ("python", "py") else "output"
+    return f"📄 Show {kind} ({lines} lines)"
+
+
+def _table_summary(match):
+    rows = match.group(0).count("\n")
+    if rows <= COLLAPSE_LINES:
+        return None
+    return f"📊 Show table ({rows} rows)"
+
+
+def message_segments(text):
+    """Split a message into (markdown, summary) pieces
+
+    Code blocks and markdown tables longer than COLLAPSE_LINES get a summary
+    to be drawn folded under; the rest has a summary of None.
+    """
+    segments = []
+    for part, summary in _fold(text, CODE_BLOCK, _code_summary):
+        if summary is None:
+            segments += _fold(part, TABLE_BLOCK, _table_summary)
+        else:
+            segments.append((part, summary))
+    return [(part, summary) for part, summary in segments if part.strip()]
+
+
+def render_message(message):
+    """A message's (markdown, summary) segments, speaker first (cached on it)"""
+    if "rendered" not in message:
+        speaker = "🤓 Andy" if message["role"] == "andy" else "👤 You"
+        segments = message_segments(message["content"])
+        if segments and segments[0][1] is None:
+            segments[0] = (f"**{speaker}:** {segments[0][0]}", None)
         else:
-            st.markdown('<div class="user-chat">', unsafe_allow_html=True)
-            st.markdown(f"**👤 You:** {message['content']}")
-            st.markdown("</div>", unsafe_allow_html=True)
+            segments.insert(0, (f"**{speaker}:**", None))
+        message["rendered"] = segments
+    return message["rendered"]
+
+
+def show_older_messages():
+    st.session_state.chat_visible += CHAT_PAGE_SIZE
+
+
+def display_conversation_history():
+    """Display the latest messages, with a button to load older ones
+
+    Each message is split into segments once. Its text is plain markdown
+    (never raw HTML, since it holds user input, LLM output and cell values),
+    and its styled box is a keyed container the app's CSS picks out.
+    """
+    history = st.session_state.conversation_history
+    visible = st.session_state.chat_visible
+
+    hidden = len(history) - visible
+    if hidden > 0:
+        st.button(
+            f"⬆️ Load older messages ({hidden} hidden)",
+            on_click=show_older_messages,
+        )
+
+    for index in range(max(hidden, 0), len(history)):
+        message = history[index]
+        css_class = "andy-chat" if message["role"] == "andy" else "user-chat"
+        with st.container(key=f"{css_class}-{index}"):
+            for text, summary in render_message(message):
+                if summary is None:
+                    st.markdown(text)
+                else:
+                    with st.expander(summary):
+                        st.markdown(text)
 
 
 def add_to_conversation(role, content):
     """Add a message to the conversation history"""
     from datetime import datetime
 
-    st.session_state.conversation_history.append(
-        {"role": role, "content": content, "timestamp": datetime.now()}
+    message = {"role": role, "content": content, "timestamp": datetime.now()}
+    render_message(message)
+    st.session_state.conversation_history.append(message)
+
+
+def start_prefetch_for_current_data():
+    """Cancel any running prefetch and start one for the current dataset"""
+    if st.session_state.get("prefetch_job") is not None:
+        st.session_state.prefetch_job.cancel()
+
+    questions = [question for _, question in get_quick_actions()]
+    st.session_state.prefetch_job = start_prefetch(
+        st.session_state.current_df,
+        st.session_state.dataset_fingerprint,
+        questions,
     )
 
 
@@ -4,28 +4,53 @@ Data handling utilities for Streamlit app
 
 import streamlit as st
 import pandas as pd
-from src.models.pandas_agent import create_andy_the_analyst
+from src.models.pandas_agent import create_andy_the_analyst, get_repl_tool
+from src.models.answer_cache import dataset_fingerprint, extend_fingerprint
+from src.models.recipes import schema_of
+from src.streamlit_utils.andy_interface import (
+    start_prefetch_for_current_data,
+    enforce_memory_budget,
+    CHAT_PAGE_SIZE,
+)
+from src.models.memory_budget import memory_accountant, estimate_nbytes
+from src.ingestion.csv_tail import CsvTail
+from src.ingestion.data_root import resolve_data_path
+from src.ingestion.profile import DatasetProfile
+from src.ingestion.excel_reader import read_workbook
 
 
-def load_data_file(uploaded_file):
-    """Load uploaded CSV or Excel file"""
+def load_data_file(uploaded_file, sheets=None):
+    """Load uploaded CSV or Excel file (the selected sheets of a workbook)"""
     try:
         # Determine file type and load accordingly
         if uploaded_file.name.endswith(".csv"):
             df = pd.read_csv(uploaded_file)
         elif uploaded_file.name.endswith((".xlsx", ".xls")):
-            df = pd.read_excel(uploaded_file)
+            df = read_workbook(uploaded_file.getvalue(), sheets)
         else:
             st.error("❌ Please upload a CSV or Excel file (.csv, .xlsx, .xls)")
             return None
 
-        # Update session state
-        st.session_state.current_df = df
-        st.session_state.andy_agent = create_andy_the_analyst(df)
-        st.session_state.data_loaded = True
-        st.session_state.initial_analysis_done = False
-        st.session_state.conversation_history = []
+        set_current_data(df)
+
+        return df
+
+    except Exception as e:
+        st.error(f"❌ Error loading file: {str(e)}")
+        return None
+
 
+def load_data_path(file_path, confine=True):
+    """Load a CSV from under the data root, tracked so it can be refreshed
+
+    confine=False takes file_path as is, for paths the app itself supplies.
+    """
+    try:
+        if confine:
+            file_path = resolve_data_path(file_path)
+        csv_tail = CsvTail(file_path)
+        df = csv_tail.load()
+        set_current_data(df, csv_tail)
         return df
 
     except Exception as e:
@@ -33,6 +58,89 @@ def load_data_file(uploaded_file):
         return None
 
 
+def set_current_data(df, csv_tail=None):
+    """Make df the session's dataset and build a fresh Andy around it"""
+    st.session_state.current_df = df
+    st.session_state.csv_tail = csv_tail
+    st.session_state.dataset_profile = DatasetProfile.from_frame(df)
+    st.session_state.dataset_fingerprint = dataset_fingerprint(df)
+    # Schema as loaded, before Andy's code converts any columns
+    st.session_state.dataset_schema = schema_of(df)
+    st.session_state.andy_agent = create_andy_the_analyst(df)
+    st.session_state.data_loaded = True
+    st.session_state.initial_analysis_done = False
+    st.session_state.conversation_history = []
+    st.session_state.chat_visible = CHAT_PAGE_SIZE
+
+    memory_accountant.attach(
+        st.session_state.session_id, get_repl_tool(st.session_state.andy_agent)
+    )
+    enforce_memory_budget()
+
+    # Warm up the quick actions while the user reads the initial analysis
+    start_prefetch_for_current_data()
+
+
+def refresh_current_data():
+    """Append rows written to the loaded CSV since it was (re)loaded
+
+    Andy and the conversation stay; only the new rows are parsed and
+    folded into the profile and fingerprint. Answers cached for the old
+    rows no longer match the fingerprint. Returns the change in row
+    count, or None on error.
+    """
+    try:
+        repl = get_repl_tool(st.session_state.andy_agent)
+        old_rows = len(repl.locals["df"])
+        # Andy's copy of the frame, with any conversions he made to it
+        df, appended, rebuilt = st.session_state.csv_tail.refresh(repl.locals["df"])
+        if len(appended) == 0 and not rebuilt:
+            return 0
+
+        if rebuilt:
+            st.session_state.dataset_profile = DatasetProfile.from_frame(df)
+            st.session_state.dataset_fingerprint = dataset_fingerprint(df)
+        else:
+            st.session_state.dataset_profile.update(appended)
+            st.session_state.dataset_fingerprint = extend_fingerprint(
+                st.session_state.dataset_fingerprint, appended
+            )
+        repl.locals["df"] = df
+        st.session_state.current_df = df
+        enforce_memory_budget()
+
+        # Prefetched answers describe the old rows
+        if st.session_state.get("prefetch_job") is not None:
+            st.session_state.prefetch_job.cancel()
+            st.session_state.prefetch_job = None
+        return len(df) - old_rows
+
+    except Exception as e:
+        st.error(f"❌ Error refreshing data: {str(e)}")
+        return None
+
+
+def get_dataset_metadata():
+    """Column table and memory estimate for the current dataset version
+
+    Computed once per dataset fingerprint (i.e. per load or refresh), so
+    reruns do not rescan the frame.
+    """
+    cached = st.session_state.dataset_metadata
+    fingerprint = st.session_state.dataset_fingerprint
+    if cached is None or cached["fingerprint"] != fingerprint:
+        df = st.session_state.current_df
+        columns = st.session_state.dataset_profile.to_frame()
+        cached = {
+            "fingerprint": fingerprint,
+            "rows": len(df),
+            "columns": columns[["column", "dtype", "non_null", "nulls"]],
+            "memory_bytes": estimate_nbytes(df),
+        }
+        st.session_state.dataset_metadata = cached
+    return cached
+
+
 def get_initial_analysis(df):
     """Get Andy's initial reaction and analysis of the uploaded data"""
 
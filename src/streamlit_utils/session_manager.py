@@ -2,8 +2,11 @@
 Session state management utilities for Streamlit app
 """
 
+import uuid
+
 import streamlit as st
 from langchain.memory import ConversationBufferWindowMemory
+from src.streamlit_utils.andy_interface import CHAT_PAGE_SIZE, cancel_active_run
 
 
 def initialize_session_state():
@@ -28,14 +31,59 @@ def initialize_session_state():
     if "initial_analysis_done" not in st.session_state:
         st.session_state.initial_analysis_done = False
 
+    if "dataset_fingerprint" not in st.session_state:
+        st.session_state.dataset_fingerprint = None
+
+    if "prefetch_job" not in st.session_state:
+        st.session_state.prefetch_job = None
+
+    if "last_routes" not in st.session_state:
+        st.session_state.last_routes = []
+
+    if "active_run" not in st.session_state:
+        st.session_state.active_run = None
+
+    if "dataset_schema" not in st.session_state:
+        st.session_state.dataset_schema = None
+
+    if "csv_tail" not in st.session_state:
+        st.session_state.csv_tail = None
+
+    if "dataset_profile" not in st.session_state:
+        st.session_state.dataset_profile = None
+
+    if "dataset_metadata" not in st.session_state:
+        st.session_state.dataset_metadata = None
+
+    if "session_charts" not in st.session_state:
+        st.session_state.session_charts = []
+
+    if "chat_visible" not in st.session_state:
+        st.session_state.chat_visible = CHAT_PAGE_SIZE
+
+    if "session_id" not in st.session_state:
+        # Names this session's memory account and spill directory
+        st.session_state.session_id = uuid.uuid4().hex[:12]
+
 
 def reset_session_for_new_data():
     """Reset session state when new data is loaded"""
+    if st.session_state.get("prefetch_job") is not None:
+        st.session_state.prefetch_job.cancel()
+    st.session_state.prefetch_job = None
+    st.session_state.dataset_fingerprint = None
+    cancel_active_run()
+    st.session_state.active_run = None
     st.session_state.data_loaded = False
     st.session_state.initial_analysis_done = False
     st.session_state.conversation_history = []
+    st.session_state.chat_visible = CHAT_PAGE_SIZE
+    st.session_state.session_charts = []
     st.session_state.andy_agent = None
     st.session_state.current_df = None
+    st.session_state.csv_tail = None
+    st.session_state.dataset_profile = None
+    st.session_state.dataset_metadata = None
 
 
 def get_session_info():
@@ -46,4 +94,5 @@ def get_session_info():
         "has_agent": st.session_state.get("andy_agent") is not None,
         "conversation_length": len(st.session_state.get("conversation_history", [])),
         "initial_analysis_done": st.session_state.get("initial_analysis_done", False),
+        "dataset_fingerprint": st.session_state.get("dataset_fingerprint"),
     }
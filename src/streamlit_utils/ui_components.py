@@ -4,6 +4,13 @@ UI components and styling utilities for Streamlit app
 
 import streamlit as st
 
+from src.streamlit_utils.data_handler import get_dataset_metadata
+
+# Rows and columns of the preview grid sent to the browser per page
+PREVIEW_ROWS = 25
+PREVIEW_COLUMNS = 40
+COLUMN_LIST_PAGE = 100
+
 
 def apply_custom_css():
     """Apply custom CSS styling to the Streamlit app"""
@@ -16,14 +23,14 @@ def apply_custom_css():
             text-align: center;
             margin-bottom: 2rem;
         }
-        .andy-chat {
+        .andy-chat, [class*="st-key-andy-chat-"] {
             background-color: #f0f8ff;
             padding: 1rem;
             border-radius: 10px;
             border-left: 5px solid #1f77b4;
             margin: 1rem 0;
         }
-        .user-chat {
+        .user-chat, [class*="st-key-user-chat-"] {
             background-color: #f5f5f5;
             padding: 1rem;
             border-radius: 10px;
@@ -90,10 +97,22 @@ def display_data_preview():
         return
 
     df = st.session_state.current_df
+    metadata = get_dataset_metadata()
 
     st.header("📋 Your Data")
     with st.expander("📊 Data Preview", expanded=True):
-        st.dataframe(df.head(10), use_container_width=True)
+        # Only the visible page of rows and columns is sliced and sent
+        nav1, nav2 = st.columns(2)
+        with nav1:
+            row_start, row_stop = paginate(df.shape[0], PREVIEW_ROWS, "preview_rows")
+        with nav2:
+            col_start, col_stop = paginate(
+                df.shape[1], PREVIEW_COLUMNS, "preview_columns", noun="columns"
+            )
+        st.dataframe(
+            df.iloc[row_start:row_stop, col_start:col_stop],
+            use_container_width=True,
+        )
 
         col1, col2, col3 = st.columns(3)
         with col1:
@@ -101,9 +120,46 @@ def display_data_preview():
         with col2:
             st.metric("Total Columns", df.shape[1])
         with col3:
-            st.metric(
-                "Memory Usage", f"{df.memory_usage(deep=True).sum() / 1024**2:.1f} MB"
-            )
+            st.metric("Memory Usage", f"{metadata['memory_bytes'] / 1024**2:.1f} MB")
+
+
+def paginate(total, page_size, key, noun="rows"):
+    """Page picker for a sequence of `total` items; returns (start, stop)"""
+    pages = max(1, -(-total // page_size))
+    if pages == 1:
+        return 0, total
+
+    # Keyed by dataset version: a new load or refresh starts at page 1
+    page = st.number_input(
+        f"Page of {noun} (of {pages})",
+        min_value=1,
+        max_value=pages,
+        value=1,
+        step=1,
+        key=f"{key}_{st.session_state.dataset_fingerprint}",
+    )
+    start = (page - 1) * page_size
+    return start, min(start + page_size, total)
+
+
+def display_column_details():
+    """Searchable, paginated column list built from cached metadata"""
+    columns = get_dataset_metadata()["columns"]
+
+    search = st.text_input("Filter columns", key="column_search")
+    if search:
+        columns = columns[
+            columns["column"].str.contains(search, case=False, regex=False)
+        ]
+
+    start, stop = paginate(
+        len(columns), COLUMN_LIST_PAGE, f"column_page_{search}", "columns"
+    )
+    st.dataframe(
+        columns.iloc[start:stop],
+        hide_index=True,
+        use_container_width=True,
+    )
 
 
 def display_footer():
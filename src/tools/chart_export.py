@@ -0,0 +1,281 @@
+"""
+Background static export of Andy's charts.
+
+The chart tools write the interactive HTML synchronously, then hand the
+figure to this queue for PNG/SVG copies. Rendering a static image starts a
+headless browser (kaleido) and can take seconds, so it runs in a small pool
+of worker processes and the answer never waits for it. Each export's status
+can be looked up by the chart's HTML path, and callbacks registered with
+on_export_done are told when an export finishes.
+"""
+
+import importlib.util
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures.process import BrokenProcessPool
+
+from src.tools.worker_pool import SpawnPoolExecutor
+
+EXPORT_FORMATS = [
+    fmt.strip()
+    for fmt in os.getenv("ANDY_CHART_EXPORT_FORMATS", "png,svg").split(",")
+    if fmt.strip()
+]
+EXPORT_WORKERS = int(os.getenv("ANDY_CHART_EXPORT_WORKERS", "2"))
+# Exports waiting or rendering at once; further charts keep their HTML only
+EXPORT_QUEUE_SIZE = int(os.getenv("ANDY_CHART_EXPORT_QUEUE", "32"))
+EXPORT_SCALE = float(os.getenv("ANDY_CHART_EXPORT_SCALE", "2"))
+# Finished exports remembered for status queries
+EXPORT_HISTORY = 500
+
+_TRUE = ("1", "true", "yes", "on")
+_FALSE = ("0", "false", "no", "off")
+
+_headless = None
+
+
+def set_headless(headless=True):
+    """Force headless mode for this process (servers, batch runs)"""
+    global _headless
+    _headless = headless
+
+
+def is_headless():
+    """True when charts should not be opened with fig.show()
+
+    ANDY_HEADLESS=1/0 forces the mode; otherwise a process that called
+    set_headless() or a Linux box without a display is headless.
+    """
+    setting = os.getenv("ANDY_HEADLESS", "").strip().lower()
+    if setting in _TRUE:
+        return True
+    if setting in _FALSE:
+        return False
+    if _headless is not None:
+        return _headless
+    if sys.platform.startswith("linux"):
+        return not (os.getenv("DISPLAY") or os.getenv("WAYLAND_DISPLAY"))
+    return False
+
+
+def renderer_available():
+    """True when the static image renderer (kaleido) is installed"""
+    return importlib.util.find_spec("kaleido") is not None
+
+
+def _render(figure_json, html_path, formats, scale):
+    """Worker: render one figure to static files next to its HTML"""
+    import plotly.io as pio
+
+    fig = pio.from_json(figure_json)
+    base = os.path.splitext(html_path)[0]
+    paths = [f"{base}.{fmt}" for fmt in formats]
+    # One browser session for every format when plotly supports it
+    if hasattr(pio, "write_images"):
+        pio.write_images([fig] * len(paths), paths, format=formats, scale=scale)
+    else:
+        for path, fmt in zip(paths, formats):
+            fig.write_image(path, format=fmt, scale=scale)
+    return paths
+
+
+class ExportJob:
+    """One chart's static export"""
+
+    def __init__(self, html_path, formats):
+        self.html_path = html_path
+        self.formats = list(formats)
+        self.status = "queued"
+        self.files = []
+        self.error = None
+        self.queued_at = time.monotonic()
+        self.seconds = None
+
+    @property
+    def done(self):
+        return self.status != "queued"
+
+    def to_dict(self):
+        return {
+            "status": self.status,
+            "files": list(self.files),
+            "error": self.error,
+            "seconds": self.seconds,
+        }
+
+
+class ChartExporter:
+    """Bounded process pool rendering charts to static images"""
+
+    def __init__(
+        self,
+        formats=EXPORT_FORMATS,
+        workers=EXPORT_WORKERS,
+        queue_size=EXPORT_QUEUE_SIZE,
+        scale=EXPORT_SCALE,
+    ):
+        self.formats = list(formats)
+        self.workers = workers
+        self.queue_size = queue_size
+        self.scale = scale
+        self._jobs = OrderedDict()  # html path -> ExportJob
+        self._pending = 0
+        self._callbacks = []
+        self._executor = None
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = SpawnPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def _discard_executor(self, executor):
+        """Forget a pool whose worker died, so the next export starts a new one"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def _remember(self, job):
+        self._jobs[job.html_path] = job
+        self._jobs.move_to_end(job.html_path)
+        while len(self._jobs) > EXPORT_HISTORY:
+            oldest = next(iter(self._jobs.values()))
+            if not oldest.done:
+                break
+            self._jobs.popitem(last=False)
+
+    def submit(self, fig, html_path):
+        """Queue static copies of fig next to html_path; returns the ExportJob
+
+        Never blocks on rendering. When the renderer is missing or the queue
+        is full the job is returned already finished, with the HTML alone.
+        """
+        job = ExportJob(html_path, self.formats)
+        if not self.formats:
+            job.status = "disabled"
+        elif not renderer_available():
+            job.status = "unavailable"
+            job.error = "Static export needs kaleido (pip install kaleido)"
+
+        with self._lock:
+            if not job.done and self._pending >= self.queue_size:
+                job.status = "skipped"
+                job.error = "Export queue full"
+            if job.done:
+                self._remember(job)
+                return job
+            self._pending += 1
+            self._remember(job)
+
+        executor = self._get_executor()
+        try:
+            future = executor.submit(
+                _render, fig.to_json(), html_path, job.formats, self.scale
+            )
+        except BrokenProcessPool as e:
+            self._discard_executor(executor)
+            self._finish(job, error=e)
+            return job
+        except Exception as e:
+            self._finish(job, error=e)
+            return job
+        future.add_done_callback(lambda f: self._finish(job, f, executor=executor))
+        return job
+
+    def _finish(self, job, future=None, error=None, executor=None):
+        if future is not None:
+            error = "cancelled" if future.cancelled() else future.exception()
+        if isinstance(error, BrokenProcessPool) and executor is not None:
+            self._discard_executor(executor)
+        if error is None:
+            job.files = future.result()
+            job.status = "done"
+        else:
+            job.status = "failed"
+            if not isinstance(error, str):
+                # Renderer errors run to a paragraph; the first line says enough
+                lines = str(error).strip().splitlines() or [""]
+                error = f"{type(error).__name__}: {lines[0]}"
+            job.error = error
+        job.seconds = round(time.monotonic() - job.queued_at, 2)
+
+        with self._lock:
+            self._pending -= 1
+            callbacks = list(self._callbacks)
+            self._idle.notify_all()
+        for callback in callbacks:
+            try:
+                callback(job)
+            except Exception:
+                pass  # A broken listener must not stop the others
+
+    def on_export_done(self, callback):
+        """Call callback(job) from a worker thread whenever an export finishes"""
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def remove_callback(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def status(self, html_path):
+        """The ExportJob for a chart, or None if it was never queued"""
+        with self._lock:
+            return self._jobs.get(html_path)
+
+    def wait(self, timeout=None):
+        """Block until no export is queued or running; False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def shutdown(self):
+        """Stop the worker processes; a later export starts new ones
+
+        A process that exits with them still idle waits on them for ever,
+        so pool workers that export charts call this before they finish.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def metrics(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {"pending": self._pending, "workers": self.workers, **counts}
+
+
+# One pool and queue, so all sessions together stay within their bounds
+chart_exporter = ChartExporter()
+
+
+def queue_static_export(fig, html_path):
+    """Called by the chart tools' generated code after writing the HTML"""
+    return chart_exporter.submit(fig, html_path)
+
+
+def describe_export(html_path):
+    """One-line status of a chart's static export, for chat and the CLI"""
+    job = chart_exporter.status(html_path)
+    if job is None:
+        return "no static export"
+    if job.status == "done":
+        return "🖼️ " + ", ".join(os.path.basename(path) for path in job.files)
+    if job.error:
+        return f"{job.status}: {job.error}"
+    return job.status
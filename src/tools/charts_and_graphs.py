@@ -2,17 +2,72 @@
 
 from langchain_core.tools import tool
 import os
+import re
 from datetime import datetime
 
+from src.tools.chart_export import is_headless
+
 # Chart save directory (all charts will be saved here):
 # /Users/colleendummeyer/Desktop/ANDY_THE_ANALYST/agentsetup2/data/processed
 
+# Every chart snippet ends by printing "... saved to: <filepath>". The chart
+# tools' own output holds that line unformatted ("{filepath}"), so only a
+# plain path ending in .html counts.
+CHART_PATH_PATTERN = re.compile(r"saved to: ([^\s{}\"']+\.html)")
+
+
+def find_chart_paths(text):
+    """Return the chart file paths announced in a tool's output"""
+    return CHART_PATH_PATTERN.findall(str(text))
+
+
+def find_run_chart_paths(steps):
+    """Chart paths printed by the Python tool over an agent run's steps
+
+    Only code that ran can have saved a chart; the chart tools merely return
+    the code to run.
+    """
+    return [
+        path
+        for action, observation in steps
+        if action.tool == "python_repl_ast"
+        for path in find_chart_paths(observation)
+    ]
+
+
+def _save_chart_code(prefix, label, message):
+    """Code shared by every chart tool: save fig as HTML and announce it
+
+    PNG/SVG copies are queued for the background exporter, so the answer
+    never waits for image rendering. fig.show() is left out when headless.
+    """
+    show = "" if is_headless() else "\nfig.show()"
+    return f"""
+# Save the chart
+save_dir = "/Users/colleendummeyer/Desktop/ANDY_THE_ANALYST/agentsetup2/data/processed"
+os.makedirs(save_dir, exist_ok=True)
+timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+clean_label = "".join(c for c in "{label}" if c.isalnum() or c in (' ', '-', '_')).replace(' ', '_')[:30]
+filename = f"{prefix}_{{clean_label}}_{{timestamp}}.html" if clean_label else f"{prefix}_{{timestamp}}.html"
+filepath = os.path.join(save_dir, filename)
+fig.write_html(filepath)
+
+# Static PNG/SVG copies render in the background
+from src.tools.chart_export import queue_static_export
+queue_static_export(fig, filepath)
+{show}
+print(f"{message} saved to: {{filepath}}")
+"""
+
 
 @tool
 def create_time_series_chart(
     df_name: str, date_column: str, value_column: str, title: str = "Time Series"
 ) -> str:
     """Create an interactive time series chart using Plotly. Use this when you need to show trends over time."""
+    save_code = _save_chart_code(
+        "time_series", title, "✨ Time series chart created and"
+    )
     code = f"""
 import plotly.express as px
 import plotly.graph_objects as go
@@ -32,18 +87,7 @@ fig.update_layout(
     hovermode='x unified'
 )
 
-# Save the chart
-save_dir = "/Users/colleendummeyer/Desktop/ANDY_THE_ANALYST/agentsetup2/data/processed"
-os.makedirs(save_dir, exist_ok=True)
-timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-clean_title = "".join(c for c in "{title}" if c.isalnum() or c in (' ', '-', '_')).replace(' ', '_')[:30]
-filename = f"time_series_{{clean_title}}_{{timestamp}}.html" if clean_title else f"time_series_{{timestamp}}.html"
-filepath = os.path.join(save_dir, filename)
-fig.write_html(filepath)
-
-fig.show()
-print(f"✨ Time series chart created and saved to: {{filepath}}")
-"""
+{save_code}"""
     return f"Created time series chart code. Execute this:\n{code}"
 
 
@@ -69,6 +113,9 @@ fig = px.treemap({df_name}, path=['{category_column}'], values='{value_column}',
 """,
     }
 
+    save_code = _save_chart_code(
+        chart_type, category_column, f"📊 {chart_type.title()} chart created and"
+    )
     code = f"""
 import plotly.express as px
 import os
@@ -79,18 +126,7 @@ chart_data = {df_name}.groupby('{category_column}')['{value_column}'].sum().rese
 
 {chart_code.get(chart_type, chart_code["bar"])}
 
-# Save the chart
-save_dir = "/Users/colleendummeyer/Desktop/ANDY_THE_ANALYST/agentsetup2/data/processed"
-os.makedirs(save_dir, exist_ok=True)
-timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-clean_category = "".join(c for c in "{category_column}" if c.isalnum() or c in (' ', '-', '_')).replace(' ', '_')[:30]
-filename = f"{chart_type}_{{clean_category}}_{{timestamp}}.html"
-filepath = os.path.join(save_dir, filename)
-fig.write_html(filepath)
-
-fig.show()
-print(f"📊 {chart_type.title()} chart created and saved to: {{filepath}}")
-"""
+{save_code}"""
 
     return f"Created {chart_type} chart code. Execute this:\n{code}"
 
@@ -106,6 +142,7 @@ def create_scatter_plot(
     """Create an interactive scatter plot to show relationships between variables."""
 
     color_param = f", color='{color_column}'" if color_column else ""
+    save_code = _save_chart_code("scatter", title, "🎯 Scatter plot created and")
 
     code = f"""
 import plotly.express as px
@@ -121,17 +158,6 @@ fig.update_layout(
     yaxis_title='{y_column}'
 )
 
-# Save the chart
-save_dir = "/Users/colleendummeyer/Desktop/ANDY_THE_ANALYST/agentsetup2/data/processed"
-os.makedirs(save_dir, exist_ok=True)
-timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-clean_title = "".join(c for c in "{title}" if c.isalnum() or c in (' ', '-', '_')).replace(' ', '_')[:30]
-filename = f"scatter_{{clean_title}}_{{timestamp}}.html" if clean_title else f"scatter_{{timestamp}}.html"
-filepath = os.path.join(save_dir, filename)
-fig.write_html(filepath)
-
-fig.show()
-print(f"🎯 Scatter plot created and saved to: {{filepath}}")
-"""
+{save_code}"""
 
     return f"Created scatter plot code. Execute this:\n{code}"
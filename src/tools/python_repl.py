@@ -0,0 +1,139 @@
+# Thread-safe Python REPL tool for Andy's agents
+
+import ast
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from io import StringIO
+
+from langchain_experimental.tools.python.tool import PythonAstREPLTool, sanitize_input
+from pydantic import Field, PrivateAttr
+
+from src.models.memory_budget import restore_spilled
+from src.tools.repl_profiler import PROFILE_HISTORY, PROFILE_REPL, SnippetProfiler
+
+
+class _ThreadStdout:
+    """sys.stdout stand-in that lets each thread capture its own output"""
+
+    def __init__(self, default):
+        self._default = default
+        self._local = threading.local()
+
+    def _target(self):
+        return getattr(self._local, "target", None) or self._default
+
+    def write(self, text):
+        return self._target().write(text)
+
+    def flush(self):
+        return self._target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self._target(), name)
+
+
+_install_lock = threading.Lock()
+
+
+@contextmanager
+def capture_thread_stdout(buffer):
+    """Like contextlib.redirect_stdout, but only for the calling thread"""
+    with _install_lock:
+        if not isinstance(sys.stdout, _ThreadStdout):
+            sys.stdout = _ThreadStdout(sys.stdout)
+        proxy = sys.stdout
+
+    previous = getattr(proxy._local, "target", None)
+    proxy._local.target = buffer
+    try:
+        yield buffer
+    finally:
+        proxy._local.target = previous
+
+
+class ThreadSafePythonAstREPLTool(PythonAstREPLTool):
+    """PythonAstREPLTool that is safe to run from several threads at once.
+
+    The stock tool swaps the process-wide sys.stdout while it evaluates the
+    last statement, so two agents running concurrently (several Streamlit
+    sessions, prefetch workers) can capture each other's output or leave
+    stdout pointing at a dead buffer. This version captures per thread.
+
+    It also records when each name in its namespace was last used and loads
+    back frames the memory accountant spilled to disk before code uses them.
+
+    With profile_snippets on, each snippet is profiled (see repl_profiler);
+    the report goes to the agent's trace and to `profiles`, never to the LLM.
+    """
+
+    names_last_used: dict = Field(default_factory=dict)
+    profile_snippets: bool = Field(default_factory=lambda: PROFILE_REPL)
+    profiles: list = Field(default_factory=list)
+    _namespace_lock: threading.RLock = PrivateAttr(default_factory=threading.RLock)
+
+    @property
+    def namespace_lock(self):
+        """Held while code runs; the memory accountant never spills under it"""
+        return self._namespace_lock
+
+    def _run(self, query, run_manager=None):
+        """Use the tool."""
+        profiler = None
+        with self._namespace_lock:
+            try:
+                if self.sanitize_input:
+                    query = sanitize_input(query)
+                tree = ast.parse(query)
+
+                names = {
+                    node.id for node in ast.walk(tree) if isinstance(node, ast.Name)
+                }
+                restore_spilled(self.locals, names)
+                now = time.monotonic()
+                self.names_last_used.update(dict.fromkeys(names, now))
+
+                if not self.profile_snippets:
+                    return self._execute(tree)
+                profiler = SnippetProfiler(query, self.locals, names)
+                with profiler:
+                    return self._execute(tree, profiler)
+            except Exception as e:
+                return "{}: {}".format(type(e).__name__, str(e))
+            finally:
+                if profiler is not None:
+                    self._record(profiler.profile, run_manager)
+
+    def _record(self, profile, run_manager):
+        self.profiles.append(profile)
+        del self.profiles[:-PROFILE_HISTORY]
+        if run_manager is not None:
+            run_manager.on_text(f"\n🔬 {profile.summary()}\n", verbose=self.verbose)
+
+    def _execute(self, tree, profiler=None):
+        """Run every statement, returning the last one's value or the output"""
+        if profiler is None:
+            module = ast.Module(tree.body[:-1], type_ignores=[])
+            exec(ast.unparse(module), self.globals, self.locals)
+        else:
+            # One statement at a time, so the slow one can be named
+            for statement in tree.body[:-1]:
+                source = ast.unparse(statement)
+                with profiler.statement(source):
+                    exec(source, self.globals, self.locals)
+
+        module_end_str = ast.unparse(ast.Module(tree.body[-1:], type_ignores=[]))
+        last = profiler.statement(module_end_str) if profiler else nullcontext()
+        io_buffer = StringIO()
+        with last:
+            try:
+                with capture_thread_stdout(io_buffer):
+                    ret = eval(module_end_str, self.globals, self.locals)
+                if ret is None:
+                    return io_buffer.getvalue()
+                return ret
+            except Exception:
+                with capture_thread_stdout(io_buffer):
+                    exec(module_end_str, self.globals, self.locals)
+                return io_buffer.getvalue()
@@ -0,0 +1,225 @@
+"""
+Opt-in profiling of the code Andy runs in his Python tool.
+
+When an answer is slow, the question is usually which generated pandas
+statement was at fault: an apply over rows, a to_datetime on every call, a
+huge merge. With profiling on (ANDY_PROFILE_REPL=1, or `profile on` in the
+CLI), every snippet is timed statement by statement and records:
+
+- CPU time, with the hottest functions from cProfile
+- peak Python allocations, from tracemalloc
+- rows touched: the rows of every DataFrame/Series the snippet names,
+  before or after it runs
+
+tracemalloc counts allocations process-wide, so while several sessions run
+code at once a snippet's peak includes theirs. Tracing slows every
+allocation, so it runs only while some snippet is being profiled, unless
+something else had already started it.
+
+Only one snippet at a time gets cProfile's function stats: from Python 3.12
+a profiler hooks every thread, so a second one could not start. A snippet
+profiled while another is still reports its time, memory and rows.
+"""
+
+import cProfile
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+PROFILE_REPL = os.getenv("ANDY_PROFILE_REPL", "").lower() in ("1", "true", "yes", "on")
+# Hottest functions kept per snippet
+PROFILE_TOP_FUNCTIONS = int(os.getenv("ANDY_PROFILE_TOP", "5"))
+# Snippet profiles kept per session
+PROFILE_HISTORY = 200
+
+MB = 1024**2
+
+# Frames of the profiling itself rather than of Andy's code
+_OWN_FRAMES = ("<string>", __file__, "python_repl.py", "contextlib.py", "ast.py")
+_OWN_FUNCTIONS = ("_lsprof", "builtins.exec", "builtins.eval")
+
+# Held by the snippet whose function calls cProfile is recording
+_cprofile_lock = threading.Lock()
+
+# Snippets being profiled, and whether tracemalloc was started for them
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_started_tracing = False
+
+
+def _start_tracing():
+    global _tracing_users, _started_tracing
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracing = True
+        _tracing_users += 1
+
+
+def _stop_tracing():
+    """The last snippet out stops tracing, if it was started for them"""
+    global _tracing_users, _started_tracing
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _started_tracing:
+            tracemalloc.stop()
+            _started_tracing = False
+
+
+def rows_in(namespace, names):
+    """{name: rows} for the DataFrames and Series among names"""
+    return {
+        name: len(namespace[name])
+        for name in names
+        if isinstance(namespace.get(name), (pd.DataFrame, pd.Series))
+    }
+
+
+def _short(source, width=80):
+    line = " ".join(source.split())
+    return line if len(line) <= width else line[: width - 1] + "…"
+
+
+@dataclass
+class SnippetProfile:
+    """What one execution of the Python tool cost"""
+
+    code: str
+    seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    peak_bytes: int = 0
+    rows_touched: int = 0
+    statements: list = field(default_factory=list)  # (source, seconds)
+    functions: list = field(default_factory=list)  # (function, seconds, calls)
+    # False when another snippet had cProfile, so functions is empty
+    functions_profiled: bool = True
+
+    @property
+    def slowest_statement(self):
+        if not self.statements:
+            return None
+        return max(self.statements, key=lambda statement: statement[1])
+
+    def summary(self):
+        """One-paragraph report for the agent trace"""
+        lines = [
+            f"⏱️ {self.seconds:.3f}s wall, {self.cpu_seconds:.3f}s CPU, "
+            f"peak {self.peak_bytes / MB:.1f} MB, {self.rows_touched:,} rows touched"
+        ]
+        slowest = self.slowest_statement
+        if slowest is not None and len(self.statements) > 1:
+            lines.append(
+                f"   slowest statement ({slowest[1]:.3f}s): {_short(slowest[0])}"
+            )
+        for function, seconds, calls in self.functions:
+            lines.append(f"   {seconds:.3f}s in {calls:,} calls: {function}")
+        if not self.functions_profiled:
+            lines.append("   (no function stats: another snippet was being profiled)")
+        return "\n".join(lines)
+
+
+class SnippetProfiler:
+    """Profiles one snippet; use as a context manager around its execution"""
+
+    def __init__(self, code, namespace, names):
+        self.profile = SnippetProfile(code=code)
+        self._namespace = namespace
+        self._names = names
+        self._rows_before = rows_in(namespace, names)
+        self._cprofile = None
+
+    def __enter__(self):
+        _start_tracing()
+        self._memory_start = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        self._cpu_start = time.thread_time()
+        self._start = time.perf_counter()
+        self._enable_cprofile()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            _cprofile_lock.release()
+        profile = self.profile
+        profile.seconds = time.perf_counter() - self._start
+        profile.cpu_seconds = time.thread_time() - self._cpu_start
+        profile.peak_bytes = max(
+            0, tracemalloc.get_traced_memory()[1] - self._memory_start
+        )
+        _stop_tracing()
+
+        rows_after = rows_in(self._namespace, self._names)
+        profile.rows_touched = sum(
+            max(self._rows_before.get(name, 0), rows_after.get(name, 0))
+            for name in set(self._rows_before) | set(rows_after)
+        )
+        if self._cprofile is None:
+            profile.functions_profiled = False
+        else:
+            profile.functions = self._hottest_functions()
+        return False
+
+    def _enable_cprofile(self):
+        """Record function calls unless another profiler already is"""
+        if not _cprofile_lock.acquire(blocking=False):
+            return
+        cprofile = cProfile.Profile()
+        try:
+            cprofile.enable()
+        except ValueError:
+            # A profiler from outside this module, on Python 3.12+
+            _cprofile_lock.release()
+            return
+        self._cprofile = cprofile
+
+    @contextmanager
+    def statement(self, source):
+        """Time one top-level statement of the snippet"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.profile.statements.append((source, time.perf_counter() - start))
+
+    def _hottest_functions(self):
+        """Functions with the most cumulative time, outside the snippet itself"""
+        stats = pstats.Stats(self._cprofile)
+        rows = []
+        for (filename, line, name), (_, calls, _, cumulative, _) in stats.stats.items():
+            if filename.endswith(_OWN_FRAMES) or any(f in name for f in _OWN_FUNCTIONS):
+                continue
+            if filename == "~":
+                rows.append((name, cumulative, calls))  # Built-in
+            else:
+                location = f"{os.path.basename(filename)}:{line}"
+                rows.append((f"{name} ({location})", cumulative, calls))
+        rows = [row for row in rows if row[1] >= 0.001]
+        rows.sort(key=lambda row: row[1], reverse=True)
+        return rows[:PROFILE_TOP_FUNCTIONS]
+
+
+def top_offenders(profiles, n=5):
+    """The n slowest snippets, slowest first"""
+    return sorted(profiles, key=lambda profile: profile.seconds, reverse=True)[:n]
+
+
+def format_offenders(profiles, n=5):
+    """Report of the slowest snippets and the statements to blame"""
+    if not profiles:
+        return "No profiled code yet - ask Andy something first."
+    lines = [
+        f"🔬 {len(profiles)} snippets profiled, "
+        f"{sum(p.seconds for p in profiles):.2f}s in total. Slowest:"
+    ]
+    for rank, profile in enumerate(top_offenders(profiles, n), 1):
+        slowest = profile.slowest_statement
+        lines.append(f"\n{rank}. {_short(slowest[0] if slowest else profile.code)}")
+        lines.append(profile.summary())
+    return "\n".join(lines)
@@ -0,0 +1,39 @@
+"""
+Process pools that are safe to start from inside Streamlit.
+
+Workers are spawned, not forked, because forking a process that runs
+Streamlit's threads is unsafe. A spawned worker normally re-runs the parent's
+__main__ script before it starts. Under Streamlit that script is the app
+itself, and under AppTest it is a temporary file that cannot run on its own.
+SpawnPoolExecutor hides the script while it starts workers, so they only
+import the modules their tasks need.
+"""
+
+import multiprocessing
+import sys
+import threading
+import types
+from concurrent.futures import ProcessPoolExecutor
+
+_main_lock = threading.Lock()
+
+
+class SpawnPoolExecutor(ProcessPoolExecutor):
+    """ProcessPoolExecutor whose spawned workers skip the __main__ script"""
+
+    def __init__(self, max_workers=None, **kwargs):
+        super().__init__(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            **kwargs,
+        )
+
+    def submit(self, fn, /, *args, **kwargs):
+        # Workers are started on demand, from inside submit
+        with _main_lock:
+            main = sys.modules["__main__"]
+            sys.modules["__main__"] = types.ModuleType("__main__")
+            try:
+                return super().submit(fn, *args, **kwargs)
+            finally:
+                sys.modules["__main__"] = main
@@ -1,5 +1,5 @@
+import os
 import streamlit as st
-import pandas as pd
 from datetime import datetime
 
 # Load environment variables
@@ -13,6 +13,7 @@ from src.streamlit_utils.ui_components import (
     apply_custom_css,
     display_welcome_section,
     display_data_preview,
+    display_column_details,
     display_footer,
     display_intro_text,
 )
@@ -21,13 +22,31 @@ from src.streamlit_utils.image_utils import (
     display_andy_main_image,
     display_andy_sidebar_image,
 )
-from src.streamlit_utils.data_handler import load_data_file, get_initial_analysis
+from src.streamlit_utils.data_handler import (
+    load_data_file,
+    load_data_path,
+    refresh_current_data,
+    get_initial_analysis,
+)
 from src.streamlit_utils.andy_interface import (
     ask_andy,
     display_conversation_history,
     add_to_conversation,
     get_quick_actions,
+    wait_for_active_run,
+    cancel_active_run,
+    replay_recipe_on_current_data,
 )
+from src.models.prefetch import get_prefetched_charts
+from src.models.model_router import model_router, describe_routes
+from src.models.single_flight import ask_flight
+from src.models.recipes import list_recipes
+from src.ingestion.excel_reader import list_sheets
+from src.models.memory_budget import memory_accountant, MB
+from src.tools.chart_export import describe_export, set_headless
+
+# Charts open in the app, never in a browser on the server
+set_headless()
 
 # Page configuration
 st.set_page_config(
@@ -60,27 +79,149 @@ with st.sidebar:
     )
 
     if uploaded_file is not None:
-        if st.button("🚀 Load Data", type="primary"):
+        sheets = None
+        if uploaded_file.name.endswith((".xlsx", ".xls")):
+            sheet_names = list_sheets(uploaded_file.getvalue())
+            sheets = st.multiselect(
+                "Sheets",
+                sheet_names,
+                default=sheet_names[:1],
+                help="Pick one or more sheets; several are stacked with a 'Sheet' column",
+            )
+
+        if st.button("🚀 Load Data", type="primary", disabled=sheets == []):
             with st.spinner("Loading data..."):
-                df = load_data_file(uploaded_file)
+                df = load_data_file(uploaded_file, sheets)
                 if df is not None:
                     st.success(
                         f"✅ Data loaded! {df.shape[0]} rows, {df.shape[1]} columns"
                     )
                     st.rerun()
 
+    # Files on the server (e.g. an export that grows) can be refreshed later
+    with st.expander("📂 Load from server path"):
+        server_path = st.text_input(
+            "CSV path",
+            placeholder="exports/today.csv",
+            help="Relative to the server's data folder (ANDY_API_DATA_ROOT)",
+        )
+        if st.button("📥 Load path") and server_path.strip():
+            with st.spinner("Loading data..."):
+                df = load_data_path(server_path.strip())
+                if df is not None:
+                    st.rerun()
+
     # Display data info if loaded
     if st.session_state.data_loaded:
         st.header("📊 Dataset Info")
         df = st.session_state.current_df
         st.write(f"**Rows:** {df.shape[0]}")
         st.write(f"**Columns:** {df.shape[1]}")
-        st.write(f"**File:** {uploaded_file.name if uploaded_file else 'Unknown'}")
+        csv_tail = st.session_state.csv_tail
+        if csv_tail is not None:
+            st.write(f"**File:** {csv_tail.path.split('/')[-1]}")
+        else:
+            st.write(f"**File:** {uploaded_file.name if uploaded_file else 'Unknown'}")
+
+        if csv_tail is not None:
+            if st.button(
+                "🔄 Refresh (new rows only)",
+                help="Read rows appended to the file since it was loaded",
+            ):
+                added = refresh_current_data()
+                if added is not None:
+                    st.toast(f"🔄 {added:,} new rows")
+                    st.rerun()
+
+        st.button(
+            "🛑 Stop Andy",
+            on_click=cancel_active_run,
+            help="Stop the current analysis and get a partial answer",
+        )
 
         # Show column types
         with st.expander("Column Details"):
-            for col, dtype in df.dtypes.items():
-                st.write(f"**{col}:** {dtype}")
+            display_column_details()
+
+        # Show what Andy has already worked out in the background
+        if st.session_state.prefetch_job is not None:
+            with st.expander("🔮 Prefetched Analyses"):
+                summary = st.session_state.prefetch_job.summary()
+                st.write(
+                    ", ".join(f"**{status}:** {n}" for status, n in summary.items())
+                )
+                charts = get_prefetched_charts(st.session_state.dataset_fingerprint)
+                for chart_path in charts.values():
+                    st.write(f"📈 {chart_path.split('/')[-1]}")
+                for task, error in st.session_state.prefetch_job.errors.items():
+                    st.caption(f"⚠️ {task}: {error}")
+
+        # Saved analyses that can re-run on this data without the LLM
+        recipes = list_recipes()
+        if recipes:
+            with st.expander("📜 Recipes"):
+                recipe_name = st.selectbox(
+                    "Saved analyses",
+                    [name for name, _ in recipes],
+                    format_func=lambda name: dict(recipes)[name][:60],
+                )
+                if st.button("▶️ Replay on this data"):
+                    add_to_conversation("user", f"Replay recipe: {recipe_name}")
+                    add_to_conversation(
+                        "andy", replay_recipe_on_current_data(recipe_name)
+                    )
+                    st.rerun()
+
+        # Static copies of this session's charts, rendered in the background
+        if st.session_state.session_charts:
+            with st.expander("🖼️ Chart Exports"):
+                for chart_path in st.session_state.session_charts[-10:]:
+                    st.write(
+                        f"📈 {os.path.basename(chart_path)}: "
+                        f"{describe_export(chart_path)}"
+                    )
+
+        # What this session holds in memory, against its budget
+        with st.expander("🧮 Memory"):
+            usage = memory_accountant.usage(st.session_state.session_id)
+            budget = memory_accountant.session_budget
+            st.progress(
+                min(usage.resident / budget, 1.0),
+                text=f"{usage.resident / MB:.1f} of {budget / MB:.0f} MB",
+            )
+            st.write(f"**Dataset:** {usage.dataset / MB:.1f} MB")
+            st.write(
+                f"**Andy's workspace:** {usage.workspace / MB:.1f} MB "
+                f"({usage.workspace_frames} frames)"
+            )
+            if usage.spilled_frames:
+                st.write(
+                    f"**Spilled to disk:** {usage.spilled / MB:.1f} MB "
+                    f"({usage.spilled_frames} frames)"
+                )
+            st.write(f"**Conversation:** {usage.conversation / MB:.2f} MB")
+            st.caption(
+                f"Server: {memory_accountant.total_usage() / MB:.0f} of "
+                f"{memory_accountant.total_budget / MB:.0f} MB across "
+                f"{memory_accountant.session_count()} sessions"
+            )
+
+        # Which model tiers have been answering
+        with st.expander("🧭 Model Tiers"):
+            if st.session_state.last_routes:
+                st.write(
+                    f"**Last answer:** {describe_routes(st.session_state.last_routes)}"
+                )
+            for tier, stats in model_router.summary().items():
+                st.write(
+                    f"**{tier}** ({model_router.tiers[tier]}): {stats['calls']} calls, "
+                    f"median {stats['median_seconds'] or '-'}s"
+                )
+            flights = ask_flight.metrics()
+            st.caption(
+                f"🛬 {flights['coalesced']} of {flights['calls']} questions joined "
+                f"an identical run already in flight"
+            )
 
 # Main content area
 if not st.session_state.data_loaded:
@@ -90,19 +231,9 @@ if not st.session_state.data_loaded:
     # Sample data option
     if st.button("🎯 Try with Sample Sales Data", type="secondary"):
         sample_path = "data/sample_sales_data.csv"
-        try:
-            df = pd.read_csv(sample_path)
-            st.session_state.current_df = df
-            from src.models.pandas_agent import create_andy_the_analyst
-
-            st.session_state.andy_agent = create_andy_the_analyst(df)
-            st.session_state.data_loaded = True
-            st.session_state.initial_analysis_done = False
-            st.session_state.conversation_history = []
+        if load_data_path(sample_path, confine=False) is not None:
             st.success("✅ Sample data loaded!")
             st.rerun()
-        except Exception as e:
-            st.error(f"❌ Error loading sample data: {str(e)}")
 
 else:
     # Data is loaded - show the analysis interface
@@ -114,7 +245,7 @@ else:
 
         with st.spinner("Andy is analyzing your data..."):
             initial_prompt = get_initial_analysis(st.session_state.current_df)
-            initial_response = ask_andy(initial_prompt)
+            initial_response = ask_andy(initial_prompt, as_recipe=False)
 
             st.markdown('<div class="andy-chat">', unsafe_allow_html=True)
             st.markdown(f"**🤓 Andy:** {initial_response}")
@@ -130,6 +261,13 @@ else:
     # Display conversation history
     display_conversation_history()
 
+    # Collect an answer whose run was interrupted by a rerun (e.g. Stop)
+    if st.session_state.active_run is not None:
+        with st.spinner("Andy is wrapping up..."):
+            response = wait_for_active_run()
+        add_to_conversation("andy", response)
+        st.rerun()
+
     # User input
     user_question = st.text_input(
         "Ask Andy anything about your data:",
@@ -0,0 +1,136 @@
+import asyncio
+import json
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from src.api.server import create_app
+from src.models.llm_scheduler import get_shared_llm
+from src.models.model_router import get_routed_llm
+from src.models.single_flight import ask_flight
+from src.models.stub_llm_server import start_stub_server
+
+CSV = "Date,Product,Amount\n2024-01-01,Laptop,10\n2024-01-02,Notebook,20\n"
+
+
+@pytest.fixture(scope="module")
+def stub():
+    """One stand-in LLM for the module: the chat model is process-wide"""
+    server, url = start_stub_server()
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("ANTHROPIC_BASE_URL", url)
+        patch.setenv("ANTHROPIC_API_KEY", "stub")
+        get_routed_llm.cache_clear()
+        get_shared_llm.cache_clear()
+        yield server.RequestHandlerClass.settings
+    server.shutdown()
+    get_routed_llm.cache_clear()
+    get_shared_llm.cache_clear()
+
+
+@pytest.fixture
+def api(stub, tmp_path, monkeypatch):
+    """Run scenario(client, stub settings) against a test client of the API;
+    keyword arguments configure the stand-in LLM for this run"""
+    monkeypatch.setenv("ANDY_API_DATA_ROOT", str(tmp_path))
+    (tmp_path / "sales.csv").write_text(CSV)
+
+    def run(scenario, latency=0.05, tool_rate=0.0):
+        stub.latency, stub.tool_rate = latency, tool_rate
+        stub.counts.update(dict.fromkeys(stub.counts, 0))
+
+        async def main():
+            async with TestClient(TestServer(create_app(workers=4))) as client:
+                return await scenario(client, stub)
+
+        return asyncio.run(main())
+
+    return run
+
+
+async def new_session(client, path="sales.csv"):
+    response = await client.post("/sessions")
+    session_id = (await response.json())["session_id"]
+    response = await client.post(f"/sessions/{session_id}/dataset", json={"path": path})
+    return session_id, response
+
+
+def parse_sse(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        event, data = block.split("\n", 1)
+        events.append((event[len("event: ") :], json.loads(data[len("data: ") :])))
+    return events
+
+
+def test_load_dataset_from_the_data_root(api):
+    async def scenario(client, stub):
+        session_id, response = await new_session(client)
+        assert response.status == 200
+        body = await response.json()
+        assert body["rows"] == 2
+        assert body["columns"] == ["Date", "Product", "Amount"]
+
+        session = await (await client.get(f"/sessions/{session_id}")).json()
+        assert session["dataset"] == body["fingerprint"]
+        health = await (await client.get("/health")).json()
+        assert health["sessions"] == 1
+        assert health["datasets"] == 1
+        assert health["workers"] == 4
+
+    api(scenario)
+
+
+def test_paths_outside_the_data_root_are_refused(api):
+    async def scenario(client, stub):
+        _, response = await new_session(client, "../../etc/passwd")
+        assert response.status == 403
+
+    api(scenario)
+
+
+def test_ask_streams_steps_then_the_answer(api):
+    async def scenario(client, stub):
+        session_id, _ = await new_session(client)
+        response = await client.post(
+            f"/sessions/{session_id}/ask",
+            json={"question": "What is the total amount?"},
+            headers={"Accept": "text/event-stream"},
+        )
+        assert response.content_type == "text/event-stream"
+        return parse_sse(await response.text())
+
+    events = api(scenario, tool_rate=1.0)
+
+    assert [event for event, _ in events] == ["step", "answer"]
+    step, answer = events[0][1], events[1][1]
+    assert step["tool"] == "python_repl_ast"
+    assert step["input"] == "df.describe()"
+    assert "stand-in LLM answer" in answer["answer"]
+    assert answer["status"] == "ok"
+
+
+def test_identical_questions_share_one_run(api):
+    async def scenario(client, stub):
+        first, _ = await new_session(client)
+        second, _ = await new_session(client)
+        before = ask_flight.metrics()
+        responses = await asyncio.gather(
+            *(
+                client.post(
+                    f"/sessions/{session_id}/ask",
+                    json={"question": "Which product sells best?"},
+                )
+                for session_id in (first, second)
+            )
+        )
+        answers = [await response.json() for response in responses]
+        return before, ask_flight.metrics(), answers, dict(stub.counts)
+
+    before, after, answers, counts = api(scenario, latency=0.3, tool_rate=1.0)
+
+    assert after["runs"] - before["runs"] == 1
+    assert after["coalesced"] - before["coalesced"] == 1
+    assert answers[0]["answer"] == answers[1]["answer"]
+    # One run: a tool hop and the answer
+    assert counts["ok"] == 2
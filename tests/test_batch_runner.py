@@ -0,0 +1,71 @@
+import json
+
+from src.models import batch_runner
+from src.models.batch_runner import completed_tasks, run_batch
+
+
+def write_manifest(tmp_path, questions, datasets):
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(json.dumps({"questions": questions, "datasets": datasets}))
+    return str(manifest)
+
+
+def read_records(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def fake_answers(monkeypatch, fail=()):
+    """Replace the agent run; returns the (dataset, question) pairs asked"""
+    asked = []
+
+    def answer(datasets, dataset_path, question, cancel_event=None):
+        asked.append((dataset_path, question))
+        if question in fail:
+            raise RuntimeError("worker died")
+        return {
+            "dataset": dataset_path,
+            "question": question,
+            "status": "ok",
+            "answer": "42",
+            "seconds": 0.0,
+        }
+
+    monkeypatch.setattr(batch_runner, "answer_question", answer)
+    return asked
+
+
+def test_resume_skips_answered_pairs_and_retries_errors(tmp_path, monkeypatch):
+    manifest = write_manifest(tmp_path, ["q1", "q2"], ["a.csv", "b.csv"])
+    a, b = str(tmp_path / "a.csv"), str(tmp_path / "b.csv")
+    output = tmp_path / "results.jsonl"
+    output.write_text(
+        json.dumps({"dataset": a, "question": "q1", "status": "ok"})
+        + "\n"
+        + json.dumps({"dataset": a, "question": "q2", "status": "error"})
+        + "\n"
+        + '{"dataset": "'  # Cut short by an interruption
+    )
+    asked = fake_answers(monkeypatch)
+
+    run_batch(manifest, str(output), workers=2)
+
+    assert sorted(asked) == [(a, "q2"), (b, "q1"), (b, "q2")]
+    assert completed_tasks(str(output)) == {(a, "q1"), (a, "q2"), (b, "q1"), (b, "q2")}
+
+    asked.clear()
+    run_batch(manifest, str(output), workers=2)
+    assert asked == []
+
+
+def test_failed_worker_is_recorded_and_the_batch_goes_on(tmp_path, monkeypatch):
+    manifest = write_manifest(tmp_path, ["q1", "broken"], ["a.csv"])
+    output = tmp_path / "results.jsonl"
+    fake_answers(monkeypatch, fail={"broken"})
+
+    run_batch(manifest, str(output), workers=2)
+
+    records = {record["question"]: record for record in read_records(output)}
+    assert records["q1"]["status"] == "ok"
+    assert records["broken"]["status"] == "error"
+    assert records["broken"]["error"] == "RuntimeError: worker died"
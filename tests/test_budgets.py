@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+from langchain_core.agents import AgentAction
+
+from src.models.budgets import AnalysisBudget, run_with_budget
+from src.models.llm_scheduler import DeadlineExceeded, llm_deadline, time_left
+
+
+class SlowAgent:
+    """Stands in for an AgentExecutor whose second step never finishes in time"""
+
+    max_execution_time = None
+
+    def __init__(self, step_seconds):
+        self.step_seconds = step_seconds
+        self.released = threading.Event()
+
+    def iter(self, inputs, callbacks=None):
+        action = AgentAction("python_repl_ast", {"query": "df.shape"}, "")
+        yield {"intermediate_step": [(action, "(100, 3)")]}
+        # A long-running snippet: blocks inside the step
+        self.released.wait(self.step_seconds)
+        yield {"output": "too late"}
+
+
+def budget(seconds):
+    return AnalysisBudget(max_seconds=seconds, max_tokens=10_000, max_iterations=10)
+
+
+def test_time_budget_cuts_off_a_long_step():
+    agent = SlowAgent(step_seconds=30)
+    started = time.monotonic()
+    run = run_with_budget(agent, "How many rows?", budget(0.5))
+    agent.released.set()
+
+    assert run.stop_reason == "time"
+    assert time.monotonic() - started < 2
+    assert len(run.steps) == 1
+    assert "(100, 3)" in run.output
+
+
+def test_cancel_ends_the_run_mid_step():
+    agent = SlowAgent(step_seconds=30)
+    cancel = threading.Event()
+    threading.Timer(0.3, cancel.set).start()
+    run = run_with_budget(agent, "How many rows?", budget(30), cancel_event=cancel)
+    agent.released.set()
+
+    assert run.stop_reason == "cancelled"
+    assert run.seconds < 2
+
+
+def test_answer_within_budget_finishes():
+    agent = SlowAgent(step_seconds=0)
+    run = run_with_budget(agent, "How many rows?", budget(5))
+
+    assert run.stop_reason == "finished"
+    assert run.output == "too late"
+
+
+def test_llm_deadline_reports_time_left():
+    assert time_left() is None
+    with llm_deadline(time.monotonic() + 10):
+        assert 9 < time_left() <= 10
+    with llm_deadline(time.monotonic() - 1), pytest.raises(DeadlineExceeded):
+        time_left()
@@ -0,0 +1,48 @@
+from langchain_core.agents import AgentAction
+
+from src.tools.charts_and_graphs import (
+    create_categorical_chart,
+    create_scatter_plot,
+    create_time_series_chart,
+    find_chart_paths,
+    find_run_chart_paths,
+)
+
+HTML_PATH = "/data/processed/bar_region_20250601_120000.html"
+PRINTED = f"📊 Bar chart created and saved to: {HTML_PATH}\n"
+
+
+def chart_tool_outputs():
+    return [
+        create_time_series_chart.invoke(
+            {"df_name": "df", "date_column": "date", "value_column": "sales"}
+        ),
+        create_categorical_chart.invoke(
+            {"df_name": "df", "category_column": "region", "value_column": "sales"}
+        ),
+        create_scatter_plot.invoke(
+            {"df_name": "df", "x_column": "price", "y_column": "sales"}
+        ),
+    ]
+
+
+def test_chart_tool_code_announces_no_paths():
+    for output in chart_tool_outputs():
+        assert "saved to: {filepath}" in output
+        assert find_chart_paths(output) == []
+
+
+def test_printed_path_is_found():
+    assert find_chart_paths(PRINTED) == [HTML_PATH]
+    assert find_chart_paths(f'saved to: {HTML_PATH}")') == [HTML_PATH]
+
+
+def test_run_paths_come_from_python_tool_observations_only():
+    steps = [
+        (
+            AgentAction("create_categorical_chart", {}, ""),
+            f"Execute this:\nprint('saved to: {HTML_PATH}')",
+        ),
+        (AgentAction("python_repl_ast", {"query": "..."}, ""), PRINTED),
+    ]
+    assert find_run_chart_paths(steps) == [HTML_PATH]
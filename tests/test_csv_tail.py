@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+from src.ingestion.csv_tail import CsvTail
+from src.ingestion.data_root import OutsideDataRoot, resolve_data_path
+
+HEADER = b"Date,Product,Amount\n"
+
+
+def write(path, data, mode="wb"):
+    with open(path, mode) as f:
+        f.write(data)
+
+
+def test_refresh_parses_only_appended_rows(tmp_path):
+    path = tmp_path / "sales.csv"
+    write(path, HEADER + b"2024-01-01,Laptop,10\n")
+    tail = CsvTail(str(path))
+    df = tail.load()
+
+    write(path, b"2024-01-02,Notebook,20\n", "ab")
+    df, appended, rebuilt = tail.refresh(df)
+
+    assert list(df["Amount"]) == [10, 20]
+    assert list(appended["Product"]) == ["Notebook"]
+    assert not rebuilt
+
+
+def test_half_written_line_waits_for_its_newline(tmp_path):
+    path = tmp_path / "sales.csv"
+    write(path, HEADER + b"2024-01-01,Laptop,10\n")
+    tail = CsvTail(str(path))
+    df = tail.load()
+
+    write(path, b"2024-01-02,Note", "ab")
+    df, appended, rebuilt = tail.refresh(df)
+    assert len(df) == 1 and appended.empty and not rebuilt
+
+    write(path, b"book,20\n", "ab")
+    df, appended, rebuilt = tail.refresh(df)
+    assert list(df["Product"]) == ["Laptop", "Notebook"]
+    assert not rebuilt
+
+
+def test_partial_last_row_at_load_is_replaced_by_its_full_version(tmp_path):
+    path = tmp_path / "sales.csv"
+    write(path, HEADER + b"2024-01-01,Laptop,10\n2024-01-02,Notebook,2")
+    tail = CsvTail(str(path))
+    df = tail.load()
+    assert tail.partial_last_row
+    assert list(df["Amount"]) == [10, 2]
+
+    write(path, b"0\n", "ab")
+    df, appended, rebuilt = tail.refresh(df)
+
+    assert list(df["Amount"]) == [10, 20]
+    assert list(appended["Amount"]) == [20]
+    assert rebuilt
+    assert not tail.partial_last_row
+
+
+def test_rewritten_file_is_reloaded_in_full(tmp_path):
+    path = tmp_path / "sales.csv"
+    write(path, HEADER + b"2024-01-01,Laptop,10\n2024-01-02,Notebook,20\n")
+    tail = CsvTail(str(path))
+    df = tail.load()
+
+    write(path, HEADER + b"2024-02-01,Desk Chair,99\n")
+    df, appended, rebuilt = tail.refresh(df)
+
+    assert list(df["Product"]) == ["Desk Chair"]
+    assert rebuilt
+
+
+def test_data_paths_stay_under_the_root(tmp_path):
+    root = tmp_path / "data"
+    root.mkdir()
+    (root / "sales.csv").write_bytes(HEADER)
+    os.symlink("/etc", root / "escape")
+
+    assert resolve_data_path("sales.csv", str(root)) == str(root / "sales.csv")
+    for path in ("../secret.csv", "/etc/passwd", "escape/passwd"):
+        with pytest.raises(OutsideDataRoot):
+            resolve_data_path(path, str(root))
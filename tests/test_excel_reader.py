@@ -0,0 +1,30 @@
+import io
+
+import pytest
+
+from src.ingestion import excel_reader
+
+xlwt = pytest.importorskip("xlwt")
+
+
+def legacy_workbook(sheets):
+    """Bytes of an .xls workbook with one small sheet per name"""
+    book = xlwt.Workbook()
+    for name, amounts in sheets.items():
+        sheet = book.add_sheet(name)
+        sheet.write(0, 0, "Amount")
+        for row, amount in enumerate(amounts, start=1):
+            sheet.write(row, 0, amount)
+    buffer = io.BytesIO()
+    book.save(buffer)
+    return buffer.getvalue()
+
+
+def test_xls_upload_sheets_are_read_in_workers(monkeypatch):
+    monkeypatch.setattr(excel_reader, "EXCEL_WORKERS", 4)
+    source = legacy_workbook({"North": [1, 2], "South": [3]})
+
+    df = excel_reader.read_workbook(source, ["North", "South"])
+
+    assert list(df["Amount"]) == [1, 2, 3]
+    assert list(df[excel_reader.SHEET_COLUMN]) == ["North", "North", "South"]
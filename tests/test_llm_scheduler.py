@@ -0,0 +1,147 @@
+import threading
+import time
+
+import anthropic
+import pytest
+
+from src.models.llm_scheduler import (
+    DeadlineExceeded,
+    LLMRequestScheduler,
+    RetriesExhausted,
+    TokenBucket,
+    llm_deadline,
+    llm_priority,
+)
+from src.models.stub_llm_server import start_stub_server
+
+
+@pytest.fixture
+def stub():
+    """Start a stand-in LLM; returns a function that makes one request"""
+    servers = []
+
+    def start(**settings):
+        server, url = start_stub_server(**settings)
+        servers.append(server)
+        client = anthropic.Anthropic(base_url=url, api_key="stub", max_retries=0)
+
+        def ask():
+            return client.messages.create(
+                model="stub",
+                max_tokens=10,
+                messages=[{"role": "user", "content": "hi"}],
+            )
+
+        return ask, server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def scheduler(**limits):
+    settings = dict(
+        requests_per_minute=6000,
+        tokens_per_minute=6_000_000,
+        max_concurrency=4,
+        max_retries=2,
+        backoff_base=0.01,
+    )
+    return LLMRequestScheduler(**{**settings, **limits})
+
+
+def occupy(llm_scheduler):
+    """Hold the scheduler's only slot until the returned event is set"""
+    release, started = threading.Event(), threading.Event()
+
+    def call():
+        started.set()
+        release.wait(5)
+
+    thread = threading.Thread(target=llm_scheduler.run, args=(call,))
+    thread.start()
+    started.wait(5)
+    return release, thread
+
+
+def test_calls_reach_the_stand_in(stub):
+    ask, _ = stub(latency=0.05)
+    llm_scheduler = scheduler()
+    reply = llm_scheduler.run(ask)
+    assert reply.content[0].text
+    assert llm_scheduler.stats["calls"] == 1
+
+
+def test_interactive_calls_go_before_prefetch():
+    llm_scheduler = scheduler(max_concurrency=1)
+    release, holder = occupy(llm_scheduler)
+    order = []
+
+    def queue(priority):
+        with llm_priority(priority):
+            llm_scheduler.run(lambda: order.append(priority))
+
+    threads = []
+    for priority in ("prefetch", "batch", "interactive"):
+        threads.append(threading.Thread(target=queue, args=(priority,)))
+        threads[-1].start()
+        while llm_scheduler.snapshot()["queued"] < len(threads):
+            time.sleep(0.01)
+
+    release.set()
+    for thread in [holder, *threads]:
+        thread.join(5)
+    assert order == ["interactive", "batch", "prefetch"]
+
+
+def test_a_429_pauses_every_caller_for_its_retry_after(stub):
+    ask, _ = stub(error_rate=1.0, retry_after=1)
+    llm_scheduler = scheduler(max_retries=0)
+    with pytest.raises(RetriesExhausted):
+        llm_scheduler.run(ask)
+    assert llm_scheduler.stats["rate_limited"] == 1
+    assert 0.5 < llm_scheduler.snapshot()["paused_for"] <= 1
+
+    # Another caller, with its own successful call, waits out the pause too
+    started = time.monotonic()
+    assert llm_scheduler.run(lambda: "ok") == "ok"
+    assert time.monotonic() - started > 0.5
+
+
+def test_retries_stop_after_max_retries(stub):
+    ask, server = stub(error_rate=1.0, retry_after=0)
+    llm_scheduler = scheduler(max_retries=2)
+    with pytest.raises(RetriesExhausted):
+        llm_scheduler.run(ask)
+    assert server.RequestHandlerClass.settings.counts["rate_limited"] == 3
+    assert llm_scheduler.stats["retries"] == 2
+    assert llm_scheduler.stats["failures"] == 1
+
+
+def test_overloads_are_retried_until_one_succeeds(stub):
+    ask, server = stub(latency=0.01, overload_rate=0.5, retry_after=0)
+    llm_scheduler = scheduler(max_retries=20)
+    for _ in range(5):
+        llm_scheduler.run(ask)
+    counts = server.RequestHandlerClass.settings.counts
+    assert counts["ok"] == 5
+    assert llm_scheduler.stats["retries"] == counts["overloaded"]
+
+
+def test_deadline_passes_while_queued():
+    llm_scheduler = scheduler(max_concurrency=1)
+    release, holder = occupy(llm_scheduler)
+    started = time.monotonic()
+    with llm_deadline(started + 0.2), pytest.raises(DeadlineExceeded):
+        llm_scheduler.run(lambda: "never sent")
+    assert time.monotonic() - started < 1
+    assert llm_scheduler.snapshot()["queued"] == 0
+    release.set()
+    holder.join(5)
+
+
+def test_zero_rate_limits_are_rejected():
+    with pytest.raises(ValueError):
+        TokenBucket(0, 0)
+    with pytest.raises(ValueError):
+        scheduler(requests_per_minute=0)
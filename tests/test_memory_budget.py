@@ -0,0 +1,61 @@
+import os
+
+import pandas as pd
+
+from src.models.memory_budget import (
+    MemoryAccountant,
+    SpilledFrame,
+    estimate_nbytes,
+    restore_spilled,
+)
+from src.tools.python_repl import ThreadSafePythonAstREPLTool
+
+
+def frame(rows=1000):
+    return pd.DataFrame({"amount": range(rows), "region": ["North"] * rows})
+
+
+def spill(tmp_path, df, name="summary"):
+    path = tmp_path / f"{name}.parquet"
+    df.to_parquet(path)
+    return SpilledFrame(str(path), estimate_nbytes(df), df.shape)
+
+
+def test_restore_spilled_loads_only_the_named_frames(tmp_path):
+    summary, other = frame(), frame(10)
+    namespace = {
+        "summary": spill(tmp_path, summary),
+        "other": spill(tmp_path, other, "other"),
+        "total": 5,
+    }
+
+    restore_spilled(namespace, {"summary", "total", "missing"})
+
+    pd.testing.assert_frame_equal(namespace["summary"], summary)
+    assert isinstance(namespace["other"], SpilledFrame)
+    assert namespace["total"] == 5
+    # The Parquet file is removed once loaded back
+    assert not os.path.exists(tmp_path / "summary.parquet")
+    assert os.path.exists(tmp_path / "other.parquet")
+
+
+def test_spilled_workspace_frame_is_restored_when_code_uses_it(tmp_path):
+    tool = ThreadSafePythonAstREPLTool(locals={"df": frame(10)})
+    tool.run("summary = df.assign(doubled=df.amount * 2)")
+    tool.run("kept = df.head(3)")
+
+    accountant = MemoryAccountant(
+        session_budget_mb=0, total_budget_mb=1024, spill_dir=str(tmp_path)
+    )
+    accountant.attach("s1", tool)
+    usage = accountant.enforce("s1")
+
+    # Everything but Andy's df is spilled to get under a zero budget
+    assert isinstance(tool.locals["summary"], SpilledFrame)
+    assert isinstance(tool.locals["kept"], SpilledFrame)
+    assert not isinstance(tool.locals["df"], SpilledFrame)
+    assert usage.spilled_frames == 2
+
+    assert tool.run("int(summary.doubled.sum())") == 90
+    assert isinstance(tool.locals["summary"], pd.DataFrame)
+    assert isinstance(tool.locals["kept"], SpilledFrame)
@@ -0,0 +1,92 @@
+import pandas as pd
+from langchain_core.agents import AgentAction
+
+from src.models.recipes import (
+    _remap_columns,
+    check_schema,
+    load_recipe,
+    record_recipe,
+    replay_recipe,
+    save_recipe,
+    schema_of,
+)
+
+
+def sales(rows=6):
+    return pd.DataFrame(
+        {
+            "Region": ["North", "South", "East"] * (rows // 3),
+            "Amount": [float(i) for i in range(rows)],
+        }
+    )
+
+
+def python_step(code, observation="ok"):
+    return (AgentAction("python_repl_ast", {"query": code}, ""), observation)
+
+
+TOTALS = "totals = df.groupby('Region')['Amount'].sum()\ntotals.sort_values().index[-1]"
+
+
+def top_region_recipe(df=None):
+    df = sales() if df is None else df
+    steps = [
+        (AgentAction("create_categorical_chart", {}, ""), "Execute this: ..."),
+        python_step("df['Nope']", "KeyError: 'Nope'"),
+        python_step(TOTALS),
+    ]
+    return record_recipe("Which region sells most?", schema_of(df), steps)
+
+
+def test_record_keeps_only_successful_python_steps():
+    recipe = top_region_recipe()
+    assert [step["code"] for step in recipe["steps"]] == [TOTALS]
+    assert recipe["parameters"]["columns"] == {"Amount": "Amount", "Region": "Region"}
+    assert record_recipe("q", schema_of(sales()), []) is None
+
+
+def test_names_are_per_question_and_schema():
+    same_shape = top_region_recipe(sales(3))
+    other = top_region_recipe(sales().assign(Extra=1))
+    assert top_region_recipe()["name"] == same_shape["name"]
+    assert top_region_recipe()["name"] != other["name"]
+    assert top_region_recipe()["name"].startswith("which_region_sells_most_")
+
+
+def test_load_by_name_or_its_start(tmp_path):
+    recipe = top_region_recipe()
+    save_recipe(recipe, str(tmp_path))
+    assert load_recipe(recipe["name"], str(tmp_path))["steps"] == recipe["steps"]
+    assert load_recipe("which_region_sells_most", str(tmp_path))["name"] == (
+        recipe["name"]
+    )
+
+
+def test_check_schema_reports_drift():
+    recipe = top_region_recipe()
+    changed = sales().assign(Amount=lambda df: df["Amount"].astype(str), New=1)
+    drift = check_schema(recipe, changed.drop(columns="Region"))
+    assert drift["errors"] == ["Missing column 'Region' (used by the recipe)"]
+    assert any("changed type" in warning for warning in drift["warnings"])
+    assert "New columns: New" in drift["warnings"]
+
+
+def test_remap_only_touches_quoted_column_names():
+    code = "df['Region'] + df[\"Region\"] + Region_total"
+    assert _remap_columns(code, {"Region": "Area"}) == (
+        "df['Area'] + df[\"Area\"] + Region_total"
+    )
+
+
+def test_replay_on_new_data_with_a_renamed_column():
+    recipe = top_region_recipe()
+    new = sales().rename(columns={"Region": "Area"})
+    new.loc[0, "Amount"] = 100.0
+
+    result = replay_recipe(recipe, new, {"Region": "Area"})
+    assert result["error"] is None
+    assert result["outputs"][-1]["output"] == "North"
+
+    result = replay_recipe(recipe, new)
+    assert result["error"].startswith("Schema drift")
+    assert result["outputs"] == []
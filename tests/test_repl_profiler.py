@@ -0,0 +1,56 @@
+import threading
+import tracemalloc
+
+import pandas as pd
+
+from src.tools.repl_profiler import SnippetProfiler
+from src.tools.python_repl import ThreadSafePythonAstREPLTool
+
+
+def profiler(code="total = 1"):
+    return SnippetProfiler(code, {"df": pd.DataFrame({"a": [1, 2]})}, {"df"})
+
+
+def test_tracing_stops_when_the_last_profiler_exits():
+    assert not tracemalloc.is_tracing()
+    with profiler():
+        with profiler():
+            assert tracemalloc.is_tracing()
+        assert tracemalloc.is_tracing()
+    assert not tracemalloc.is_tracing()
+
+
+def test_tracing_started_elsewhere_is_left_running():
+    tracemalloc.start()
+    try:
+        with profiler():
+            pass
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_concurrent_snippet_is_profiled_without_function_stats():
+    outer, inner = profiler(), profiler()
+    with outer:
+        thread = threading.Thread(target=lambda: inner.__enter__().__exit__())
+        thread.start()
+        thread.join()
+        sum(range(100_000))
+    assert outer.profile.functions_profiled
+    assert not inner.profile.functions_profiled
+    assert "another snippet" in inner.profile.summary()
+
+    with profiler() as again:
+        pass
+    assert again.profile.functions_profiled
+
+
+def test_profiled_tool_run_returns_the_result():
+    tool = ThreadSafePythonAstREPLTool(locals={"df": pd.DataFrame({"a": [1, 2, 3]})})
+    tool.profile_snippets = True
+    assert str(tool.run("doubled = df * 2\ndoubled['a'].sum()")) == "12"
+    profile = tool.profiles[-1]
+    assert profile.rows_touched == 6  # df and doubled
+    assert len(profile.statements) == 2
+    assert not tracemalloc.is_tracing()
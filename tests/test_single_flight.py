@@ -0,0 +1,128 @@
+from concurrent.futures import Future
+
+import pandas as pd
+
+from src.models.single_flight import SingleFlight, flight_key, question_key
+from src.tools.python_repl import ThreadSafePythonAstREPLTool
+
+
+def repl(rows=3):
+    df = pd.DataFrame({"amount": range(rows)})
+    return ThreadSafePythonAstREPLTool(locals={"df": df})
+
+
+def test_question_key_normalizes_the_question():
+    assert question_key("fp", "Top  categories?") == question_key(
+        "fp", "top categories"
+    )
+
+
+def test_question_key_separates_context_and_namespace():
+    base = question_key("fp", "top categories")
+    assert question_key("fp", "top categories", "\n\nearlier: sales") != base
+    assert question_key("fp", "top categories", "a") != question_key(
+        "fp", "top categories", "b"
+    )
+    assert question_key("fp", "top categories", namespace=1) != base
+    assert question_key("other", "top categories") != base
+
+
+def test_first_questions_coalesce_across_sessions_on_a_fresh_agent():
+    first, second = repl(), repl()
+    key_a, fresh_a = flight_key("fp", "top categories", "", first)
+    key_b, fresh_b = flight_key("fp", "Top categories", "", second)
+    assert fresh_a and fresh_b
+    assert key_a == key_b
+
+
+def test_follow_ups_only_coalesce_within_their_session():
+    first, second = repl(), repl()
+    context = "\n\nPrevious conversation context:\n[...]"
+    key_a, fresh_a = flight_key("fp", "and by region?", context, first)
+    key_b, _ = flight_key("fp", "and by region?", context, second)
+    assert not fresh_a
+    assert key_a != key_b
+    assert flight_key("fp", "and by region?", context, first)[0] == key_a
+
+
+def test_a_used_namespace_keeps_its_questions_to_itself():
+    used, untouched = repl(), repl()
+    used.run("summary = df.describe()")
+    key_used, fresh = flight_key("fp", "top categories", "", used)
+    assert not fresh
+    assert key_used != flight_key("fp", "top categories", "", untouched)[0]
+
+
+class Run:
+    """A stand-in run: a future the test resolves, and whether it was cancelled"""
+
+    def __init__(self):
+        self.future = Future()
+        self.publish = None
+        self.cancelled = False
+        self.starts = 0
+
+    def start(self, publish):
+        self.starts += 1
+        self.publish = publish
+        return self.future
+
+    def cancel(self):
+        self.cancelled = True
+
+
+def test_joiners_share_one_run_and_its_steps():
+    flight, run = SingleFlight(), Run()
+    steps = [[] for _ in range(3)]
+    joined = [
+        flight.join("key", run.start, run.cancel, listener=seen.append)
+        for seen in steps
+    ]
+
+    assert run.starts == 1
+    assert [started for _, started in joined] == [True, False, False]
+    assert all(future is run.future for future, _ in joined)
+    run.publish("step 1")
+    assert steps == [["step 1"]] * 3
+    assert flight.metrics() == {"calls": 3, "runs": 1, "coalesced": 2, "in_flight": 1}
+
+    run.future.set_result("answer")
+    assert flight.metrics()["in_flight"] == 0
+    assert not flight.is_running("key")
+
+
+def test_an_earlier_leaver_does_not_cancel_the_run():
+    flight, run = SingleFlight(), Run()
+    first = []
+    future, _ = flight.join("key", run.start, run.cancel, listener=first.append)
+    flight.join("key", run.start, run.cancel)
+
+    flight.leave("key", future, first.append)
+    run.publish("step 1")
+
+    assert not run.cancelled
+    assert first == []
+    assert flight.is_running("key")
+
+
+def test_the_last_leaver_cancels_the_run():
+    flight, run = SingleFlight(), Run()
+    future, _ = flight.join("key", run.start, run.cancel)
+    flight.join("key", run.start, run.cancel)
+
+    flight.leave("key", future)
+    flight.leave("key", future)
+
+    assert run.cancelled
+    assert not flight.is_running("key")
+
+
+def test_a_finished_run_is_not_joined_again():
+    flight, first, second = SingleFlight(), Run(), Run()
+    flight.join("key", first.start)
+    first.future.set_result("answer")
+
+    future, started = flight.join("key", second.start)
+
+    assert started and future is second.future
+    assert flight.metrics()["coalesced"] == 0